@@ -17,6 +17,7 @@
 from AimsUtility import FeatureType,ActionType,ApprovalType,FeedType,FeedRef
 from AimsUtility import AimsException
 from AimsLogging import Logger
+import FeaturePool
 from Feature import Feature,FeatureMetaData
 from collections import OrderedDict
 
@@ -27,6 +28,10 @@ aimslog = Logger.setup()
 
 
 class AddressException(AimsException): pass
+
+#change types carried by group members whose address components are nested in entities
+GROUP_CHANGE_TYPES = ('Replace', 'AddLineage', 'ParcelReferenceData')
+ROAD_COMPONENTS = ('_components_roadPrefix', '_components_roadName', '_components_roadType', '_components_roadSuffix', '_components_waterRoute')
       
 #------------------------------------------------------------------------------
 # P O S I T I O N
@@ -75,12 +80,13 @@ class Position(object):
         @type af: AddressFactory
         @return: Populated Position object 
         '''
+        #type, crs and positionType strings are identical for nearly every position so share them
         self._set(
-            d['position']['type'],
+            FeaturePool.intern(d['position']['type']),
             d['position']['coordinates'],
-            d['position']['crs']['type'],
-            d['position']['crs']['properties']['name'],
-            af.filterPI(d['positionType']) if af else d['positionType'],
+            FeaturePool.intern(d['position']['crs']['type']),
+            FeaturePool.intern(d['position']['crs']['properties']['name']),
+            FeaturePool.intern(af.filterPI(d['positionType']) if af else d['positionType']),
             d['primary']
         )
         
@@ -396,6 +402,7 @@ class Address(Feature):
         self._components_unitType = unitType 
     def setUnitValue( self, unitValue ): 
         self._components_unitValue = unitValue 
+        self._invalidate()
     def setLevelType( self, levelType ): 
         self._components_levelType = levelType 
     def setLevelValue( self, levelValue ): 
@@ -404,22 +411,30 @@ class Address(Feature):
         self._components_addressNumberPrefix = addressNumberPrefix 
     def setAddressNumber( self, addressNumber ): 
         self._components_addressNumber = addressNumber          
+        self._invalidate()
     def setAddressNumberSuffix( self, addressNumberSuffix ): 
         self._components_addressNumberSuffix = addressNumberSuffix         
+        self._invalidate()
     def setAddressNumberHigh( self, addressNumberHigh ): 
         self._components_addressNumberHigh = addressNumberHigh 
+        self._invalidate()
     def setRoadCentrelineId( self, roadCentrelineId ): 
         self._components_roadCentrelineId = roadCentrelineId         
     def setRoadPrefix( self, roadPrefix ): 
         self._components_roadPrefix = roadPrefix 
+        self._invalidate()
     def setRoadName( self, roadName ): 
         self._components_roadName = roadName         
+        self._invalidate()
     def setRoadType( self, roadType ): 
         self._components_roadType = roadType         
+        self._invalidate()
     def setRoadSuffix( self, roadSuffix ): 
         self._components_roadSuffix = roadSuffix 
+        self._invalidate()
     def setWaterRoute( self, waterRoute ): 
         self._components_waterRoute = waterRoute 
+        self._invalidate()
     def setWaterName( self, waterName ): 
         self._components_waterName = waterName 
     def setSuburbLocality( self, suburbLocality ): 
@@ -484,9 +499,39 @@ class Address(Feature):
         '''
         return self._addressedObject_addressPositions
 
+    def getCoordinates(self):
+        '''Returns the coordinates of the first address position. Feed addresses other than adds/updates 
+        (and their responses) carry template positions so their location is read from the nested address entity
+        @return: List<Double>{2} or None
+        '''
+        try:
+            if getattr(self,'_changeType',None) in (None,'Update','Add') or self.getRequestId():
+                positions = self.getAddressPositions()
+            else:
+                positions = self.meta.entities[0].getAddressPositions()
+            return positions[0]._position_coordinates
+        except (AttributeError,IndexError):
+            return None
+
     #---------------------------------------------------
     
+    def derive(self):
+        '''Precomputes the full number and full road labels so readers (table models, layers) get plain attribute reads'''
+        try:
+            self.getFullNumber()
+            self.getFullRoad()
+        except (AttributeError,IndexError):
+            #incomplete features (eg missing entities) are left to build their labels on access
+            self._invalidate()
+    
     def getFullNumber(self):
+        '''Returns the full address number label, building it from Address components if not already cached
+        @return: String'''
+        if '_derived_fullNumber' not in self.__dict__:
+            self._derived_fullNumber = self._buildFullNumber()
+        return self._derived_fullNumber
+    
+    def _buildFullNumber(self):
         '''Combines Address components to create a full address label
         @return: String'''
         # in some instance we could go to the API get 'full number' however this 
@@ -505,7 +550,41 @@ class Address(Feature):
                     numComponent = getattr(getattr(getattr(self,'meta'),'entities')[0],k)
                     if numComponent: fullNumber += v.format(numComponent) 
         return fullNumber
-
+    
+    def getFullRoad(self):
+        '''Returns the full road name label, building it from Address road components if not already cached
+        @return: String'''
+        if '_derived_fullRoad' not in self.__dict__:
+            self._derived_fullRoad = self._buildFullRoad()
+        return self._derived_fullRoad
+    
+    def _buildFullRoad(self):
+        '''Combines Address road components to create a full road label. 
+        Group and retired (feed) addresses hold their components in nested entities, other addresses are flat
+        @return: String'''
+        fullRoad = ''
+        entity = self.meta.entities[0] if hasattr(self,'meta') and self.meta.entities else None
+        for prop in ROAD_COMPONENTS:
+            addProp = None
+            # Groups have nested entities
+            if self._changeType in GROUP_CHANGE_TYPES:
+                if hasattr(entity,prop):
+                    addProp = getattr(entity,prop)
+            # retired have nested entities except when the retired 
+            # feature is derived from an response object    
+            elif self._changeType == 'Retire':
+                if not self.meta.requestId: 
+                    if hasattr(entity,prop):
+                        addProp = getattr(entity,prop)
+                elif hasattr(self,prop):  
+                    addProp = getattr(self,prop) or ''
+            # else we have an Add or update of whoms 
+            # properties are flat
+            elif hasattr(self,prop): 
+                addProp = getattr(self,prop) or ''
+            else: continue                    
+            if addProp != None: fullRoad+=addProp+' '
+        return fullRoad.lstrip()
 
 #------------------------------------------------------------------------------
     
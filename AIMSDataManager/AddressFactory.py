@@ -21,6 +21,7 @@ from Const import SKIP_NULL, DEF_SEP
 from Address import Address,AddressChange,AddressResolution,Position
 from Address import AddressException
 from AimsLogging import Logger
+import FeaturePool
 #from FeatureFactory import TemplateReader
 
 #P = os.path.join(os.path.dirname(__file__),'../resources/')
@@ -117,7 +118,9 @@ class AddressFactory(FeatureFactory):
                 pstns = [] 
                 for pd in data[k]: pstns.append(Position.getInstance(pd,self))
                 adr.setAddressPositions(pstns)
-            else: getattr(adr,setter)(self.filterPI(data[k]) or None) if hasattr(adr,setter) else setattr(adr,new_prefix,self.filterPI(data[k]) or None)
+            else:
+                val = FeaturePool.internField(k,self.filterPI(data[k]) or None)
+                getattr(adr,setter)(val) if hasattr(adr,setter) else setattr(adr,new_prefix,val)
         return adr
     
     def cast(self,adr):
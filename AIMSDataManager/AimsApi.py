@@ -11,8 +11,8 @@
 ################################################################################
 
 import httplib2
-import json
 import re
+import AimsCodec
 
 from Address import Address,AddressChange,AddressResolution#,AimsWarning
 from Config import ConfigReader
@@ -159,7 +159,7 @@ class AimsApi(object):
         else:
             url = '{}/{}/{}?count={}&page={}'.format(self._url,et,ft,count,pno)
         resp, content = self._request(url,'GET', headers = self._headers)
-        return self.handleResponse(url,resp["status"], json.loads(content))
+        return self.handleResponse(url,resp["status"], AimsCodec.loads(content,'onePage'))
            
     @LogWrap.timediff(prefix='oneFeat')
     def getOneFeature(self,etft,cid):
@@ -175,7 +175,7 @@ class AimsApi(object):
         url = '/'.join((self._url,et,ft.lower(),str(cid) if cid else '')).rstrip('/')
         #if count: url += '?count={}'.format(count)
         resp, content = self._request(url,'GET', headers = self._headers)
-        return self.handleResponse(url,resp["status"], json.loads(content))
+        return self.handleResponse(url,resp["status"], AimsCodec.loads(content,'oneFeat'))
         #return jcontent        
     
     # specific request response methods
@@ -194,8 +194,8 @@ class AimsApi(object):
         et = FeatureType.reverse[FeatureType.ADDRESS].lower()
         ft = FeedType.reverse[FeedType.CHANGEFEED].lower()
         url = '/'.join((self._url,et,ft,ActionType.reverse[at].lower(),TESTPATH)).rstrip('/')
-        resp, content = self._request(url,"POST", json.dumps(payload), self._headers)
-        return self.handleResponse(url,resp["status"], json.loads(content) )  
+        resp, content = self._request(url,"POST", AimsCodec.dumps(payload), self._headers)
+        return self.handleResponse(url,resp["status"], AimsCodec.loads(content,'adrAct') )  
     
     @LogWrap.timediff(prefix='adrApp')
     def addressApprove(self,at,payload,cid):
@@ -217,8 +217,8 @@ class AimsApi(object):
         et = FeatureType.reverse[FeatureType.ADDRESS].lower()
         ft = FeedType.reverse[FeedType.RESOLUTIONFEED].lower()
         url = '/'.join((self._url,et,ft,str(cid),ApprovalType.PATH[at].lower(),TESTPATH)).rstrip('/')
-        resp, content = self._request(url,ApprovalType.HTTP[at], json.dumps(payload), self._headers)
-        return self.handleResponse(url,resp["status"], json.loads(content) )
+        resp, content = self._request(url,ApprovalType.HTTP[at], AimsCodec.dumps(payload), self._headers)
+        return self.handleResponse(url,resp["status"], AimsCodec.loads(content,'adrApp') )
     
     @LogWrap.timediff(prefix='grpAct')
     def groupAction(self,gat,payload,cid):
@@ -234,8 +234,8 @@ class AimsApi(object):
         et = FeatureType.reverse[FeatureType.GROUPS].lower()
         ft = FeedType.reverse[FeedType.CHANGEFEED].lower()
         url = '/'.join((self._url,et,ft,str(cid),GroupActionType.PATH[gat].lower(),TESTPATH)).rstrip('/')
-        resp, content = self._request(url,GroupActionType.HTTP[gat], json.dumps(payload), self._headers)
-        return self.handleResponse(url,resp["status"], json.loads(content) )    
+        resp, content = self._request(url,GroupActionType.HTTP[gat], AimsCodec.dumps(payload), self._headers)
+        return self.handleResponse(url,resp["status"], AimsCodec.loads(content,'grpAct') )    
     
     @LogWrap.timediff(prefix='grpApp')
     def groupApprove(self,gat,payload,cid):
@@ -251,8 +251,8 @@ class AimsApi(object):
         et = FeatureType.reverse[FeatureType.GROUPS].lower()
         ft = FeedType.reverse[FeedType.RESOLUTIONFEED].lower()
         url = '/'.join((self._url,et,ft,str(cid),GroupApprovalType.PATH[gat].lower(),TESTPATH)).rstrip('/')
-        resp, content = self._request(url,GroupApprovalType.HTTP[gat], json.dumps(payload), self._headers)
-        return self.handleResponse(url,resp["status"], json.loads(content) )
+        resp, content = self._request(url,GroupApprovalType.HTTP[gat], AimsCodec.dumps(payload), self._headers)
+        return self.handleResponse(url,resp["status"], AimsCodec.loads(content,'grpApp') )
     
     @LogWrap.timediff(prefix='usrAct')
     def userAction(self,uat,payload,uid):         
@@ -267,8 +267,8 @@ class AimsApi(object):
         '''
         #~/aims/api/admin/users {add/update/delete}
         url = '{}/admin/users/{}/{}'.format(self._url,uid,TESTPATH).rstrip('/')
-        resp, content = self._request(url,UserActionType.HTTP[uat], json.dumps(payload), self._headers)
-        return self.handleResponse(url,resp["status"], json.loads(content) )
+        resp, content = self._request(url,UserActionType.HTTP[uat], AimsCodec.dumps(payload), self._headers)
+        return self.handleResponse(url,resp["status"], AimsCodec.loads(content,'usrAct') )
         
         
         
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''AimsCodec module wrapping JSON encode/decode for API requests. The fastest available backend is selected at import time'''
+
+import time
+import threading
+import FeaturePool
+from AimsLogging import Logger
+
+aimslog = Logger.setup()
+
+#backend selection, fastest first
+try:
+    import ujson as fastjson
+    BACKEND = 'ujson'
+except ImportError:
+    try:
+        import simplejson as fastjson
+        BACKEND = 'simplejson'
+    except ImportError:
+        import json as fastjson
+        BACKEND = 'json'
+
+#intern low-cardinality values in a single pass over the decoded response
+COMPACT = True
+#the stdlib and simplejson decoders call an object hook from C as each object is built, cheaper than a second pass
+HOOKS = BACKEND != 'ujson'
+_FIELDS = frozenset(FeaturePool.INTERN_FIELDS)
+
+stats_lock = threading.Lock()
+_stats = {}
+
+def _internObject(obj):
+    '''Replaces the string values of fields listed in FeaturePool.INTERN_FIELDS with their pooled instances
+    @param obj: Decoded JSON object
+    @type obj: Dict
+    @return: The object
+    '''
+    for k in _FIELDS.intersection(obj):
+        v = obj[k]
+        if isinstance(v,basestring): obj[k] = FeaturePool.intern(v)
+    return obj
+
+def _compact(res):
+    '''Interns the values of every object in a decoded response, in place and in a single pass
+    @param res: Decoded response
+    @type res: Dict/List
+    @return: The decoded response
+    '''
+    stack = [res]
+    pop,push = stack.pop,stack.append
+    while stack:
+        obj = pop()
+        if type(obj) is dict:
+            _internObject(obj)
+            children = obj.itervalues()
+        else:
+            children = obj
+        for v in children:
+            if type(v) is dict or type(v) is list: push(v)
+    return res
+
+def _record(endpoint,size,tdif):
+    '''Accumulates decode timing for an endpoint
+    @param endpoint: Endpoint label, eg onePage
+    @type endpoint: String
+    @param size: Length of the decoded content
+    @type size: Integer
+    @param tdif: Decode time in seconds
+    @type tdif: Double
+    '''
+    with stats_lock:
+        s = _stats.setdefault(endpoint,{'count':0,'bytes':0,'time':0.0,'max':0.0})
+        s['count'] += 1
+        s['bytes'] += size
+        s['time'] += tdif
+        s['max'] = max(s['max'],tdif)
+
+def loads(content,endpoint=None,compact=None):
+    '''Decodes a JSON response string recording per endpoint decode time
+    @param content: JSON response text
+    @type content: String
+    @param endpoint: Endpoint label used to group timing stats
+    @type endpoint: String
+    @param compact: Intern low-cardinality values after decoding, defaults to module COMPACT setting
+    @type compact: Boolean
+    @return: Decoded object
+    '''
+    t1 = time.time()
+    if not (compact if compact is not None else COMPACT):
+        res = fastjson.loads(content)
+    elif HOOKS:
+        res = fastjson.loads(content,object_hook=_internObject)
+    else:
+        res = fastjson.loads(content)
+        if type(res) in (dict,list): _compact(res)
+    if endpoint: _record(endpoint,len(content),time.time()-t1)
+    return res
+
+def dumps(payload):
+    '''Encodes a request payload as JSON text
+    @param payload: Request data
+    @type payload: Dict
+    @return: JSON String
+    '''
+    return fastjson.dumps(payload)
+
+def stats():
+    '''Returns accumulated decode stats
+    @return: Dict of count, bytes, total and max decode time keyed by endpoint
+    '''
+    with stats_lock:
+        return dict([(k,dict(v)) for k,v in _stats.items()])
+
+def logStats():
+    '''Writes decode stats to the log'''
+    for k,v in stats().items():
+        aimslog.info('Decode {} [{}] n={count} bytes={bytes} total={time:.3f}s max={max:.3f}s'.format(k,BACKEND,**v))
@@ -209,6 +209,27 @@ FEEDS.update(FEED0)
 FIRST = {'AC':FeedRef((FeatureType.ADDRESS,FeedType.CHANGEFEED)),'AR':FeedRef((FeatureType.ADDRESS,FeedType.RESOLUTIONFEED)),
          'GC':FeedRef((FeatureType.GROUPS,FeedType.CHANGEFEED)), 'GR':FeedRef((FeatureType.GROUPS,FeedType.RESOLUTIONFEED))}
 
+#attribute uniquely identifying a feature within each feed
+FEEDKEY = {FEEDS['AF']:'_components_addressId',FEEDS['AC']:'_changeId',FEEDS['AR']:'_changeId',
+           FEEDS['GC']:'_changeGroupId',FEEDS['GR']:'_changeGroupId',FEEDS['UA']:'_userId'}
+
 PersistActionType = Enumeration.enum('INIT', 'APPEND', 'REPLACE', 'ALL')
 
+def mergeDelta(older,newer):
+    '''Combines two consecutive feed deltas into one. A delta is an (upserts,deletes) pair of {id:Feature} and 
+    a list of ids keyed as in FEEDKEY. None stands for a complete replacement of the feed
+    @param older: Earlier delta
+    @type older: Tuple(Dict,List)
+    @param newer: Later delta
+    @type newer: Tuple(Dict,List)
+    @return: Delta equivalent to applying older then newer
+    '''
+    if older is None or newer is None: return None
+    upserts,deletes = dict(older[0]),set(older[1])
+    for fid in newer[1]: upserts.pop(fid,None)
+    deletes.update(newer[1])
+    deletes.difference_update(newer[0])
+    upserts.update(newer[0])
+    return upserts,list(deletes)
+
    
@@ -14,8 +14,6 @@ import re
 import ConfigParser
 from string import whitespace
 
-from qgis.core import QgsApplication
-
 import getpass
 import base64
 try:
@@ -24,9 +22,23 @@ try:
 except:
     USE_PLAINTEXT = True
 
-UNAME = os.environ['USERNAME'] if re.search('win',sys.platform) else os.environ['LOGNAME']
+#environment variable naming the config file, set for headless use where there's no QGIS settings directory
+CONFIG_ENV = 'AIMS_CONFIG'
+
+def _configPath():
+    '''Returns the config file path, from the environment, the QGIS settings directory or the default QGIS2 location
+    @return: String
+    '''
+    if os.environ.get(CONFIG_ENV): return os.environ[CONFIG_ENV]
+    try:
+        from qgis.core import QgsApplication
+        return os.path.join(QgsApplication.qgisSettingsDirPath(), "aims", "aimsConfig.ini")
+    except ImportError:
+        return os.path.join(os.path.expanduser('~'),'.qgis2','aims','aimsConfig.ini')
+
+UNAME = os.environ.get('USERNAME' if re.search('win',sys.platform) else 'LOGNAME') or getpass.getuser()
 DEF_CONFIG = {'db':{'host':'127.0.0.1'},'user':{'name':UNAME}}
-AIMS_CONFIG  = os.path.join(QgsApplication.qgisSettingsDirPath(), "aims", "aimsConfig.ini")
+AIMS_CONFIG  = _configPath()
 
 if not USE_PLAINTEXT:
     K='12345678901234567890123456789012'
@@ -14,18 +14,41 @@ import sys
 import Queue
 import pickle
 import time
+import sqlite3
+import threading
+import random
+import copy
+import glob
 from Address import Address, AddressChange, AddressResolution,Position
 from FeatureFactory import FeatureFactory
 #from DataUpdater import DataUpdater
 from DataSync import DataSync,DataSyncFeatures,DataSyncFeeds,DataSyncAdmin
 from datetime import datetime as DT
 from AimsUtility import FeedRef,ActionType,ApprovalType,GroupActionType,GroupApprovalType,UserActionType,FeatureType,FeedType,PersistActionType,Configuration,FEED0,FEEDS,FIRST
-from AimsUtility import AimsException
+from AimsUtility import AimsException,mergeDelta
 from AimsLogging import Logger
 from Const import THREAD_JOIN_TIMEOUT,RES_PATH,LOCAL_ADL,SWZERO,NEZERO,HACK_SUP_IND,NULL_PAGE_VALUE as NPV
 from Observable import Observable
+from Request import ResponseMailbox,BatchFuture,nextRequestId
+import IOQueue
+from Supervisor import Supervisor
+from DataStore import DataStore,DataStoreException
+from SpatialIndex import SpatialIndex
+import Snapshot
 
 aimslog = None   
+
+#seconds between scheduled checkpoints and the minimum gap between requested ones
+CHECKPOINT_INTERVAL = 60
+CHECKPOINT_MIN_GAP = 10
+
+try:
+    from Const import IOQ_IN_SIZE,IOQ_OUT_POLICY
+except ImportError:
+    #request entries held per feed before new requests fail and the feed snapshot policy
+    IOQ_IN_SIZE,IOQ_OUT_POLICY = 100,'latest'
+
+class RequestQueueFullException(AimsException):pass
     
 class DataManager(Observable):
     '''Initialises maintenance thread and provides queue accessors and request channels'''
@@ -34,17 +57,24 @@ class DataManager(Observable):
     aimslog = Logger.setup()
     
   
-    def __init__(self,start=FIRST,initialise=False):
+    def __init__(self,start=FIRST,initialise=False,warm=True):
         '''Initialises DataManager initialising DataSync objects, setting up persistence and reading configuration.
         @param start: List of sync objects to be started (excluded FeatureFeed by default until BBOX defined
         @param initialise: Flag to signal initialisation of persisted objects
         @type initialise: Boolean
+        @param warm: Warm start, publish persisted feed data to the main listener as soon as it registers
+        @type warm: Boolean
         '''
         #self.ioq = {'in':Queue.Queue(),'out':Queue.Queue()}   
         super(DataManager,self).__init__()
+        self.warm = warm and not initialise
         if start and hasattr(start,'__iter__'): self._start = start.values()
         self.persist = Persistence(initialise)
+        self.checkpointer = Checkpointer(self.persist)
+        self.checkpointer.start()
         self.conf = Configuration().readConf()
+        self.supervisor = Supervisor(self._restartDS)
+        self.supervisor.start()
         self._initDS()
         
     def _initDS(self):
@@ -78,18 +108,32 @@ class DataManager(Observable):
             aimslog.warn('Attempt to call stopped DM listener {}'.format(self.getName()))
             return
         aimslog.info('DM Listen A[{}], K[{}] - {}'.format(args,kwargs,observable))
-        args += (self._monitor(args[0]),)#observable),)
+        data,delta = self._monitor(args[0])
+        args += (data,)
+        kwargs['delta'] = delta
         #chained notify/listen calls
         if hasattr(self,'registered') and self.registered: 
             self.registered.observe(observable, *args, **kwargs)
-        self._check()
         
     #Second register/observer method for main calling class
     def registermain(self,reg):
-        '''Register "single" object as the main listener, intended for DataManager calling class.
+        '''Register "single" object as the main listener, intended for DataManager calling class. The listener's 
+        observe is called with (observable,etft,data,delta=delta) where delta holds the features changed since the 
+        previous call for that feed, see AimsUtility.mergeDelta. A missing or None delta means the data replaces 
+        everything received before
         @param reg: Registered (main) object
         '''
         self.registered = reg if hasattr(reg, 'observe') else None
+        if self.registered and self.warm: self._publish()
+        
+    def _publish(self):
+        '''Warm start. Passes persisted feed snapshots to the main listener without waiting for the first full API fetch. 
+        Running DataSync threads reconcile these snapshots in the background'''
+        for etft in self._start:
+            data = self.persist.get(etft)
+            if data:
+                aimslog.info('Warm start {} with {} persisted features'.format(etft,len(data)))
+                self.registered.observe(self,etft,data)
         
     def _checkDS(self,etft):
         '''Starts a sync thread unless its a address-features feed with a zero bbox
@@ -100,11 +144,12 @@ class DataManager(Observable):
             self.ds[etft] = None
         else:
             self.ds[etft],self.ioq[etft] = self._spawnDS(etft,self.dsr[etft])
-            if etft.ft != FeedType.FEATURES: self.register(self.ds[etft].drc)
+            if etft.ft != FeedType.FEATURES: self.register(self.ds[etft].drc,(etft,))
             self.ds[etft].register(self)
             #HACK to start DRC even if feed thread count is zero. If changefeed isn't running we may still want to send requests to it
             if int(self.persist.tracker[etft]['threads'])>0:
                 self.ds[etft].start()
+                self.supervisor.watch(etft,self.ds[etft])
             else:
                 self.ds[etft].drc.start()
             
@@ -120,13 +165,45 @@ class DataManager(Observable):
         ts = '{0:%y%m%d.%H%M%S}'.format(DT.now())
         params = ('DSF..{}.{ts}'.format(etft,ts=ts),etft,self.persist.tracker[etft],self.conf)
         #self.ioq[etft] = {n:Queue.Queue() for n in ('in','out','resp')}
-        dq =  {n:Queue.Queue() for n in ('in','out','resp')}
+        dq = {'in':IOQueue.build('block',IOQ_IN_SIZE,'{}.in'.format(etft)),'out':IOQueue.build(IOQ_OUT_POLICY,0,'{}.out'.format(etft))}
+        dq['resp'] = ResponseMailbox(etft)
         ds = feedclass(params,dq)
         ds.setup(self.persist.coords['sw'],self.persist.coords['ne'])
+        #a fetch matching the persisted snapshot needn't be republished
+        if self.warm: ds.data_hash[etft] = self.persist.hash(etft)
         ds.setDaemon(True)
         ds.setName('DS{}'.format(etft))
         return ds,dq    
     
+    def _restartDS(self,etft):
+        '''Replaces a failed feed thread, stopping what remains of the old thread and its request channel
+        @param etft: FeedRef of the failed feed
+        @type etft: FeedRef
+        '''
+        old = self.ds.get(etft)
+        if old:
+            old.stop()
+            if hasattr(old,'drc'): self.deregister(old.drc)
+        self._checkDS(etft)
+        
+    def health(self):
+        '''Returns supervision state for each running feed
+        @return: Dict<FeedRef,Dict> of state, uptime, restart count, last error and seconds since last progress
+        '''
+        return self.supervisor.health()
+    
+    def requestStats(self):
+        '''Returns request channel timings for each feed accepting requests
+        @return: Dict<FeedRef,Dict<String,Dict>> of per request type count, queue wait and service times
+        '''
+        return dict([(etft,ds.drc.stats()) for etft,ds in self.ds.items() if ds and hasattr(ds,'drc')])
+    
+    def queueStats(self):
+        '''Returns input, output and response queue instrumentation for each running feed
+        @return: Dict<FeedRef,Dict<String,Dict>> of queue stats keyed by queue name
+        '''
+        return dict([(etft,dict([(n,q.stats()) for n,q in dq.items()])) for etft,dq in self.ioq.items() if dq])
+    
     def _cullDS(self,etft):
         '''Remove temporary queue and ds instances, this does the anti spawn
         @param etft: FeedRef of thread to stop
@@ -138,9 +215,11 @@ class DataManager(Observable):
         
     def close(self):
         '''Shutdown, closing/stopping DataSync threads and persist current data'''
+        self.supervisor.stop()
         for ds in self.ds.values():
             if ds: ds.close()
-        self.persist.write()
+        #final save runs on the checkpoint thread, the store stays open if it doesn't finish in time
+        if self.checkpointer.stop(): self.persist.close()
         
     def _check(self):
         '''Safety method to check if a DataSync thread has crashed and restart it'''
@@ -170,9 +249,10 @@ class DataManager(Observable):
         '''
         #TODO add move-threshold to prevent small moves triggering an update
         if self.persist.coords['sw'] != sw or self.persist.coords['ne'] != ne:
-            #throw out the current features addresses
+            #throw out the current features addresses, the next fetch is then published whole so listeners drop the old bbox
             etft = FEEDS['AF']#(FeatureType.ADDRESS,FeedType.FEATURES)
             self.persist.set(etft,None,pat=PersistActionType.INIT)
+            self.checkpointer.request()
             #save the new coordinates
             self.persist.coords['sw'],self.persist.coords['ne'] = sw,ne
             #kill the old features thread
@@ -208,6 +288,14 @@ class DataManager(Observable):
             aimslog.warn('Requested thread {} does not exist')
         self._check()
         
+    def index(self,etft=FEEDS['AF']):
+        '''Returns the spatial index of a feed's features, keyed on the same ids as the feed
+        @param etft: FeedRef of the indexed feed. Default=Address/Features
+        @type etft: FeedRef
+        @return: SpatialIndex or None if the feed isn't indexed
+        '''
+        return self.persist.indexes.get(etft)
+        
     def pull(self,etft=None):
         '''Return copy of the current list of Address objects (ADL).
         @param etft: Optional feedref arg indicating which feature class to return
@@ -220,33 +308,32 @@ class DataManager(Observable):
         '''Intermittent data saving function which checks a requested feed's out queue and puts any new items into the ADL
         @param etft: FeedRef of requested restart thread
         @type etft: FeedRef
-        @return: Dictionary<FeedRef*,List<Address>>
+        @return: Tuple of the feed's List<Address> and the delta of the changes taken off the queue
         ''' 
         #for etft in self.ds:#FeedType.reverse:
+        delta = ({},[])
         if self.ds[etft]:
             while not self.ioq[etft]['out'].empty():
                 #because the queue isnt populated till all pages are loaded we can just swap out the ADL
-                self.persist.set(etft,self.ioq[etft]['out'].get(),pat=PersistActionType.REPLACE)
+                delta = mergeDelta(delta,self.persist.set(etft,self.ioq[etft]['out'].get(),pat=PersistActionType.REPLACE))
                 self.stamp[etft] = time.time()
+                self.checkpointer.request()
 
-        #self.persist.write()
-        return self.persist.get(etft)
+        return self.persist.get(etft),delta
     
-    def response(self,etft=FeedRef((FeatureType.ADDRESS,FeedType.RESOLUTIONFEED))):
-        '''Returns any features lurking in the response queue
-        - Response queue contains esponses to user generated requests
+    def response(self,etft=FeedRef((FeatureType.ADDRESS,FeedType.RESOLUTIONFEED)),reqid=None):
+        '''Returns responses lurking in the response mailbox
+        - Response mailbox holds responses to user generated requests that no future collected
+        - I{Action methods return a RequestFuture which is the preferred way to receive a response}
         @param etft: FeedRef of response thread. Default=Address/Resolution
         @type etft: FeedRef
-        @return: Feature
-        '''
-        resp = ()
-        delflag = False
-        #while self.ioq.has_key((et,ft)) and not self.ioq[(et,ft)]['resp'].empty():
-        while etft in FEEDS.values() and not self.ioq[etft]['resp'].empty():
-            resp += (self.ioq[etft]['resp'].get(),)
-            #don't delete the queue while we're still getting items from it, instead mark it for deletion
-            if etft in FEED0.values(): delflag = True
-        if delflag: self._cullDS(etft)
+        @param reqid: Return only responses to this request id, responses to other requests are left in place
+        @type reqid: Integer
+        @return: Tuple of Features
+        '''
+        if etft not in FEEDS.values(): return ()
+        resp = self.ioq[etft]['resp'].get(reqid)
+        if resp and etft in FEED0.values(): self._cullDS(etft)
         return resp
     
     #--------------------------------------------------------------------------
@@ -278,24 +365,27 @@ class DataManager(Observable):
         @param address: Address object to add
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._addressAction(address,ActionType.ADD,reqid)      
+        return self._addressAction(address,ActionType.ADD,reqid)      
     
     def retireAddress(self,address,reqid=None):        
         '''Convenience method to send/retire an Address from the changefeed.
         @param address: Address object to retire
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._addressAction(address,ActionType.RETIRE,reqid)
+        return self._addressAction(address,ActionType.RETIRE,reqid)
     
     def updateAddress(self,address,reqid=None):        
         '''Convenience method to send/update an Address on the changefeed.
         @param address: Address object to update
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._addressAction(address,ActionType.UPDATE,reqid)
+        return self._addressAction(address,ActionType.UPDATE,reqid)
         
     def _addressAction(self,address,at,reqid=None):
         '''Address action method performing address/action on the change feed
@@ -305,10 +395,11 @@ class DataManager(Observable):
         @type at: ActionType
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        if reqid: address.setRequestId(reqid)
+        address.setRequestId(reqid or nextRequestId())
         self._populateAddress(address).setChangeType(ActionType.reverse[at].title())
-        self._queueAction(FeedRef((FeatureType.ADDRESS,FeedType.CHANGEFEED)), at, address)
+        return self._queueAction(FeedRef((FeatureType.ADDRESS,FeedType.CHANGEFEED)), at, address)
     #----------------------------
     def acceptAddress(self,address,reqid=None):        
         '''Convenience method to send/accept an Address on the resolutionfeed.
@@ -316,8 +407,9 @@ class DataManager(Observable):
         @type address: Address
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._addressApprove(address,ApprovalType.ACCEPT,reqid)    
+        return self._addressApprove(address,ApprovalType.ACCEPT,reqid)    
 
     def declineAddress(self,address,reqid=None):        
         '''Convenience method to send/decline an Address on the resolutionfeed.
@@ -325,8 +417,9 @@ class DataManager(Observable):
         @type address: Address
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._addressApprove(address,ApprovalType.DECLINE,reqid)
+        return self._addressApprove(address,ApprovalType.DECLINE,reqid)
     
     def repairAddress(self,address,reqid=None):        
         '''Convenience method to send/update an Address on the resolutionfeed.
@@ -334,8 +427,9 @@ class DataManager(Observable):
         @type address: Address
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._addressApprove(address,ApprovalType.UPDATE,reqid)     
+        return self._addressApprove(address,ApprovalType.UPDATE,reqid)     
         
     def supplementAddress(self,address,reqid=None):        
         '''Convenience method to fetch additional info on an Address from the resolutionfeed.
@@ -343,6 +437,7 @@ class DataManager(Observable):
         @type address: Address
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
         #HACK. Since a feature address doesn't have a changeid (but its needed for the construction of a resolution feed
         #request) we substitute the changeId for the version number. This usefully also provides the final component of 
@@ -352,7 +447,7 @@ class DataManager(Observable):
         
         #HACK (2). Set changeid to flag supplemental request
         address.setChangeId('{hsi}{cid}'.format(hsi=HACK_SUP_IND,cid=address.getAddressId()))
-        self._addressApprove(address,ApprovalType.SUPPLEMENT,reqid) 
+        return self._addressApprove(address,ApprovalType.SUPPLEMENT,reqid) 
         
         
         
@@ -364,10 +459,11 @@ class DataManager(Observable):
         @type at: ApprovalType
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        if reqid: address.setRequestId(reqid)
+        address.setRequestId(reqid or nextRequestId())
         address.setQueueStatus(ApprovalType.LABEL[at].title())
-        self._queueAction(FeedRef((FeatureType.ADDRESS,FeedType.RESOLUTIONFEED)), at, address)
+        return self._queueAction(FeedRef((FeatureType.ADDRESS,FeedType.RESOLUTIONFEED)), at, address)
         
     #============================
     
@@ -376,24 +472,27 @@ class DataManager(Observable):
         @param group: Group object to accept
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupApprove(group, GroupApprovalType.ACCEPT, reqid)
+        return self._groupApprove(group, GroupApprovalType.ACCEPT, reqid)
         
     def declineGroup(self,group,reqid=None):        
         '''Convenience method to send/decline a Group on the resolutionfeed.
         @param group: Group object to decline
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupApprove(group, GroupApprovalType.DECLINE, reqid) 
+        return self._groupApprove(group, GroupApprovalType.DECLINE, reqid) 
         
     def repairGroup(self,group,reqid=None):        
         '''Convenience method to send/update a Group on the resolutionfeed.
         @param group: Group object to update
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupApprove(group, GroupApprovalType.UPDATE, reqid)   
+        return self._groupApprove(group, GroupApprovalType.UPDATE, reqid)   
         
     def _groupApprove(self,group,gat,reqid=None):
         '''Group approval method performing group/approve actions on the resolution feed
@@ -403,10 +502,11 @@ class DataManager(Observable):
         @type gat: GroupApprovalType
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        if reqid: group.setRequestId(reqid)
+        group.setRequestId(reqid or nextRequestId())
         group.setQueueStatus(GroupApprovalType.LABEL[gat].title())
-        self._queueAction(FeedRef((FeatureType.GROUPS,FeedType.RESOLUTIONFEED)),gat,group)
+        return self._queueAction(FeedRef((FeatureType.GROUPS,FeedType.RESOLUTIONFEED)),gat,group)
           
     #----------------------------
     def replaceGroup(self,group,reqid=None):        
@@ -414,48 +514,54 @@ class DataManager(Observable):
         @param group: Group object to replace
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupAction(group, GroupActionType.REPLACE, reqid)       
+        return self._groupAction(group, GroupActionType.REPLACE, reqid)       
         
     def updateGroup(self,group,reqid=None):        
         '''Convenience method to send/update a Group on the changefeed.
         @param group: Group object to update
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupAction(group, GroupActionType.UPDATE, reqid)       
+        return self._groupAction(group, GroupActionType.UPDATE, reqid)       
         
     def submitGroup(self,group,reqid=None):        
         '''Convenience method to send/submit a Group to the changefeed.
         @param group: Group object to submit
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupAction(group, GroupActionType.SUBMIT, reqid)    
+        return self._groupAction(group, GroupActionType.SUBMIT, reqid)    
     
     def closeGroup(self,group,reqid=None):        
         '''Convenience method to send/close a Group on the changefeed.
         @param group: Group object to close
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupAction(group, GroupActionType.CLOSE, reqid)
+        return self._groupAction(group, GroupActionType.CLOSE, reqid)
         
     def addGroup(self,group,reqid=None):        
         '''Convenience method to send/add a Group to the changefeed.
         @param group: Group object to add
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupAction(group, GroupActionType.ADD, reqid)
+        return self._groupAction(group, GroupActionType.ADD, reqid)
              
     def removeGroup(self,group,reqid=None):        
         '''Convenience method to send/remove a Group from the changefeed.
         @param group: Group object to remove
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._groupAction(group, GroupActionType.REMOVE, reqid)        
+        return self._groupAction(group, GroupActionType.REMOVE, reqid)        
   
     def _groupAction(self,group,gat,reqid=None):        
         '''Group action method performing group/actions on the change feed
@@ -465,18 +571,182 @@ class DataManager(Observable):
         @type gat: GroupActionType
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''        
-        if reqid: group.setRequestId(reqid)
+        group.setRequestId(reqid or nextRequestId())
         self._populateGroup(group).setChangeType(GroupActionType.reverse[gat].title())
-        self._queueAction(FeedRef((FeatureType.GROUPS,FeedType.CHANGEFEED)),gat,group)
+        return self._queueAction(FeedRef((FeatureType.GROUPS,FeedType.CHANGEFEED)),gat,group)
     
     #----------------------------
     
     def _queueAction(self,feedref,atype,aorg):
-        '''Queue and notify'''
-        self.ioq[feedref]['in'].put({atype:(aorg,)})
+        '''Queue and notify
+        @return: RequestFuture resolved with the response
+        '''
+        future = self.ioq[feedref]['resp'].expect(aorg.getRequestId())
+        if self._writesThrough(feedref,atype): future.addCallback(lambda f: self._applyResponses(feedref,atype,[f]))
+        self._enqueue(feedref,{atype:(aorg,)})
+        return future
+    
+    def _queueBatch(self,feedref,atype,features):
+        '''Queue a batch of same type requests as a single input queue entry, the request channel pool sends 
+        them concurrently
+        @return: BatchFuture resolved with the responses
+        '''
+        futures = [self.ioq[feedref]['resp'].expect(f.getRequestId()) for f in features]
+        batch = BatchFuture(futures)
+        #batch results are applied together once every request is answered
+        if self._writesThrough(feedref,atype): batch.addCallback(lambda b: self._applyResponses(feedref,atype,b.futures))
+        self._enqueue(feedref,{atype:tuple(features)})
+        return batch
+    
+    def _writesThrough(self,feedref,atype):
+        '''Tests whether results of an action are applied to the local stores, address changes and approvals 
+        other than supplemental fetches are
+        @param feedref: FeedRef of the feed servicing the request
+        @type feedref: FeedRef
+        @param atype: Action/Approval type
+        @type atype: Integer
+        @return: Boolean
+        '''
+        return feedref == FEEDS['AC'] or (feedref == FEEDS['AR'] and atype != ApprovalType.SUPPLEMENT)
+    
+    def _applyResponses(self,feedref,atype,futures):
+        '''Request callback writing action results straight into the AR and AF stores, their indexes and persistence, 
+        so local edits are reflected without waiting for the next fetch of either feed. Changed feeds are 
+        republished to the main listener
+        @param feedref: FeedRef of the feed servicing the requests
+        @type feedref: FeedRef
+        @param atype: Action/Approval type
+        @type atype: Integer
+        @param futures: Resolved futures of the requests
+        @type futures: List<RequestFuture>
+        '''
+        delta = {FEEDS['AR']:([],[]),FEEDS['AF']:([],[])}
+        for future in futures:
+            resp = future.result(0)
+            if future.error() or not isinstance(resp,Address): continue
+            errors = resp.meta.errors if isinstance(resp.meta.errors,dict) else {}
+            if errors.get('reject'): continue
+            status = getattr(resp,'_queueStatus',None)
+            #an acceptance reporting warnings or errors leaves the change under review
+            if status == 'Accepted' and (errors.get('warning') or errors.get('error')): status = 'Under Review'
+            if getattr(resp,'_changeId',None) is not None:
+                if status in ('Accepted','Declined'): delta[FEEDS['AR']][1].append(resp.getChangeId())
+                else: delta[FEEDS['AR']][0].append(self.castTo(FeedType.RESOLUTIONFEED,resp))
+            if status == 'Accepted' and getattr(resp,'_components_addressId',None) is not None:
+                if str(getattr(resp,'_changeType','')).lower() == 'retire': delta[FEEDS['AF']][1].append(resp.getAddressId())
+                else: delta[FEEDS['AF']][0].append(self._acceptedFeature(resp))
+        changed = [etft for etft,(upserts,deletes) in delta.items() if upserts or deletes]
+        for etft in changed:
+            upserted,deleted = self.persist.apply(etft,*delta[etft])
+            aimslog.info('{} write-through, {} features upserted, {} removed'.format(etft,len(upserted),len(deleted)))
+            delta[etft] = (dict([(DataStore.key(etft,f),f) for f in delta[etft][0]]),deleted)
+        if not changed: return
+        self.checkpointer.request()
+        if hasattr(self,'registered') and self.registered:
+            for etft in changed: self.registered.observe(self,etft,self.persist.get(etft),delta=delta[etft])
+    
+    def _acceptedFeature(self,resp):
+        '''Casts an accepted change into an address feature, filling in the derived values responses don't carry
+        @param resp: Accepted change/resolution response
+        @type resp: Address
+        @return: Address feature
+        '''
+        feature = self.castTo(FeedType.FEATURES,resp)
+        if getattr(feature,'_codes_meshblock',None): feature.setIsMeshblockOverride(True)
+        feature.setFullAddressNumber(feature.getFullNumber())
+        return feature
+    
+    def _enqueue(self,feedref,changelist):
+        '''Puts a request entry on a feed's bounded input queue and notifies the feed. Callers, usually the UI thread, 
+        never wait for room, if the queue is full the entry's requests fail with their futures straight away
+        @param feedref: FeedRef of the feed servicing the requests
+        @type feedref: FeedRef
+        @param changelist: Features keyed by action type
+        @type changelist: Dict<Integer,Tuple<Feature>>
+        '''
+        try:
+            self.ioq[feedref]['in'].put_nowait((time.time(),changelist))
+        except Queue.Full:
+            error = RequestQueueFullException('{} request queue full, {} entries waiting'.format(feedref,IOQ_IN_SIZE))
+            for features in changelist.values():
+                for f in features: self.ioq[feedref]['resp'].fail(f.getRequestId(),error)
+            return
         self.notify(feedref)
     
+    #----------------------------
+    '''Batch actions queue many features at once, each feature gets its own request id'''
+    
+    def retireAddresses(self,addresses):
+        '''Convenience method to send/retire many Addresses from the changefeed.
+        @param addresses: Address objects to retire
+        @type addresses: List<Address>
+        @return: BatchFuture resolved with the responses
+        '''
+        return self._addressActionBatch(addresses,ActionType.RETIRE)
+    
+    def updateAddresses(self,addresses):
+        '''Convenience method to send/update many Addresses on the changefeed.
+        @param addresses: Address objects to update
+        @type addresses: List<Address>
+        @return: BatchFuture resolved with the responses
+        '''
+        return self._addressActionBatch(addresses,ActionType.UPDATE)
+    
+    def acceptAddresses(self,addresses):
+        '''Convenience method to send/accept many Addresses on the resolutionfeed.
+        @param addresses: Address objects to accept
+        @type addresses: List<Address>
+        @return: BatchFuture resolved with the responses
+        '''
+        return self._addressApproveBatch(addresses,ApprovalType.ACCEPT)
+    
+    def declineAddresses(self,addresses):
+        '''Convenience method to send/decline many Addresses on the resolutionfeed.
+        @param addresses: Address objects to decline
+        @type addresses: List<Address>
+        @return: BatchFuture resolved with the responses
+        '''
+        return self._addressApproveBatch(addresses,ApprovalType.DECLINE)
+    
+    def acceptGroups(self,groups):
+        '''Convenience method to send/accept many Groups on the resolutionfeed.
+        @param groups: Group objects to accept
+        @type groups: List<Group>
+        @return: BatchFuture resolved with the responses
+        '''
+        return self._groupApproveBatch(groups,GroupApprovalType.ACCEPT)
+    
+    def declineGroups(self,groups):
+        '''Convenience method to send/decline many Groups on the resolutionfeed.
+        @param groups: Group objects to decline
+        @type groups: List<Group>
+        @return: BatchFuture resolved with the responses
+        '''
+        return self._groupApproveBatch(groups,GroupApprovalType.DECLINE)
+    
+    def _addressActionBatch(self,addresses,at):
+        '''Batch version of _addressAction'''
+        for address in addresses:
+            address.setRequestId(nextRequestId())
+            self._populateAddress(address).setChangeType(ActionType.reverse[at].title())
+        return self._queueBatch(FeedRef((FeatureType.ADDRESS,FeedType.CHANGEFEED)),at,addresses)
+    
+    def _addressApproveBatch(self,addresses,at):
+        '''Batch version of _addressApprove'''
+        for address in addresses:
+            address.setRequestId(nextRequestId())
+            address.setQueueStatus(ApprovalType.LABEL[at].title())
+        return self._queueBatch(FeedRef((FeatureType.ADDRESS,FeedType.RESOLUTIONFEED)),at,addresses)
+    
+    def _groupApproveBatch(self,groups,gat):
+        '''Batch version of _groupApprove'''
+        for group in groups:
+            group.setRequestId(nextRequestId())
+            group.setQueueStatus(GroupApprovalType.LABEL[gat].title())
+        return self._queueBatch(FeedRef((FeatureType.GROUPS,FeedType.RESOLUTIONFEED)),gat,groups)
+    
     #----------------------------
     '''User actions are on-demand only and because they won't be run very often are set up and torn down on each use'''
     
@@ -485,24 +755,27 @@ class DataManager(Observable):
         @param user: User object to add
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._userAction(user, UserActionType.ADD, reqid)
+        return self._userAction(user, UserActionType.ADD, reqid)
         
     def removeUser(self,user,reqid=None):        
         '''Convenience method to send/remove a User from the adminfeed.
         @param user: User object to remove
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._userAction(user, UserActionType.DELETE, reqid)
+        return self._userAction(user, UserActionType.DELETE, reqid)
             
     def updateUser(self,user,reqid=None):        
         '''Convenience method to send/update a User on the adminfeed.
         @param user: User object to update
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''
-        self._userAction(user, UserActionType.UPDATE, reqid)       
+        return self._userAction(user, UserActionType.UPDATE, reqid)       
     
     def _userAction(self,user,uat,reqid=None): 
         '''User action method performing user/action on the admin feed
@@ -512,15 +785,19 @@ class DataManager(Observable):
         @type uat: UserActionType
         @param reqid: User supplied reference value, used to coordinate asynchronous requests/responses
         @type reqid: Integer
+        @return: RequestFuture resolved with the response
         '''       
-        if reqid: user.setRequestId(reqid)
+        user.setRequestId(reqid or nextRequestId())
         #self._populateUser(user).setChangeType(UserActionType.reverse[uat].title())
         #self._queueAction(FeedRef((FeatureType.GROUPS,FeedType.CHANGEFEED)),gat,group)
         etft = FeedRef((FeatureType.USERS,FeedType.ADMIN))
+        if hasattr(self,'uads'): self.uads.stop()
         self.uads,self.ioq[etft] = self._spawnDS(etft,DataSyncAdmin)
-        self.register(self.uads.drc)
-        self.ioq[etft]['in'].put({uat:(user,)})
-        self.notify(etft)
+        self.register(self.uads.drc,(etft,))
+        self.uads.start()
+        future = self.ioq[etft]['resp'].expect(user.getRequestId())
+        self._enqueue(etft,{uat:(user,)})
+        return future
         
     #convenience method for address casting
     def castTo(self,requiredtype,address):
@@ -546,20 +823,44 @@ class DataManager(Observable):
         
 class PersistenceException(AimsException): pass
 class Persistence():
-    '''Independent storage class for persisting configuration and session feature information'''
+    '''Independent storage class for persisting configuration and session feature information.
+    Feed data is held in memory (ADL) and in a local SQLite store. Changes made through set() are recorded as per 
+    feature deltas which are written to the store by write(). The large feeds are also kept as memory-mapped 
+    snapshots which are opened in preference to the store and decode features as they are used, and are 
+    spatially indexed as the deltas are applied
+    '''
+    
+    #feeds large enough to benefit from snapshots and spatial indexing
+    SNAPSHOT_FEEDS = (FEEDS['AF'],FEEDS['AR'])
     
     tracker = {}
     coords = {'sw':SWZERO,'ne':NEZERO}
     ADL = None
     RP = os.path.join(os.path.dirname(__file__),'..',RES_PATH,LOCAL_ADL)
+    DB = RP+'.db'
     
-    def __init__(self,initialise=False):
+    def __init__(self,initialise=False,localdb=DB):
         '''Setup stored/tracked data
         @param initialise: Re-read initial data values
         @type initialise: Boolean
+        @param localdb: Path to local SQLite store
+        @type localdb: String
         '''
+        self.lock = threading.RLock()
+        self.store = DataStore(localdb)
+        self.root = os.path.splitext(localdb)[0]
+        self.snapshots = {}
+        self.indexes = {etft:SpatialIndex() for etft in self.SNAPSHOT_FEEDS}
+        self.versions = {f:{} for f in FEEDS.values()}
+        self.pending = {}
+        #feeds cleared since they were last replaced, their next replacement is published whole
+        self.reset = set()
+        self.saved = None
+        self.loaded = set()
         if initialise or not self.read():
             self.ADL = self._initADL() 
+            for etft in FEEDS.values(): self._pending(etft)['clear'] = True
+            self.loaded = set(FEEDS.values())
             #default tracker, gets overwrittens
             #page = (lowest page fetched, highest page number fetched)
             self.tracker[FEEDS['AF']] = {'page':[1,1],    'index':1,'threads':2,'interval':30}    
@@ -575,6 +876,24 @@ class Persistence():
         '''Read ADL from serial and update from API'''
         return {f:[] for f in FEEDS.values()}
     
+    def _pending(self,etft):
+        '''Returns the unwritten changes recorded for a feed
+        @param etft: FeedRef of the changed feed
+        @type etft: FeedRef
+        @return: Dict with clear flag, upsert {id:(seq,Feature)} and delete set
+        '''
+        return self.pending.setdefault(etft,{'clear':False,'upsert':{},'delete':set()})
+    
+    def _load(self,etft):
+        '''Loads a feed from the local store on first access
+        @param etft: FeedRef of the feed to load
+        @type etft: FeedRef
+        '''
+        with self.lock:
+            if etft not in self.loaded:
+                self.ADL[etft] = self.snapshots[etft] if etft in self.snapshots else self.store.load(etft)
+                self.loaded.add(etft)
+    
     def get(self,etft):
         '''Get data from persistent storage.
         @param etft: Type is feature class to return
@@ -582,9 +901,27 @@ class Persistence():
         @return: List of features
         '''
         if etft: 
+            self._load(etft)
             return self.ADL[etft]
+        for f in FEEDS.values(): self._load(f)
         return self.ADL
     
+    def load(self,etft,ids=None,bbox=None,limit=None,offset=0):
+        '''Reads a subset of a feed directly from the local store without loading the whole feed
+        @param etft: FeedRef of the feed to read
+        @type etft: FeedRef
+        @param ids: Ids of the features to load
+        @type ids: List
+        @param bbox: South-West and North-East coordinate pairs
+        @type bbox: Tuple(List<Double>{2},List<Double>{2})
+        @param limit: Maximum number of features to return
+        @type limit: Integer
+        @param offset: Number of features to skip
+        @type offset: Integer
+        @return: List of features
+        '''
+        return self.store.load(etft,ids,bbox,limit,offset)
+    
     def set(self,etft,data=None,pat=PersistActionType.REPLACE):        
         '''Set some persistent data to the ADL.
         @param etft: Type is features being set or where to store them
@@ -593,49 +930,404 @@ class Persistence():
         @type data: List<Feature>
         @param append: Whether to append to overwrite data in store. Default to append
         @type append: Boolean
+        @return: Delta of the changed features when replacing a feed, None for other actions or a feed replaced 
+        after being cleared, whose earlier contents a delta can't account for
         '''
         #TODO validation of type vs data provided
-        #append a particular type of feature to existing
-        if pat == PersistActionType.APPEND:
-            self.ADL[etft] += data
-        #initialise data for a particular feature type
-        elif pat == PersistActionType.INIT:
-            self.ADL[etft] = self._initADL()[etft]
-        #replace all of a particular feature type    
-        elif pat == PersistActionType.REPLACE:
-            self.ADL[etft] = data
-        #replace all of the persisted data
-        elif pat == PersistActionType.ALL:
-            self.ADL = data
+        with self.lock:
+            #append a particular type of feature to existing
+            if pat == PersistActionType.APPEND:
+                self._load(etft)
+                self._delta(etft,data,len(self.ADL[etft]))
+                if not isinstance(self.ADL[etft],list): self.ADL[etft] = list(self.ADL[etft])
+                self.ADL[etft] += data
+            #initialise data for a particular feature type
+            elif pat == PersistActionType.INIT:
+                self.ADL[etft] = self._initADL()[etft]
+                self._clear(etft)
+                self.reset.add(etft)
+            #replace all of a particular feature type    
+            elif pat == PersistActionType.REPLACE:
+                current = self.ADL[etft] if etft in self.loaded else []
+                upserted,deleted = self._delta(etft,data,replace=True,reuse=current)
+                aimslog.info('{} reconciled, {} of {} features changed, {} removed'.format(etft,len(upserted),len(data or []),len(deleted)))
+                self.ADL[etft] = data
+                self.loaded.add(etft)
+                if etft in self.reset:
+                    self.reset.discard(etft)
+                    return None
+                pending = self._pending(etft)['upsert']
+                return dict([(fid,pending[fid][1]) for fid in upserted]),deleted
+            #replace all of the persisted data
+            elif pat == PersistActionType.ALL:
+                for f in FEEDS.values(): 
+                    self._clear(f)
+                    self._delta(f,data.get(f,[]))
+                self.ADL = data
+                self.loaded = set(FEEDS.values())
+            else:
+                raise PersistenceException('Unknown persistence action, {}'.format(pat))
+            
+    def apply(self,etft,upserts=(),deletes=()):
+        '''Applies individual feature changes, eg request results, to a feed without replacing it. Features replace 
+        those with the same id or are appended. The feed list is rebuilt rather than edited in place so readers 
+        holding the previous list are unaffected
+        @param etft: FeedRef of the changed feed
+        @type etft: FeedRef
+        @param upserts: New or changed features
+        @type upserts: List<Feature>
+        @param deletes: Ids of removed features
+        @type deletes: List
+        @return: Tuple of upserted and deleted ids
+        '''
+        with self.lock:
+            self._load(etft)
+            feats = list(self.ADL[etft])
+            position = dict([(DataStore.key(etft,f,i),i) for i,f in enumerate(feats)])
+            upserted = []
+            for feat in upserts:
+                fid = DataStore.key(etft,feat)
+                if fid in position: feats[position[fid]] = feat
+                else:
+                    position[fid] = len(feats)
+                    feats.append(feat)
+                upserted.append(fid)
+            deleted = [fid for fid in deletes if fid in position and fid not in upserted]
+            for fid in deleted: feats[position[fid]] = None
+            feats = [f for f in feats if f is not None]
+            pending = self._pending(etft)
+            changed = set(upserted)
+            for seq,feat in enumerate(feats):
+                fid = DataStore.key(etft,feat,seq)
+                if fid in changed:
+                    pending['upsert'][fid] = (seq,feat)
+                    pending['delete'].discard(fid)
+                    self.versions[etft][fid] = DataStore.version(feat)
+            for fid in deleted:
+                pending['upsert'].pop(fid,None)
+                pending['delete'].add(fid)
+                self.versions[etft].pop(fid,None)
+            if etft in self.indexes:
+                self.indexes[etft].update([(fid,pending['upsert'][fid][1].getCoordinates()) for fid in changed]+[(fid,None) for fid in deleted])
+            self.ADL[etft] = feats
+        return upserted,deleted
+    
+    def _clear(self,etft):
+        '''Records removal of all features in a feed
+        @param etft: FeedRef of the cleared feed
+        @type etft: FeedRef
+        '''
+        self.pending[etft] = {'clear':True,'upsert':{},'delete':set()}
+        self.versions[etft] = {}
+        self.loaded.add(etft)
+        if etft in self.indexes: self.indexes[etft].clear()
+        
+    def _delta(self,etft,data,start=0,replace=False,reuse=None):
+        '''Compares features against their stored version hashes recording new/changed features for upsert 
+        and, when replacing, features no longer present for deletion. Unchanged features can be swapped for 
+        the equivalent existing instances so consumers comparing feature lists only see the differences
+        @param etft: FeedRef of the changed feed
+        @type etft: FeedRef
+        @param data: List of features being set
+        @type data: List<Feature>
+        @param start: Feed position of the first feature in data
+        @type start: Integer
+        @param replace: Data replaces the whole feed
+        @type replace: Boolean
+        @param reuse: Existing features whose instances replace unchanged features in data, from a Snapshot only 
+        features it has already decoded are reused so the snapshot isn't unpickled to replace decoded features
+        @type reuse: List<Feature>
+        @return: Tuple of upserted and deleted ids
+        '''
+        old = self.versions[etft]
+        new = {} if replace else old
+        pending = self._pending(etft)
+        if isinstance(reuse,Snapshot.Snapshot): existing,instance = reuse.index(),reuse.cached
         else:
-            raise PersistenceException('Unknown persistence action, {}'.format(pat))
+            reuse = reuse or []
+            existing,instance = dict([(DataStore.key(etft,f,i),i) for i,f in enumerate(reuse)]),reuse.__getitem__
+        upserted = []
+        for seq,feat in enumerate(data or [],start):
+            fid,ver = DataStore.key(etft,feat,seq),DataStore.version(feat)
+            if old.get(fid) != ver:
+                pending['upsert'][fid] = (seq,feat)
+                pending['delete'].discard(fid)
+                upserted.append(fid)
+            elif fid in existing:
+                data[seq-start] = instance(existing[fid]) or feat
+            new[fid] = ver
+        deleted = [fid for fid in old if fid not in new] if replace else []
+        for fid in deleted:
+            pending['upsert'].pop(fid,None)
+            pending['delete'].add(fid)
+        self.versions[etft] = new
+        if etft in self.indexes:
+            self.indexes[etft].update([(fid,pending['upsert'][fid][1].getCoordinates()) for fid in upserted]+[(fid,None) for fid in deleted])
+        return upserted,deleted
+
+    def hash(self,etft):
+        '''Returns a hash of a feed's feature versions, computed the same way DataSync hashes fetched feeds
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @return: Integer
+        '''
+        return hash(frozenset(self.versions[etft].values())) if self.versions[etft] else 0
 
-    
     #Disk Access
-    #TODO OS agnostic path sep
     def read(self,localds=RP):
-        '''Read function that unpickles local file store
-        @param localds: Path to local file store
+        '''Reads saved tracker settings and feature versions from the local store. Feature lists are loaded on first use. 
+        An older pickled file store, if found, is migrated into the local store first
+        @param localds: Path to (old) pickled local file store
         @type localds: String
+        @return: Boolean, whether saved settings were found
         '''  
+        if os.path.exists(localds): self._migrate(localds)
         try:
-            archive = pickle.load(open(localds,'rb'))
-            #self.tracker,self.coords,self.ADL = archive
-            self.tracker,self.ADL = archive
-        except:
+            tracker = self.store.getTracker()
+            if not tracker: return False
+            self.tracker = tracker
+            self.saved = copy.deepcopy(tracker)
+            self.ADL = self._initADL()
+            self.loaded = set()
+            for etft in FEEDS.values(): 
+                snap = self._openSnapshot(etft)
+                self.versions[etft] = snap.versions() if snap else self.store.versions(etft)
+                if etft in self.indexes: self.indexes[etft].update(snap.locations() if snap else self.store.coordinates(etft))
+        except (DataStoreException,sqlite3.Error) as e:
+            aimslog.error('Cannot read local store - {}'.format(e))
             return False
         return True
     
-    def write(self, localds=RP):        
-        '''Write function that builds array and pickles this to a local file store
-        @param localds: Path to local file store
+    def _snapshotPath(self,etft,token=''):
+        '''Path of the snapshot file for a feed. Each snapshot is written to a new file named for its token so
+        one still mapped by a reader is never replaced in place
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @param token: Snapshot token, the default returns the pattern matching all of the feed's snapshots
+        @type token: String
+        @return: String
+        '''
+        return '{}.{}.{}snap'.format(self.root,etft.k,token+'.' if token else '*')
+    
+    def _pruneSnapshots(self,etft,keep=None):
+        '''Removes a feed's superseded snapshot files. Open mappings keep their data until released, on Windows a 
+        mapped file can't be removed and is left for a later prune
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @param keep: Path of the current snapshot
+        @type keep: String
+        '''
+        for path in glob.glob(self._snapshotPath(etft)):
+            if path == keep: continue
+            try: os.remove(path)
+            except OSError: pass
+    
+    def _openSnapshot(self,etft):
+        '''Opens a feed's snapshot if it matches the token last recorded in the local store
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @return: Snapshot or None
+        '''
+        if etft not in self.SNAPSHOT_FEEDS: return None
+        token = self.store.getInfo('snapshot.'+etft.k)
+        snap = Snapshot.load(self._snapshotPath(etft,token),etft.k) if token else None
+        if snap and snap.token != token:
+            aimslog.warn('Snapshot {} out of date, reading local store'.format(snap.path))
+            snap.close()
+            snap = None
+        if snap: self.snapshots[etft] = snap
+        else: self.snapshots.pop(etft,None)
+        return snap
+    
+    @staticmethod
+    def snapshotRows(etft,feats,old=None,changed=None):
+        '''Builds the snapshot rows of a feed. Features unchanged since an older snapshot keep its serialised bytes
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @param feats: Features in feed order
+        @type feats: List<Feature>
+        @param old: Earlier snapshot of the feed
+        @type old: Snapshot
+        @param changed: Ids of features changed since the old snapshot, None compares versions instead
+        @type changed: Set
+        @return: List of (id,seq,version,x,y,blob) tuples
+        '''
+        index = old.index() if old else {}
+        versions = old.versions() if old and changed is None else {}
+        rows = []
+        for seq,feat in enumerate(feats):
+            fid,version = DataStore.key(etft,feat,seq),DataStore.version(feat)
+            same = versions.get(fid) == version if changed is None else fid not in changed
+            if fid in index and same: blob = old.blob(index[fid])
+            else: blob = pickle.dumps(feat,pickle.HIGHEST_PROTOCOL)
+            x,y = feat.getCoordinates() or (None,None)
+            rows.append((fid,seq,version,x,y,blob))
+        return rows
+    
+    def _writeSnapshot(self,etft,changed):
+        '''Rewrites a feed's snapshot from the in memory feed. Features not changed since the last snapshot keep their 
+        existing serialised bytes
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @param changed: Ids of features changed since the last snapshot
+        @type changed: Set
+        '''
+        with self.lock:
+            if etft not in self.loaded: return
+            feats = list(self.ADL[etft])
+        t1 = time.time()
+        old = self.snapshots.pop(etft,None)
+        rows = self.snapshotRows(etft,feats,old,changed)
+        #readers may still hold the old snapshot so it isn't closed, its mapping is released once they drop it
+        old = None
+        token = '{:016x}'.format(random.getrandbits(64))
+        path = self._snapshotPath(etft,token)
+        try:
+            size = Snapshot.write(path,etft.k,token,rows)
+            self.store.setInfo('snapshot.'+etft.k,token)
+            self.snapshots[etft] = Snapshot.load(path,etft.k)
+            self._pruneSnapshots(etft,path)
+            aimslog.info('Snapshot {} written, {} features {}B in {:.3f}s'.format(etft,len(rows),size,time.time()-t1))
+        except (Snapshot.SnapshotException,DataStoreException,sqlite3.Error,IOError,OSError) as e:
+            aimslog.error('Cannot write snapshot {} - {}'.format(etft,e))
+    
+    def _migrate(self,localds):
+        '''Copies a pickled file store into the local store and moves the pickle file aside
+        @param localds: Path to pickled local file store
         @type localds: String
+        '''
+        try:
+            with open(localds,'rb') as handle:
+                tracker,adl = pickle.load(handle)
+            self.store.setTracker(tracker)
+            for etft,data in adl.items():
+                self.store.delete(etft)
+                self.store.upsert(etft,[DataStore.row(etft,seq,feat) for seq,feat in enumerate(data)])
+            os.rename(localds,localds+'.migrated')
+            aimslog.info('Migrated {} to local store {}'.format(localds,self.store.path))
+        except Exception as e:
+            aimslog.error('Migration of {} failed - {}'.format(localds,e))
+    
+    def write(self):        
+        '''Write function that saves the tracker and any recorded feature changes to the local store
+        @return: Boolean, whether the write succeeded
         '''  
+        with self.lock:
+            pending,self.pending = self.pending,{}
+            tracker = copy.deepcopy(self.tracker)
         try:
-            #archive = [self.tracker,self.coords,self.ADL]
-            archive = [self.tracker,self.ADL]
-            pickle.dump(archive, open(localds,'wb'))
-        except:
+            with self.store.transaction():
+                self.store.setTracker(tracker)
+                for etft,p in pending.items():
+                    #invalidate the snapshot first so a failed write can't leave it looking current
+                    if etft in self.SNAPSHOT_FEEDS: self.store.setInfo('snapshot.'+etft.k,None)
+                    if p['clear']: self.store.delete(etft)
+                    self.store.delete(etft,list(p['delete']))
+                    self.store.upsert(etft,[DataStore.row(etft,seq,feat) for seq,feat in p['upsert'].values()])
+            self.saved = tracker
+        except (DataStoreException,sqlite3.Error) as e:
+            aimslog.error('Cannot write local store - {}'.format(e))
+            #keep unwritten changes, anything recorded since takes precedence
+            with self.lock:
+                for etft,p in pending.items():
+                    if etft not in self.pending: self.pending[etft] = p
+                    elif not self.pending[etft]['clear']:
+                        newer = self.pending[etft]
+                        p['upsert'].update(newer['upsert'])
+                        p['delete'] = (p['delete']|newer['delete'])-set(newer['upsert'])
+                        for fid in newer['delete']: p['upsert'].pop(fid,None)
+                        self.pending[etft] = p
+            return False
+        for etft,p in pending.items():
+            if etft in self.SNAPSHOT_FEEDS: self._writeSnapshot(etft,set(p['upsert']))
+        return True
+    
+    def dirty(self):
+        '''Tests for feed or tracker changes not yet written
+        @return: Boolean
+        '''
+        with self.lock:
+            return bool(self.pending) or self.tracker != self.saved
+    
+    def size(self):
+        '''Size on disk of the local store, its write ahead log and the snapshots
+        @return: Integer bytes
+        '''
+        paths = [self.store.path,self.store.path+'-wal']+[p for etft in self.SNAPSHOT_FEEDS for p in glob.glob(self._snapshotPath(etft))]
+        return sum([os.path.getsize(p) for p in paths if os.path.exists(p)])
+    
+    def close(self):
+        '''Closes the local store and snapshots'''
+        for snap in self.snapshots.values(): snap.close()
+        self.store.close()
+
+
+class Checkpointer(threading.Thread):
+    '''Write-behind thread saving Persistence changes on a throttled schedule so the UI and DataSync threads never wait on disk writes'''
+    
+    def __init__(self,persist,interval=CHECKPOINT_INTERVAL,gap=CHECKPOINT_MIN_GAP):
+        '''Initialise checkpoint thread
+        @param persist: Persistence object being saved
+        @type persist: Persistence
+        @param interval: Seconds between scheduled checkpoints
+        @type interval: Integer
+        @param gap: Minimum seconds between checkpoints
+        @type gap: Integer
+        '''
+        super(Checkpointer,self).__init__()
+        self.persist = persist
+        self.interval = interval
+        self.gap = gap
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.last = 0
+        self.stats = {'count':0,'failed':0,'time':0.0,'max':0.0,'size':0}
+        self.setDaemon(True)
+        self.setName('Checkpointer')
+        
+    def request(self):
+        '''Asks for a checkpoint ahead of schedule, still no sooner than the minimum gap after the last one'''
+        self._wake.set()
+        
+    def run(self):
+        '''Checkpoint loop, a final checkpoint is made on stop'''
+        while not self._stop.isSet():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.isSet(): break
+            wait = self.last + self.gap - time.time()
+            if wait > 0: self._stop.wait(wait)
+            self.checkpoint()
+        self.checkpoint()
+        
+    def checkpoint(self):
+        '''Writes persisted changes if there are any, recording checkpoint duration and store size
+        @return: Boolean, whether a write was needed and succeeded
+        '''
+        if not self.persist.dirty(): return False
+        t1 = time.time()
+        ok = self.persist.write()
+        tdif = time.time()-t1
+        self.last = time.time()
+        self.stats['count'] += 1
+        self.stats['failed'] += 0 if ok else 1
+        self.stats['time'] += tdif
+        self.stats['max'] = max(self.stats['max'],tdif)
+        self.stats['size'] = self.persist.size()
+        aimslog.info('Checkpoint {} in {:.3f}s, local store {}B'.format('written' if ok else 'failed',tdif,self.stats['size']))
+        return ok
+    
+    def stop(self,timeout=THREAD_JOIN_TIMEOUT):
+        '''Stops the thread after a final checkpoint, waiting up to timeout seconds for it to finish
+        @param timeout: Join timeout
+        @type timeout: Integer
+        @return: Boolean, whether the thread has finished
+        '''
+        self._stop.set()
+        self._wake.set()
+        if self.isAlive(): self.join(timeout)
+        if self.isAlive():
+            aimslog.warn('Final checkpoint still running after {}s'.format(timeout))
             return False
         return True
 
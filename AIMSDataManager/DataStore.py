@@ -0,0 +1,267 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''DataStore module providing an SQLite backed local store for feed features and tracker settings'''
+
+import sqlite3
+import pickle
+import threading
+from contextlib import contextmanager
+from AimsUtility import FEEDS,FEEDKEY
+from AimsUtility import AimsException
+from AimsLogging import Logger
+
+aimslog = Logger.setup()
+
+#increment when the table layout changes, older stores are dropped and rebuilt
+SCHEMA_VERSION = 1
+#ids per query when loading by id
+MAX_VARS = 500
+
+class DataStoreException(AimsException): pass
+
+class DataStore(object):
+    '''Local feature store holding one table per feed. Rows are keyed on the feature id and hold a serialised feature
+    with its version hash and location so changes can be written as deltas and subsets loaded without reading everything
+    '''
+
+    def __init__(self,path):
+        '''Opens (creating if necessary) an SQLite store
+        @param path: Path to the database file
+        @type path: String
+        '''
+        self.path = path
+        self.lock = threading.RLock()
+        self.intx = False
+        try:
+            self.conn = sqlite3.connect(path,check_same_thread=False)
+            self.conn.text_factory = str
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self._setup()
+        except sqlite3.Error as e:
+            raise DataStoreException('Cannot open local store {} - {}'.format(path,e))
+
+    @contextmanager
+    def transaction(self):
+        '''Groups the writes made inside it into one transaction, committed on exit or rolled back on error. 
+        Writes made outside a transaction are each committed on their own'''
+        with self.lock:
+            if self.intx:
+                yield
+                return
+            self.intx = True
+            try:
+                with self.conn: yield
+            finally:
+                self.intx = False
+
+    def _setup(self):
+        '''Creates the tracker, info and per feed tables, rebuilding them on a schema version mismatch'''
+        with self.transaction():
+            self.conn.execute('CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value)')
+            row = self.conn.execute('SELECT value FROM info WHERE key=?',('schema',)).fetchone()
+            if row and row[0] != SCHEMA_VERSION:
+                aimslog.warn('Local store schema {} replaced with {}'.format(row[0],SCHEMA_VERSION))
+                self.conn.execute('DROP TABLE IF EXISTS tracker')
+                for etft in FEEDS.values(): self.conn.execute('DROP TABLE IF EXISTS {}'.format(self.table(etft)))
+            self.conn.execute('INSERT OR REPLACE INTO info (key,value) VALUES (?,?)',('schema',SCHEMA_VERSION))
+            self.conn.execute('CREATE TABLE IF NOT EXISTS tracker (feed TEXT PRIMARY KEY, data BLOB)')
+            for etft in FEEDS.values():
+                t = self.table(etft)
+                self.conn.execute('CREATE TABLE IF NOT EXISTS {} (id NOT NULL PRIMARY KEY, seq INTEGER, version TEXT, x REAL, y REAL, data BLOB)'.format(t))
+                self.conn.execute('CREATE INDEX IF NOT EXISTS {0}_seq ON {0} (seq)'.format(t))
+                self.conn.execute('CREATE INDEX IF NOT EXISTS {0}_xy ON {0} (x,y)'.format(t))
+
+    @staticmethod
+    def table(etft):
+        '''Table name for a feed
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @return: String
+        '''
+        return 'feed_{}'.format(etft.k.replace('.','_'))
+
+    @staticmethod
+    def key(etft,feature,seq=None):
+        '''Returns the identifying value of a feature in its feed, falling back to its position for unidentified features
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @param feature: Feature being keyed
+        @type feature: Feature
+        @param seq: Position of the feature in its feed list
+        @type seq: Integer
+        @return: Feature id
+        '''
+        fid = getattr(feature,FEEDKEY.get(etft,''),None)
+        return fid if fid is not None else '#{}'.format(seq)
+
+    @staticmethod
+    def version(feature):
+        '''Returns the version hash of a feature reusing the hash computed during sync if available
+        @param feature: Feature being versioned
+        @type feature: Feature
+        @return: String
+        '''
+        meta = feature.getMeta()
+        return meta.hash if meta and meta.hash else feature.getHash()
+
+    @staticmethod
+    def row(etft,seq,feature):
+        '''Builds a table row tuple from a feature
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @param seq: Position of the feature in its feed list
+        @type seq: Integer
+        @param feature: Feature being stored
+        @type feature: Feature
+        @return: Tuple (id,seq,version,x,y,data)
+        '''
+        xy = feature.getCoordinates() or (None,None)
+        blob = sqlite3.Binary(pickle.dumps(feature,pickle.HIGHEST_PROTOCOL))
+        return (DataStore.key(etft,feature,seq),seq,DataStore.version(feature),xy[0],xy[1],blob)
+
+    #--------------------------------------------------------------------------
+
+    def upsert(self,etft,rows):
+        '''Inserts or replaces feature rows
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @param rows: Row tuples as built by row()
+        @type rows: List<Tuple>
+        '''
+        if not rows: return
+        with self.transaction():
+            self.conn.executemany('INSERT OR REPLACE INTO {} (id,seq,version,x,y,data) VALUES (?,?,?,?,?,?)'.format(self.table(etft)),rows)
+
+    def delete(self,etft,ids=None):
+        '''Deletes feature rows by id or all rows if no ids are given
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @param ids: Ids of the rows to remove
+        @type ids: List
+        '''
+        with self.transaction():
+            if ids is None:
+                self.conn.execute('DELETE FROM {}'.format(self.table(etft)))
+            elif ids:
+                self.conn.executemany('DELETE FROM {} WHERE id=?'.format(self.table(etft)),[(i,) for i in ids])
+
+    def load(self,etft,ids=None,bbox=None,limit=None,offset=0):
+        '''Reads features from the store in feed order, optionally restricted to a set of ids, a bounding box or a page
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @param ids: Ids of the features to load
+        @type ids: List
+        @param bbox: South-West and North-East coordinate pairs
+        @type bbox: Tuple(List<Double>{2},List<Double>{2})
+        @param limit: Maximum number of features to return
+        @type limit: Integer
+        @param offset: Number of features to skip
+        @type offset: Integer
+        @return: List<Feature>
+        '''
+        #past the sqlite bound variable limit ids are joined from a temp table so feed order and paging still apply
+        bulk = ids is not None and len(ids) > MAX_VARS
+        sql,args = 'SELECT data FROM {}'.format(self.table(etft)),[]
+        where = []
+        if bulk:
+            where.append('id IN (SELECT id FROM load_ids)')
+        elif ids is not None:
+            where.append('id IN ({})'.format(','.join('?'*len(ids))))
+            args += list(ids)
+        if bbox:
+            (x0,y0),(x1,y1) = bbox
+            where.append('x BETWEEN ? AND ? AND y BETWEEN ? AND ?')
+            args += [min(x0,x1),max(x0,x1),min(y0,y1),max(y0,y1)]
+        if where: sql += ' WHERE '+' AND '.join(where)
+        sql += ' ORDER BY seq'
+        if limit: sql += ' LIMIT {} OFFSET {}'.format(int(limit),int(offset))
+        if not bulk:
+            with self.lock:
+                rows = self.conn.execute(sql,args).fetchall()
+        else:
+            with self.transaction():
+                self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS load_ids (id PRIMARY KEY)')
+                self.conn.executemany('INSERT OR IGNORE INTO load_ids (id) VALUES (?)',[(i,) for i in ids])
+                rows = self.conn.execute(sql,args).fetchall()
+                self.conn.execute('DELETE FROM load_ids')
+        return [pickle.loads(str(r[0])) for r in rows]
+
+    def versions(self,etft):
+        '''Returns the stored version hash of every feature in a feed
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @return: Dict<id,String>
+        '''
+        with self.lock:
+            return dict(self.conn.execute('SELECT id,version FROM {}'.format(self.table(etft))).fetchall())
+
+    def coordinates(self,etft):
+        '''Returns the stored location of every feature in a feed
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @return: List<Tuple(id,Tuple(Double,Double))>
+        '''
+        with self.lock:
+            return [(fid,(x,y)) for fid,x,y in self.conn.execute('SELECT id,x,y FROM {}'.format(self.table(etft))).fetchall()]
+
+    def count(self,etft):
+        '''Number of stored features in a feed
+        @param etft: Feed/Feature identifier
+        @type etft: FeedRef
+        @return: Integer
+        '''
+        with self.lock:
+            return self.conn.execute('SELECT count(*) FROM {}'.format(self.table(etft))).fetchone()[0]
+
+    def getInfo(self,key):
+        '''Reads a value from the store info table
+        @param key: Info key
+        @type key: String
+        @return: Stored value or None
+        '''
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM info WHERE key=?',(key,)).fetchone()
+        return row[0] if row else None
+
+    def setInfo(self,key,value):
+        '''Saves a value to the store info table
+        @param key: Info key
+        @type key: String
+        @param value: Value to save
+        '''
+        with self.transaction():
+            self.conn.execute('INSERT OR REPLACE INTO info (key,value) VALUES (?,?)',(key,value))
+
+    def getTracker(self):
+        '''Reads saved feed tracker settings
+        @return: Dict<FeedRef,Dict>
+        '''
+        with self.lock:
+            rows = self.conn.execute('SELECT feed,data FROM tracker').fetchall()
+        keys = dict([(etft.k,etft) for etft in FEEDS.values()])
+        return dict([(keys[f],pickle.loads(str(d))) for f,d in rows if f in keys])
+
+    def setTracker(self,tracker):
+        '''Saves feed tracker settings
+        @param tracker: Tracker settings per feed
+        @type tracker: Dict<FeedRef,Dict>
+        '''
+        with self.transaction():
+            self.conn.executemany('INSERT OR REPLACE INTO tracker (feed,data) VALUES (?,?)',
+                                  [(etft.k,sqlite3.Binary(pickle.dumps(t,pickle.HIGHEST_PROTOCOL))) for etft,t in tracker.items()])
+
+    def close(self):
+        '''Closes the database connection'''
+        with self.lock:
+            self.conn.close()
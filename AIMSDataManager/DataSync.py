@@ -20,7 +20,7 @@ import time
 import threading
 import Queue
 
-from Observable import Observable
+from Observable import Observable,bus
 from DataUpdater import DataUpdater,DataUpdaterAction,DataUpdaterApproval,DataUpdaterGroupAction,DataUpdaterGroupApproval,DataUpdaterUserAction
 from AimsApi import AimsApi 
 from AimsLogging import Logger
@@ -28,6 +28,8 @@ from AimsUtility import ActionType,ApprovalType,GroupActionType,GroupApprovalTyp
 from AimsUtility import AimsException
 from Const import MAX_FEATURE_COUNT,THREAD_JOIN_TIMEOUT,PAGE_LIMIT,POOL_PAGE_CHECK_DELAY,THREAD_KEEPALIVE,FIRST_PAGE,LAST_PAGE_GUESS,ENABLE_ENTITY_EVALUATION,NULL_PAGE_VALUE as NPV
 from FeatureFactory import FeatureFactory
+import FeaturePool
+import AimsCodec
 aimslog = None
 
 FPATH = os.path.join('..',os.path.dirname(__file__)) #base of local datastorage
@@ -39,43 +41,148 @@ FPATH = os.path.join('..',os.path.dirname(__file__)) #base of local datastorage
 
 pool_lock = threading.Lock()
 
+#number of worker threads servicing requests for each DRC
+DRC_WORKERS = 4
+#tasks queued per worker before the DRC stops taking requests off its input queue
+DRC_BACKLOG = 2
+
 class IncorrectlyConfiguredRequestClientException(AimsException):pass
 
+class WorkerPool(object):
+    '''Fixed size pool of daemon threads running submitted tasks in submission order'''
+    
+    def __init__(self,name,size=DRC_WORKERS):
+        '''Initialise and start the pool threads
+        @param name: Prefix for worker thread names
+        @type name: String
+        @param size: Number of worker threads, the most tasks that run at once
+        @type size: Integer
+        '''
+        #bounded so a busy pool holds requests back on the feed's input queue
+        self.tasks = Queue.Queue(size*DRC_BACKLOG)
+        self.workers = []
+        for i in range(size):
+            w = threading.Thread(target=self._work,name='{}.W{}'.format(name,i))
+            w.setDaemon(True)
+            w.start()
+            self.workers.append(w)
+        
+    def submit(self,func,*args):
+        '''Queue a task for the next free worker, blocking while the pool's backlog is full
+        @param func: Task function
+        @type func: Function
+        @param *args: Task function args
+        '''
+        self.tasks.put((func,args))
+        
+    def _work(self):
+        '''Worker loop, exits on a None task'''
+        while True:
+            task = self.tasks.get()
+            if task is None: break
+            func,args = task
+            try:
+                func(*args)
+            except Exception as e:
+                aimslog.error('{} task failed - {}'.format(threading.currentThread().getName(),e))
+        
+    def stop(self):
+        '''Stops each worker once the tasks already queued are done'''
+        for _ in self.workers: self.tasks.put(None)
+        
+
 
 class DataRequestChannel(Observable):
     '''Observable class providing request/response channel for user initiated actions '''
     
-    def __init__(self,client):
+    def __init__(self,client,workers=DRC_WORKERS):
         '''Initialises a new DRC using an instance of a feeds DataSync to communincate with contained feed functions
         @param client: DataSync object used as proxy to communicate with API
         @type client: DataSyncFeeds
+        @param workers: Number of requests sent to the API at once
+        @type workers: Integer
         '''
         super(DataRequestChannel,self).__init__()
-        if hasattr(client,'etft') and hasattr(client,'inq') and hasattr(client,'processInputQueue'):
+        if hasattr(client,'etft') and hasattr(client,'inq') and hasattr(client,'processFeature'):
             self.client = client
         else:
-            raise IncorrectlyConfiguredRequestClientException('Require client with [ etft,inq,pIQ() ] attributes')
+            raise IncorrectlyConfiguredRequestClientException('Require client with [ etft,inq,pF() ] attributes')
+        self.workers = workers
+        self.pool = None
+        self.stats_lock = threading.Lock()
+        self.rstats = {}
         
     def run(self):
-        '''Run method using loop for thread keepalive'''
-        while not self.stopped():
-            aimslog.debug('DRC {} listening'.format(self.client.etft))
-            time.sleep(THREAD_KEEPALIVE)
+        '''Consumer loop blocking on the client input queue. Each wakeup drains the queue and hands every feature 
+        in the batch to the worker pool, input queue entries are (timestamp,changelist) pairs
+        '''
+        self.pool = WorkerPool(self.getName(),self.workers)
+        try:
+            while not self.stopped():
+                try:
+                    batch = [self.client.inq.get(timeout=THREAD_KEEPALIVE)]
+                except Queue.Empty:
+                    continue
+                while True:
+                    try: batch.append(self.client.inq.get_nowait())
+                    except Queue.Empty: break
+                aimslog.info('DRC {} - found {} items in queue'.format(self.client.etft,len(batch)))
+                for queued,changelist in batch:
+                    for at in changelist:
+                        for feature in changelist[at]:
+                            self.pool.submit(self._service,at,feature,queued)
+        finally:
+            self.pool.stop()
+            
+    def _service(self,at,feature,queued):
+        '''Pool task sending a single feature request and recording its wait and service times
+        @param at: Address/Group Action/Approval type indicator
+        @type at: Integer 
+        @param feature: Feature being acted upon/approved
+        @type feature: Feature
+        @param queued: Time the request was put on the input queue
+        @type queued: Float
+        '''
+        start = time.time()
+        try:
+            ref = self.client.processFeature(at,feature)
+            aimslog.info('{} request complete'.format(ref))
+        except Exception as e:
+            #resolve the waiting future rather than leave it to time out
+            if hasattr(self.client.respq,'fail'): self.client.respq.fail(feature.getRequestId(),e)
+            raise
+        finally:
+            self._record(self.client.parameters[self.client.etft]['atype'].reverse[at],start-queued,time.time()-start)
+        
+    def _record(self,rtype,wait,service):
+        '''Accumulate timings for a request type'''
+        with self.stats_lock:
+            s = self.rstats.setdefault(rtype,{'count':0,'wait':0.0,'service':0.0,'maxwait':0.0,'maxservice':0.0})
+            s['count'] += 1
+            s['wait'] += wait
+            s['service'] += service
+            s['maxwait'] = max(s['maxwait'],wait)
+            s['maxservice'] = max(s['maxservice'],service)
+        aimslog.debug('DRC {} {} waited {:.3f}s, serviced in {:.3f}s'.format(self.client.etft,rtype,wait,service))
+            
+    def stats(self):
+        '''Returns request timings for each request type
+        @return: Dict<String,Dict> of count, mean/max queue wait and mean/max service time in seconds
+        '''
+        with self.stats_lock:
+            return dict([(rtype,{'count':s['count'],'wait':s['wait']/s['count'],'maxwait':s['maxwait'],
+                                 'service':s['service']/s['count'],'maxservice':s['maxservice']})
+                         for rtype,s in self.rstats.items()])
     
     def observe(self,_,*args,**kwargs):
-        '''Override of observe method receiving calls from DataManager to trigger requests, on client
+        '''Override of observe method receiving DataManager notifications. Requests are picked up from the input queue 
+        by the run loop so there is nothing to do here
         @param _: Discarded observable.
         @param *args: Wrapped args
         @param **kwargs: Wrapped kwargs
         '''
         if self.stopped(): 
             aimslog.warn('DM attempt to call stopped DRC listener {}'.format(self.getName()))
-            return
-        aimslog.info('Processing request {}'.format(args[0]))
-        if self.client.etft==args[0] and not self.client.inq.empty():
-            changelist = self.client.inq.get()    
-            aimslog.info('DRC {} - found {} items in queue'.format(self.client.etft,len(changelist)))
-            self.client.processInputQueue(changelist)
 
     
 class DataSync(Observable):
@@ -104,6 +211,10 @@ class DataSync(Observable):
         #thread reference, ft to AD/CF/RF, config info
         self.start_time = time.time()
         self.updater_running = False
+        #last sign of progress, a fetch starting or a page arriving
+        self.heartbeat = time.time()
+        #called with (etft,self,exception) when the run loop ends
+        self.exitcallback = None
         self.ref,self.etft,self.ftracker,self.conf = params
         self.data_hash = {dh:0 for dh in FEEDS.values()}
         self.factory = FeatureFactory.getInstance(self.etft)
@@ -123,10 +234,17 @@ class DataSync(Observable):
         self.sw,self.ne = sw,ne
 
     def run(self):
-        '''Continual loop running periodic feed fetch updates'''
-        while not self.stopped():
-            if not self.updater_running: self.fetchFeedUpdates(self.ftracker['threads'])
-            time.sleep(self.ftracker['interval'])
+        '''Continual loop running periodic feed fetch updates. The exit callback is called however the loop ends'''
+        error = None
+        try:
+            while not self.stopped():
+                if not self.updater_running: self.fetchFeedUpdates(self.ftracker['threads'])
+                time.sleep(self.ftracker['interval'])
+        except Exception as e:
+            error = e
+            aimslog.error('DataSync {} failed - {}'.format(self.etft,e))
+        finally:
+            if self.exitcallback: self.exitcallback(self.etft,self,error)
             
     #@override
     def stop(self):
@@ -161,6 +279,7 @@ class DataSync(Observable):
         #print [r['ref'] for r in self.pool]
         #print 'extracting queue for DU pool {}'.format(ref)
         r = None
+        self.heartbeat = time.time()
         with pool_lock:
             aimslog.info('{} complete'.format(ref))
             #print 'POOLSTATE',self.pool  
@@ -208,6 +327,7 @@ class DataSync(Observable):
         @type lastpage: Integer
         '''
         self.updater_running = True
+        self.heartbeat = time.time()
         self.exhausted = PAGE_LIMIT
         self.lastpage = lastpage
         self.newaddr = []
@@ -233,7 +353,7 @@ class DataSync(Observable):
         ref = 'FP.{0}.Page{1}.{2:%y%m%d.%H%M%S}.p{3}'.format(self.etft,pno,DT.now(),pno)
         aimslog.info('init DU {}'.format(ref))
         self.duinst[ref] = self._fetchPage(ref,pno)
-        self.duinst[ref].register(self)
+        self.duinst[ref].register(self,(ref,))
         self.duinst[ref].start()
         return ref    
     
@@ -270,6 +390,9 @@ class DataSync(Observable):
             self.outq.put(new_addresses)
             self.outq.task_done()
             self.notify(self.etft)
+            FeaturePool.logStats()
+            AimsCodec.logStats()
+            bus.logStats()
 
     #--------------------------------------------------------------------------
     
@@ -349,39 +472,22 @@ class DataSyncFeeds(DataSync):
         return super(DataSyncFeeds,self).stopped() and self.drc.stopped() 
     
     
-    #Processes the input queue sending address changes to the API
-    #@LogWrap.timediff
-    def processInputQueue(self,changelist):
-        '''Take the requests from an input queue and split out individual address objects for DU processing
-        @param changelist: Dictionary of address lists taken from the input queue
-        @type changelist: Dictionary<FeedRef,List<Feature>>  
-        '''
-        #{ADD:addr_1,RETIRE:adr_2...
-        for at in changelist:
-            #self.outq.put(act[addr](changelist[addr]))
-            for feature in changelist[at]:
-                duref = self.processFeature(at,feature)
-                aimslog.info('{} thread started'.format(str(duref)))
-                
     def processFeature(self,at,feature): 
-        '''Individual feature request processor.
+        '''Individual feature request processor, sends the request on the calling (DRC pool) thread 
+        and puts the response on the response queue
         @param at: Address/Group Action/Approval type indicator
         @type at: Integer 
         @param feature: Feature being acted upon/approved
         @type feature: Feature
-        @return: Reference value for DataUpdater thread
+        @return: Reference value for the request
         '''
         at2 = self.parameters[self.etft]['atype'].reverse[at][:3].capitalize()      
-        ref = 'PR.{0}.{1:%y%m%d.%H%M%S}'.format(at2,DT.now())
+        ref = 'PR.{0}.{1:%y%m%d.%H%M%S.%f}'.format(at2,DT.now())
         params = (ref,self.conf,self.factory)
-        #self.ioq = {'in':Queue.Queue(),'out':Queue.Queue()}
-        self.duinst[ref] = self.parameters[self.etft]['action'](params,self.respq)
-        self.duinst[ref].setup(self.etft,at,feature,None)
-        #print 'PROCESS FEAT',self.etft,ref
-        self.duinst[ref].setName(ref)
-        self.duinst[ref].setDaemon(True)
-        self.duinst[ref].start()
-        #self.duinst[ref].join()
+        du = self.parameters[self.etft]['action'](params,self.respq)
+        du.setup(self.etft,at,feature,None)
+        du.setName(ref)
+        du.run()
         return ref
     
     def managePage(self,p):
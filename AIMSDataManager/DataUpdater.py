@@ -26,6 +26,7 @@ from Address import Entity, EntityValidation, EntityAddress
 from AimsLogging import Logger
 from FeatureFactory import FeatureFactory
 from Observable import Observable
+import FeaturePool
 
 aimslog = None
 
@@ -85,7 +86,10 @@ class DataUpdater(Observable):
         if any(ce.values()): aimslog.error('Single-page request failure {}'.format(ce))       
         if pages.has_key('entities'): 
             for page in pages['entities']:
-                featlist.append(self.processPage(page,self.etft))     
+                feat = self.processPage(page,self.etft)
+                #build labels here, off the UI thread
+                if feat: feat.derive()
+                featlist.append(feat)     
         else:
             aimslog.error('Single-page response missing entities')
         self.queue.put(featlist)
@@ -141,9 +145,9 @@ class DataUpdater(Observable):
         '''Wraps call to validation entity instantiator
         @param feat: dict representation of feature before object processing
         @type feat: Dict
-        @return: Instantiated validation Entity
+        @return: Instantiated validation Entity, shared with other features carrying the same validation message
         '''
-        return EntityValidation.getInstance(feat)
+        return FeaturePool.entities.get(feat,EntityValidation.getInstance)
     
     def _processAddressEntity(self,feat):        
         '''Processes feature data into address object
@@ -354,8 +358,11 @@ class DataUpdaterDRC(DataUpdater):
             aimslog.info('Merge req/res for {}'.format(self.agu))
             self.agu.setVersion(None)
             self.agu.merge(feature,MERGE_EXCLUDE)
+            self.agu.derive()
             self.queue.put(self.agu)
-        else: self.queue.put(feature)
+        else: 
+            feature.derive()
+            self.queue.put(feature)
         self.notify(self.ref)
         
         
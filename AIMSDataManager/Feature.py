@@ -20,8 +20,10 @@ from AimsLogging import Logger
 
 aimslog = None
 
+# cached labels built from other attributes, dropped whenever a contributing attribute is set
+DERIVED_ATTRS = ('_derived_fullNumber','_derived_fullRoad')
 # ref is time variable, adrpo is nested and covered by changeid, meta contains non object attrs
-HASH_EXCLUDES = ('_ref', '_address_positions','meta')
+HASH_EXCLUDES = ('_ref', '_address_positions','meta') + DERIVED_ATTRS
 
 class Feature(object):
     '''Feature data object representing AIMS primary objects Addresses, Groups and Users'''
@@ -65,6 +67,7 @@ class Feature(object):
         return self._workflow_sourceOrganisation
     def setChangeType(self, changeType):
         self._changeType = changeType
+        self._invalidate()
     def getChangeType(self):
         return self._changeType
     
@@ -75,9 +78,24 @@ class Feature(object):
     
     #---------------------------------------------------
     
+    def getCoordinates(self):
+        '''Returns the primary coordinate pair for the feature. Null method on features without a location
+        @return: List<Double>{2} or None
+        '''
+        return None
+    
+    def derive(self):
+        '''Precomputes derived (label) attributes. Null method on features without derived attributes'''
+        pass
+    
+    def _invalidate(self):
+        '''Discards cached derived attributes so they are rebuilt on next access'''
+        for attr in DERIVED_ATTRS: self.__dict__.pop(attr,None)
+    
     def _setEntities(self,entities):
         self.setMeta()
         self.meta.entities = entities
+        self._invalidate()
  
     def _getEntities(self):
         return self.meta.entities
@@ -104,6 +122,7 @@ class Feature(object):
         '''
         for key in other.__dict__.keys():
             if key not in exclude.split(','): setattr(self,key, getattr(other,key))
+        self._invalidate()
         return self
     
     
@@ -116,6 +135,7 @@ class Feature(object):
         '''
         self.setMeta()
         self.meta.requestId = requestId      
+        self._invalidate()
            
     def getRequestId(self):
         return self.meta.requestId if hasattr(self,'meta') else None
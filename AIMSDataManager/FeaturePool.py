@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''FeaturePool module holding shared value pools used to deduplicate repeated strings and entity objects across feature sets'''
+
+import sys
+import threading
+from AimsLogging import Logger
+from Const import DEF_SEP
+
+aimslog = Logger.setup()
+
+#flattened attribute names whose values repeat heavily across a feed and are worth interning. Low cardinality
+#fields only, per feature values such as meshblocks and generic names like 'name' or 'type' would only grow the pools
+INTERN_FIELDS = ('addressType','lifecycle','unitType','levelType','roadPrefix','roadType','roadSuffix',
+                 'waterRoute','suburbLocality','townCity','objectType','changeType','queueStatus',
+                 'sourceOrganisation','sourceReason','submitterUserName','reviewedUserName',
+                 'positionType','groupType','organisation','role')
+#most values held by each pool, once full new values are returned unpooled
+POOL_LIMIT = 20000
+
+class InternPool(object):
+    '''String pool returning a single shared instance for equal string values.
+    - I{Builtin intern() rejects unicode in Python 2 so a dict is used instead}.
+    - I{Lookups take no lock, dict.get and dict.setdefault are atomic for string keys. Counters are approximate under concurrent use}.
+    '''
+
+    def __init__(self,limit=POOL_LIMIT):
+        '''Initialise empty string pool and counters
+        @param limit: Most strings held
+        @type limit: Integer
+        '''
+        self._pool = {}
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0
+
+    def intern(self,val):
+        '''Returns the pooled instance of a string value, adding it to the pool if not already present.
+        Non string values are returned unchanged.
+        @param val: Value to intern
+        @type val: String
+        @return: Shared string instance
+        '''
+        if not isinstance(val,basestring): return val
+        pool = self._pool
+        pooled = pool.get(val)
+        if pooled is None:
+            self.misses += 1
+            if len(pool) >= self.limit: return val
+            pooled = pool.setdefault(val,val)
+        if pooled is not val:
+            self.hits += 1
+            self.saved += sys.getsizeof(val)
+        return pooled
+
+    def __len__(self):
+        return len(self._pool)
+
+    def stats(self):
+        '''Returns pool usage counters
+        @return: Dict of size, hits, misses and estimated bytes saved
+        '''
+        return {'size':len(self._pool),'hits':self.hits,'misses':self.misses,'saved':self.saved}
+
+    def clear(self):
+        '''Empties the pool and resets counters'''
+        self._pool = {}
+        self.hits,self.misses,self.saved = 0,0,0
+
+class EntityPool(object):
+    '''Flyweight pool for validation entities. Identical rule/description/severity entities are shared between features'''
+
+    def __init__(self,strings,limit=POOL_LIMIT):
+        '''Initialise empty entity pool
+        @param strings: String pool used to intern entity attribute values
+        @type strings: InternPool
+        @param limit: Most entities held
+        @type limit: Integer
+        '''
+        self._pool = {}
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.strings = strings
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0
+
+    @staticmethod
+    def key(d):
+        '''Builds a hashable key from an entity dict
+        @param d: Dict containing Entity object attributes
+        @return: Tuple key
+        '''
+        p = d.get('properties',{})
+        return (tuple(d.get('class',())),tuple(d.get('rel',())),p.get('ruleId'),p.get('description'),p.get('severity'))
+
+    def get(self,d,builder):
+        '''Returns a shared entity matching the entity dict, building one with the supplied builder if not present
+        @param d: Dict containing Entity object attributes
+        @param builder: Function constructing an entity from a dict
+        @type builder: <Function>
+        @return: Shared Entity object
+        '''
+        try: k = self.key(d)
+        except TypeError: return builder(d)
+        with self._lock:
+            if k in self._pool:
+                self.hits += 1
+                ent = self._pool[k]
+                self.saved += sum([sys.getsizeof(v) for v in ent.__dict__.values()]) + sys.getsizeof(ent)
+                return ent
+        ent = builder(d)
+        for attr in ('_ruleId','_description','_severity'):
+            if hasattr(ent,attr): setattr(ent,attr,self.strings.intern(getattr(ent,attr)))
+        with self._lock:
+            self.misses += 1
+            if len(self._pool) < self.limit:
+                ent = self._pool.setdefault(k,ent)
+        return ent
+
+    def __len__(self):
+        return len(self._pool)
+
+    def stats(self):
+        '''Returns pool usage counters
+        @return: Dict of size, hits, misses and estimated bytes saved
+        '''
+        return {'size':len(self._pool),'hits':self.hits,'misses':self.misses,'saved':self.saved}
+
+    def clear(self):
+        '''Empties the pool and resets counters'''
+        with self._lock:
+            self._pool = {}
+            self.hits,self.misses,self.saved = 0,0,0
+
+#shared module level pools
+strings = InternPool()
+entities = EntityPool(strings)
+
+def intern(val):
+    '''Interns a value in the shared string pool
+    @param val: Value to intern
+    @type val: String
+    @return: Shared string instance
+    '''
+    return strings.intern(val)
+
+def internField(key,val):
+    '''Interns a value only if its (flattened) attribute name is one of the INTERN_FIELDS
+    @param key: Attribute name, may be prefixed with the flattening separator path
+    @type key: String
+    @param val: Attribute value
+    @return: Shared string instance or the original value
+    '''
+    return strings.intern(val) if key[key.rfind(DEF_SEP)+1:] in INTERN_FIELDS else val
+
+def stats():
+    '''Returns usage counters for the shared pools
+    @return: Dict of pool stats keyed by pool name
+    '''
+    return {'strings':strings.stats(),'entities':entities.stats()}
+
+def logStats():
+    '''Writes shared pool stats to the log'''
+    s = stats()
+    aimslog.info('FeaturePool strings size={size} hits={hits} saved={saved}B'.format(**s['strings']))
+    aimslog.info('FeaturePool entities size={size} hits={hits} saved={saved}B'.format(**s['entities']))
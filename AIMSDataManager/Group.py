@@ -42,6 +42,11 @@ class  Group(Feature):
     def __str__(self):
         return 'GRP.{}.{}'.format(self._ref,self.type)
     
+    def derive(self):
+        '''Precomputes derived labels on the member features of the group'''
+        for feat in self.getMeta().entities if self.getMeta() else []:
+            if isinstance(feat,Feature): feat.derive()
+    
     def setChangeGroupId (self, changeGroupId): 
         self._changeGroupId = changeGroupId
     def getChangeGroupId(self): 
@@ -21,6 +21,7 @@ from Const import SKIP_NULL, DEF_SEP
 from Group import Group,GroupChange,GroupResolution
 from Group import GroupException
 from AimsLogging import Logger
+import FeaturePool
 #from FeatureFactory import TemplateReader
 
 #P = os.path.join(os.path.dirname(__file__),'../resources/')
@@ -122,7 +123,9 @@ class GroupFactory(FeatureFactory):
             #    pstns = [] 
             #    for pd in data[k]: pstns.append(Position.getInstance(pd,self))
             #    adr.setAddressPositions(pstns)
-            else: getattr(grp,setter)(self.filterPI(data[k]) or None) if hasattr(grp,setter) else setattr(grp,new_prefix,self.filterPI(data[k]) or None)
+            else:
+                val = FeaturePool.internField(k,self.filterPI(data[k]) or None)
+                getattr(grp,setter)(val) if hasattr(grp,setter) else setattr(grp,new_prefix,val)
         return grp
     
     def cast(self,grp):
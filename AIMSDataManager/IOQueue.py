@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''IOQueue module providing the bounded, instrumented queues passing data between DataManager and DataSync threads'''
+
+import time
+import Queue
+from AimsUtility import AimsException
+from AimsLogging import Logger
+
+aimslog = Logger.setup()
+
+class QueuePolicyException(AimsException):pass
+
+class InstrumentedQueue(Queue.Queue):
+    '''FIFO queue recording its high-water mark and the time producers spend blocked on a full queue. Bounded
+    queues block producers until there is room, applying backpressure
+    '''
+
+    def __init__(self,maxsize=0,name=None):
+        '''Initialise queue
+        @param maxsize: Most items held, producers block once full. 0 is unbounded
+        @type maxsize: Integer
+        @param name: Name used in log messages
+        @type name: String
+        '''
+        Queue.Queue.__init__(self,maxsize)
+        self.name = name
+        self.highwater = 0
+        self.puts = 0
+        self.blocked = 0
+        self.waited = 0.0
+
+    def _put(self,item):
+        '''Appends an item, called with the queue mutex held'''
+        Queue.Queue._put(self,item)
+        self.puts += 1
+        self.highwater = max(self.highwater,len(self.queue))
+
+    def put(self,item,block=True,timeout=None):
+        '''Puts an item, timing any wait for room. Raises Queue.Full if there's still no room after timeout'''
+        if not self.maxsize or not self.full(): return Queue.Queue.put(self,item,block,timeout)
+        self.blocked += 1
+        t1 = time.time()
+        try:
+            Queue.Queue.put(self,item,block,timeout)
+        finally:
+            self.waited += time.time()-t1
+            aimslog.debug('Queue {} full, producer waited {:.3f}s'.format(self.name,time.time()-t1))
+
+    def stats(self):
+        '''Returns queue instrumentation
+        @return: Dict of current size, maxsize, high-water mark, puts, blocked puts and total seconds blocked
+        '''
+        return {'size':self.qsize(),'maxsize':self.maxsize,'highwater':self.highwater,'puts':self.puts,
+                'blocked':self.blocked,'waited':self.waited}
+
+class LatestQueue(InstrumentedQueue):
+    '''Single slot queue where a new item replaces any item not yet taken. Used for feed snapshots where only
+    the newest matters, puts never block
+    '''
+
+    def __init__(self,name=None):
+        InstrumentedQueue.__init__(self,1,name)
+        self.coalesced = 0
+
+    def put(self,item,block=True,timeout=None):
+        '''Puts an item discarding the one waiting, if any'''
+        with self.mutex:
+            if self._qsize():
+                self.queue.clear()
+                self.coalesced += 1
+                aimslog.info('Queue {} coalesced unconsumed item'.format(self.name))
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def stats(self):
+        s = InstrumentedQueue.stats(self)
+        s['coalesced'] = self.coalesced
+        return s
+
+#queue policies, 'block' holds up to size items applying backpressure, 'latest' keeps only the newest item
+POLICIES = ('block','latest')
+
+def build(policy,size=0,name=None):
+    '''Returns a new queue with the requested policy
+    @param policy: One of POLICIES
+    @type policy: String
+    @param size: Bound for blocking queues, 0 is unbounded
+    @type size: Integer
+    @param name: Name used in log messages
+    @type name: String
+    @return: InstrumentedQueue
+    '''
+    if policy == 'latest': return LatestQueue(name)
+    if policy == 'block': return InstrumentedQueue(size,name)
+    raise QueuePolicyException('Unknown queue policy {}, use one of {}'.format(policy,POLICIES))
@@ -9,16 +9,96 @@
 #
 ################################################################################
 
+import time
+import Queue
 import threading
+from AimsLogging import Logger
 
-notify_lock = threading.RLock()
-sync_lock = threading.RLock()
+aimslog = Logger.setup()
+
+class EventBus(object):
+    '''Asynchronous notification dispatcher. Notifications are queued by the notifying thread and delivered to 
+    each observer, in the order posted, by a dispatcher thread of its own so notifiers never wait on slow observers 
+    and a slow observer never delays the others'''
+    
+    def __init__(self):
+        '''Initialise counters, an observer's queue and dispatcher thread are started when a notification is 
+        posted to it and end once its queue is drained'''
+        self.lock = threading.Lock()
+        #observer id: notification queue, present while its dispatcher runs
+        self.queues = {}
+        self.posted = 0
+        self.dispatched = 0
+        self.errors = 0
+        self.highwater = 0
+        self.latency = 0.0
+        self.maxlatency = 0.0
+        
+    def post(self,observer,observable,args,kwargs):
+        '''Queues a notification for delivery to an observer
+        @param observer: Observer object
+        @param observable: Instance of the notifying class
+        @param args: Wrapped args
+        @param kwargs: Wrapped kwargs
+        '''
+        with self.lock:
+            queue = self.queues.get(id(observer))
+            if queue is None:
+                queue = self.queues[id(observer)] = Queue.Queue()
+                dispatcher = threading.Thread(target=self._dispatch,args=(observer,queue),name='EventBus')
+                dispatcher.setDaemon(True)
+                dispatcher.start()
+            self.posted += 1
+            queue.put((time.time(),observable,args,kwargs))
+            self.highwater = max(self.highwater,queue.qsize())
+        
+    def _dispatch(self,observer,queue):
+        '''Dispatcher loop delivering an observer's queued notifications, exits once the queue is empty
+        @param observer: Observer object
+        @param queue: The observer's notification queue
+        @type queue: Queue.Queue
+        '''
+        while True:
+            #posts are made under the lock so an empty queue can't be refilled before it is dropped
+            with self.lock:
+                if queue.empty():
+                    del self.queues[id(observer)]
+                    return
+                posted,observable,args,kwargs = queue.get_nowait()
+            wait,failed = time.time()-posted,False
+            try:
+                observer.observe(observable,*args,**kwargs)
+            except Exception as e:
+                failed = True
+                aimslog.error('Notification {} to {} failed - {}'.format(args,observer,e))
+            with self.lock:
+                self.errors += failed
+                self.dispatched += 1
+                self.latency += wait
+                self.maxlatency = max(self.maxlatency,wait)
+            
+    def stats(self):
+        '''Returns dispatch counters
+        @return: Dict of posted/dispatched/failed counts, running dispatchers, current and peak backlog and mean/max dispatch latency
+        '''
+        with self.lock:
+            return {'posted':self.posted,'dispatched':self.dispatched,'errors':self.errors,'dispatchers':len(self.queues),
+                    'backlog':sum([q.qsize() for q in self.queues.values()]),'highwater':self.highwater,
+                    'latency':self.latency/self.dispatched if self.dispatched else 0.0,'max':self.maxlatency}
+        
+    def logStats(self):
+        '''Writes dispatch stats to the log'''
+        aimslog.info('EventBus n={dispatched}/{posted} errors={errors} dispatchers={dispatchers} backlog={backlog} highwater={highwater} latency={latency:.4f}s max={max:.4f}s'.format(**self.stats()))
+
+#shared bus carrying all Observable notifications
+bus = EventBus()
 
 #TODO Split into observer and observed subclasses and multiply inherit depending on roles
 
 class Observable(threading.Thread):
     '''Class implementing interface for the observer pattern.
-    Differs from regular pattern as it splits notify() into notify() and observe() functions'''
+    Differs from regular pattern as it splits notify() into notify() and observe() functions. 
+    Notifications are delivered asynchronously through the shared EventBus'''
 
     def __init__(self): 
         '''Initialise new observable class explicitly including threading stop function'''
@@ -26,27 +106,34 @@ class Observable(threading.Thread):
         #threading.Thread.__init__(self)
         self._stop = threading.Event()
         self._observers = []
+        self._topics = {}
 
-    def register(self, observer):
+    def register(self, observer, topics=None):
         '''Register a listener object with the observable
         @param observer: Observer object 
+        @param topics: Notification topics (first notify arg) the observer receives, all topics if None
+        @type topics: List
         '''
-        self._observers.append(observer)
+        if observer not in self._observers: self._observers.append(observer)
+        self._topics[id(observer)] = frozenset(topics) if topics is not None else None
         
     def deregister(self,observer):
         '''De-Register a listener object from the observable
         @param observer: Observer object 
         '''
         if observer in self._observers: self._observers.remove(observer)
+        self._topics.pop(id(observer),None)
     
     def notify(self, *args, **kwargs):
-        '''Notify all registered listeners.
+        '''Notify all registered listeners subscribed to the topic, args[0]. Returns without waiting for delivery
         @param *args: Wrapped args
         @param **kwargs: Wrapped kwargs
         '''
-        for observer in self._observers:
-            with notify_lock:
-                observer.observe(self,*args, **kwargs)
+        topic = args[0] if args else None
+        for observer in list(self._observers):
+            topics = self._topics.get(id(observer))
+            if topics is None or topic in topics:
+                bus.post(observer,self,args,kwargs)
                 
     def observe(self, observable, *args, **kwargs):
         '''Listen method called by notification, default calls in turm call notify but override this as needed.
@@ -0,0 +1,254 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''Request module matching user request responses to their request ids'''
+
+import time
+import itertools
+import threading
+from AimsUtility import AimsException
+from AimsLogging import Logger
+
+aimslog = Logger.setup()
+
+class RequestTimeoutException(AimsException):pass
+
+#source of request ids for requests made without one
+_reqids = itertools.count(1)
+_reqid_lock = threading.Lock()
+
+def nextRequestId():
+    '''Returns an unused request id
+    @return: Integer
+    '''
+    with _reqid_lock:
+        return _reqids.next()
+
+class RequestFuture(object):
+    '''Handle on the pending response to a single request'''
+
+    def __init__(self,reqid,etft=None):
+        '''Initialise unresolved future
+        @param reqid: Request id of the awaited response
+        @type reqid: Integer
+        @param etft: FeedRef the request was sent to
+        @type etft: FeedRef
+        '''
+        self.reqid = reqid
+        self.etft = etft
+        self.created = time.time()
+        self.completed = None
+        self._feature = None
+        self._error = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        '''Returns True once a response or failure has been received'''
+        return self._done.isSet()
+
+    def result(self,timeout=None):
+        '''Returns the response feature, waiting for it if required
+        @param timeout: Seconds to wait, None waits indefinitely
+        @type timeout: Float
+        @return: Feature or None if the request failed
+        '''
+        if not self._done.wait(timeout):
+            raise RequestTimeoutException('No response to request {} after {}s'.format(self.reqid,timeout))
+        return self._feature
+
+    def error(self):
+        '''Returns the exception raised sending the request, if any'''
+        return self._error
+
+    def addCallback(self,callback):
+        '''Registers a function to call with this future once resolved. Callbacks run on the thread resolving
+        the future or immediately if it is already resolved
+        @param callback: Function taking the future as its only argument
+        @type callback: Function(RequestFuture)
+        '''
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _resolve(self,feature=None,error=None):
+        '''Sets the response and runs callbacks'''
+        with self._lock:
+            if self.done(): return
+            self._feature,self._error = feature,error
+            self.completed = time.time()
+            self._done.set()
+            callbacks,self._callbacks = self._callbacks,[]
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                aimslog.error('Request {} callback failed - {}'.format(self.reqid,e))
+
+class ResponseMailbox(object):
+    '''Response queue delivering each response to the future waiting on its request id. Responses no future is
+    waiting on are held by request id until collected. Implements the put/get/empty subset of Queue.Queue used
+    by the DataSync response queue
+    '''
+
+    def __init__(self,etft=None):
+        '''Initialise empty mailbox
+        @param etft: FeedRef of the feed answering requests
+        @type etft: FeedRef
+        '''
+        self.etft = etft
+        self.futures = {}
+        self.unclaimed = {}
+        self.highwater = 0
+        self.lock = threading.Lock()
+
+    def expect(self,reqid):
+        '''Returns the future for a request id, resolving it at once if the response has already arrived
+        @param reqid: Request id
+        @type reqid: Integer
+        @return: RequestFuture
+        '''
+        with self.lock:
+            if reqid in self.futures: return self.futures[reqid]
+            future = RequestFuture(reqid,self.etft)
+            held = self.unclaimed.pop(reqid,None)
+            if not held: self.futures[reqid] = future
+            self.highwater = max(self.highwater,len(self.futures))
+        if held: future._resolve(held[0])
+        return future
+
+    def put(self,feature):
+        '''Deliver a response to its future or hold it for collection
+        @param feature: Response feature
+        @type feature: Feature
+        '''
+        reqid = feature.getRequestId() if feature is not None else None
+        with self.lock:
+            future = self.futures.pop(reqid,None)
+            if not future: self.unclaimed.setdefault(reqid,[]).append(feature)
+        if future: future._resolve(feature)
+
+    def fail(self,reqid,error):
+        '''Resolve the future for a request that could not be sent
+        @param reqid: Request id
+        @type reqid: Integer
+        @param error: Exception raised sending the request
+        @type error: Exception
+        '''
+        with self.lock:
+            future = self.futures.pop(reqid,None)
+        if future: future._resolve(error=error)
+
+    def get(self,reqid=None):
+        '''Collects held responses
+        @param reqid: Request id to collect responses for, None collects all
+        @type reqid: Integer
+        @return: Tuple of response features
+        '''
+        with self.lock:
+            if reqid is not None: return tuple(self.unclaimed.pop(reqid,()))
+            held,self.unclaimed = self.unclaimed,{}
+        return tuple(f for r in held.values() for f in r)
+
+    def empty(self):
+        '''Returns True if no responses are held'''
+        return not self.unclaimed
+
+    def pending(self):
+        '''Returns the number of requests still waiting for a response'''
+        return len(self.futures)
+    
+    def stats(self):
+        '''Returns mailbox instrumentation
+        @return: Dict of pending requests, their high-water mark and held responses
+        '''
+        with self.lock:
+            return {'size':len(self.futures),'highwater':self.highwater,'unclaimed':sum(len(r) for r in self.unclaimed.values())}
+
+class BatchFuture(object):
+    '''Handle on the responses to a batch of requests, completing once every request has been answered'''
+
+    def __init__(self,futures):
+        '''Initialise batch over already issued requests
+        @param futures: Futures of the batched requests
+        @type futures: List<RequestFuture>
+        '''
+        self.futures = list(futures)
+        self.count = 0
+        self._done = threading.Event()
+        self._progress = []
+        self._callbacks = []
+        self._lock = threading.Lock()
+        if not self.futures: self._done.set()
+        for future in self.futures: future.addCallback(self._completed)
+
+    def __len__(self):
+        return len(self.futures)
+
+    def _completed(self,future):
+        '''Request callback counting completed requests and running progress and batch callbacks'''
+        with self._lock:
+            self.count += 1
+            finished = self.count == len(self.futures)
+            if finished: self._done.set()
+            progress = list(self._progress)
+            callbacks,self._callbacks = (self._callbacks,[]) if finished else ([],self._callbacks)
+        for callback in progress: callback(self,future)
+        for callback in callbacks: callback(self)
+
+    def done(self):
+        '''Returns True once every request has been answered'''
+        return self._done.isSet()
+
+    def progress(self):
+        '''Returns the number of answered and total requests
+        @return: Tuple(Integer,Integer)
+        '''
+        return self.count,len(self.futures)
+
+    def addProgressCallback(self,callback):
+        '''Registers a function to call as each request is answered
+        @param callback: Function taking the batch and the answered request's future
+        @type callback: Function(BatchFuture,RequestFuture)
+        '''
+        with self._lock:
+            self._progress.append(callback)
+
+    def addCallback(self,callback):
+        '''Registers a function to call once the whole batch is answered, immediately if it already is
+        @param callback: Function taking the batch as its only argument
+        @type callback: Function(BatchFuture)
+        '''
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def results(self,timeout=None):
+        '''Returns the response features in request order, waiting for them if required
+        @param timeout: Seconds to wait, None waits indefinitely
+        @type timeout: Float
+        @return: List of Features, None for failed requests
+        '''
+        if not self._done.wait(timeout):
+            raise RequestTimeoutException('{} of {} batch requests unanswered after {}s'.format(len(self)-self.count,len(self),timeout))
+        return [future.result(0) for future in self.futures]
+
+    def errors(self):
+        '''Returns the errors of requests that could not be sent
+        @return: Dict<Integer,Exception> keyed by request id
+        '''
+        return dict([(f.reqid,f.error()) for f in self.futures if f.error()])
@@ -0,0 +1,273 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''Runner module, headless entry point running the DataManager without QGIS or Qt.
+
+Run from the AIMSDataManager directory, eg
+ - python Runner.py --config /etc/aims/aimsConfig.ini sync AC AR GC GR
+ - python Runner.py --config /etc/aims/aimsConfig.ini replay actions.json
+The config path can also be set with the AIMS_CONFIG environment variable.
+
+A sync fetches the chosen feeds into the local store. A replay sends the actions in a file, one JSON object per line
+ - {"action":"acceptAddress","feed":"AR","id":1234}
+ - {"action":"acceptAddresses","feed":"AR","ids":[1234,1235]}
+ - {"action":"addAddress","feed":"AC","model":{...}}
+Features named by id are read from the local store of the given feed, models are built by the feed's factory.
+Both report throughput and request latency percentiles when they finish.
+'''
+
+import os
+import sys
+import math
+import json
+import time
+import argparse
+
+import Config
+from AimsLogging import Logger
+
+aimslog = Logger.setup()
+
+#seconds to wait for feeds to sync or requests to be answered
+RUN_TIMEOUT = 600
+#latency percentiles reported
+PERCENTILES = (50,90,99)
+
+#feed keys, as in AimsUtility.FEEDS which can't be imported until the config path is known
+FEED_KEYS = ('AF','AC','AR','GC','GR','UA')
+#actions taking a list of features, sent as a single batch
+BATCH_ACTIONS = ('retireAddresses','updateAddresses','acceptAddresses','declineAddresses','acceptGroups','declineGroups')
+SINGLE_ACTIONS = ('addAddress','retireAddress','updateAddress','acceptAddress','declineAddress','repairAddress','supplementAddress',
+                  'acceptGroup','declineGroup','repairGroup','replaceGroup','updateGroup','submitGroup','closeGroup','addGroup','removeGroup')
+#address actions sent on the change feed, features read from other feeds are cast first
+CHANGE_ACTIONS = ('addAddress','retireAddress','updateAddress','retireAddresses','updateAddresses')
+
+class RunnerException(Exception):pass
+
+def percentile(values,p):
+    '''Nearest rank percentile
+    @param values: Sample values
+    @type values: List<Float>
+    @param p: Percentile, 0-100
+    @type p: Integer
+    @return: Float or None for no samples
+    '''
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[max(0,int(math.ceil(p/100.0*len(ordered)))-1)]
+
+class Report(object):
+    '''Collects feed and request timings for a run'''
+
+    def __init__(self,label):
+        '''Initialise report, timing starts now
+        @param label: Run description
+        @type label: String
+        '''
+        self.label = label
+        self.started = time.time()
+        self.finished = None
+        self.feeds = []
+        self.latencies = []
+        self.failed = 0
+        self.unanswered = 0
+
+    def feed(self,etft,count,seconds):
+        '''Records a synced feed
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @param count: Number of features fetched
+        @type count: Integer
+        @param seconds: Time until the feed's data arrived
+        @type seconds: Float
+        '''
+        self.feeds.append((etft,count,seconds))
+
+    def request(self,future):
+        '''Records a request's outcome and latency
+        @param future: Future of the request
+        @type future: RequestFuture
+        '''
+        if not future.done(): self.unanswered += 1
+        elif future.error() or future.result(0) is None: self.failed += 1
+        if future.done(): self.latencies.append(future.completed-future.created)
+
+    def finish(self):
+        '''Stops the run clock'''
+        self.finished = time.time()
+
+    def elapsed(self):
+        return (self.finished or time.time())-self.started
+
+    def lines(self):
+        '''Formats the report
+        @return: List of report lines
+        '''
+        elapsed = self.elapsed()
+        rate = lambda n: n/elapsed if elapsed else 0.0
+        lines = ['{} finished in {:.1f}s'.format(self.label,elapsed)]
+        if self.feeds:
+            features = sum(f[1] for f in self.feeds)
+            for etft,count,seconds in self.feeds:
+                lines.append('  {:<12}{:>9} features{:>9.1f}s'.format(str(etft),count,seconds))
+            lines.append('  {:<12}{:>9} features{:>9.1f}/s'.format('total',features,rate(features)))
+        requests = len(self.latencies)+self.unanswered
+        if requests:
+            lines.append('  {:<12}{:>9} requests{:>9.1f}/s, {} failed, {} unanswered'.format('requests',requests,rate(requests),self.failed,self.unanswered))
+            if self.latencies:
+                lines.append('  {:<12}'.format('latency')+', '.join('p{} {:.3f}s'.format(p,percentile(self.latencies,p)) for p in PERCENTILES))
+        return lines
+
+    def ok(self):
+        '''Returns True if every request was answered successfully'''
+        return not (self.failed or self.unanswered)
+
+class SyncListener(object):
+    '''Main listener recording when each awaited feed first delivers its data'''
+
+    def __init__(self,report,feeds):
+        self.report = report
+        self.waiting = set(feeds)
+
+    def observe(self,observable,*args,**kwargs):
+        etft,data = args[0],args[-1]
+        if etft in self.waiting:
+            self.waiting.discard(etft)
+            self.report.feed(etft,len(data or ()),time.time()-self.report.started)
+
+def sync(feeds,bbox=None,timeout=RUN_TIMEOUT):
+    '''Fetches the chosen feeds into the local store, the store is saved when the DataManager closes
+    @param feeds: Keys of the feeds to sync, eg ['AC','AR']
+    @type feeds: List<String>
+    @param bbox: South-West and North-East corners for the address features feed
+    @type bbox: Tuple(List<Double>{2},List<Double>{2})
+    @param timeout: Seconds to wait for all feeds
+    @type timeout: Float
+    @return: Report
+    '''
+    from AimsUtility import FEEDS
+    from DataManager import DataManager
+    start = dict([(k,FEEDS[k]) for k in feeds])
+    report = Report('Sync {}'.format(','.join(feeds)))
+    listener = SyncListener(report,start.values())
+    with DataManager(start=start,warm=False) as dm:
+        dm.registermain(listener)
+        if bbox: dm.setbb(*bbox)
+        while listener.waiting and report.elapsed() < timeout:
+            time.sleep(0.5)
+        for etft in listener.waiting:
+            aimslog.warn('Feed {} not synced after {}s'.format(etft,timeout))
+            report.unanswered += 1
+    report.finish()
+    return report
+
+def read(path):
+    '''Reads an actions file, skipping blank and # comment lines
+    @param path: Actions file path
+    @type path: String
+    @return: List of action dicts
+    '''
+    actions = []
+    with open(path) as h:
+        for n,line in enumerate(h,1):
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            try:
+                action = json.loads(line)
+            except ValueError as e:
+                raise RunnerException('Line {}: {}'.format(n,e))
+            if action.get('action') not in BATCH_ACTIONS+SINGLE_ACTIONS:
+                raise RunnerException('Line {}: unknown action {}'.format(n,action.get('action')))
+            actions.append(action)
+    return actions
+
+def _features(dm,action):
+    '''Builds or loads the features an action is sent with'''
+    from AimsUtility import FEEDS,FeedType
+    from FeatureFactory import FeatureFactory
+    etft = FEEDS[action['feed']]
+    if 'model' in action:
+        features = [FeatureFactory.getInstance(etft).get(model=action['model'])]
+    else:
+        ids = action['ids'] if 'ids' in action else [action['id']]
+        features = dm.persist.load(etft,ids=ids)
+        if len(features) != len(ids):
+            aimslog.warn('{} of {} {} features not in the local store'.format(len(ids)-len(features),len(ids),etft))
+    if action['action'] in CHANGE_ACTIONS and etft.ft != FeedType.CHANGEFEED:
+        features = [dm.castTo(FeedType.CHANGEFEED,f) for f in features]
+    return features
+
+def replay(path,timeout=RUN_TIMEOUT):
+    '''Sends the actions in a file, waiting for every response
+    @param path: Actions file path
+    @type path: String
+    @param timeout: Seconds to wait for responses after the last action is sent
+    @type timeout: Float
+    @return: Report
+    '''
+    from DataManager import DataManager
+    from Request import BatchFuture,RequestTimeoutException
+    actions = read(path)
+    report = Report('Replay {} actions'.format(len(actions)))
+    futures = []
+    with DataManager(warm=False) as dm:
+        for action in actions:
+            features = _features(dm,action)
+            if action['action'] in BATCH_ACTIONS:
+                futures += getattr(dm,action['action'])(features).futures
+            else:
+                futures += [getattr(dm,action['action'])(f) for f in features]
+        try:
+            BatchFuture(futures).results(timeout)
+        except RequestTimeoutException as e:
+            aimslog.warn(str(e))
+        for future in futures: report.request(future)
+    report.finish()
+    return report
+
+def parser():
+    '''Command line parser'''
+    p = argparse.ArgumentParser(description='Run the AIMS DataManager without QGIS')
+    p.add_argument('--config',help='aimsConfig.ini path, defaults to ${} or the QGIS settings directory'.format(Config.CONFIG_ENV))
+    p.add_argument('--timeout',type=float,default=RUN_TIMEOUT,help='seconds to wait for feeds or responses')
+    sub = p.add_subparsers(dest='mode')
+    s = sub.add_parser('sync',help='fetch feeds into the local store')
+    s.add_argument('feeds',nargs='+',choices=FEED_KEYS)
+    s.add_argument('--bbox',type=float,nargs=4,metavar=('SWX','SWY','NEX','NEY'),help='address features feed extent')
+    r = sub.add_parser('replay',help='send the actions in a file')
+    r.add_argument('actions',help='actions file, one JSON action per line')
+    return p
+
+def main(argv=None):
+    '''Command line entry point
+    @return: Exit status, 0 if every feed synced or request succeeded
+    '''
+    argv = sys.argv[1:] if argv is None else argv
+    #the config path has to be set before anything reading the config is imported
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument('--config')
+    known,_ = pre.parse_known_args(argv)
+    if known.config:
+        os.environ[Config.CONFIG_ENV] = Config.AIMS_CONFIG = os.path.abspath(known.config)
+    args = parser().parse_args(argv)
+    if not os.path.exists(Config.AIMS_CONFIG):
+        sys.stderr.write('Config file {} not found\n'.format(Config.AIMS_CONFIG))
+        return 2
+    if args.mode == 'sync':
+        report = sync(args.feeds,(args.bbox[:2],args.bbox[2:]) if args.bbox else None,args.timeout)
+    else:
+        report = replay(args.actions,args.timeout)
+    for line in report.lines(): print line
+    return 0 if report.ok() else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''Snapshot module providing a memory-mapped binary feed snapshot that opens without reading the whole file and decodes
+features on access.
+
+File layout, little endian, all sections 8 byte aligned::
+
+    header   magic(8s) format(H) reserved(H) feed(24s) token(16s) count(Q)
+    ids      count x int64           feature ids, unidentified features stored as -(seq+1)
+    xy       count x 2 x float64     coordinates, NaN when absent
+    versions count x 32s             feature version hashes
+    offsets  (count+1) x uint64      blob offsets relative to the heap
+    heap     serialised features
+'''
+
+import os
+import mmap
+import struct
+import pickle
+import threading
+from AimsUtility import AimsException
+from AimsLogging import Logger
+
+aimslog = Logger.setup()
+
+MAGIC = 'AIMSSNAP'
+#increment when the layout changes, snapshots of any other format are ignored
+FORMAT = 1
+HEADER = struct.Struct('<8sHH24s16sQ')
+VERSION_WIDTH = 32
+NAN = float('nan')
+
+class SnapshotException(AimsException): pass
+
+def _sections(count):
+    '''Returns the byte offsets of each column section for a snapshot holding count features
+    @param count: Number of features
+    @type count: Integer
+    @return: Tuple of (ids,xy,versions,offsets,heap) offsets
+    '''
+    ids = HEADER.size + (-HEADER.size % 8)
+    xy = ids + 8*count
+    ver = xy + 16*count
+    off = ver + VERSION_WIDTH*count
+    heap = off + 8*(count+1)
+    return ids,xy,ver,off,heap
+
+def replace(src,dst):
+    '''Renames src over dst. Windows will not rename onto an existing file so dst is removed first there
+    @param src: Path of the new file
+    @type src: String
+    @param dst: Path being replaced
+    @type dst: String
+    '''
+    if os.name == 'nt' and os.path.exists(dst): os.remove(dst)
+    os.rename(src,dst)
+
+def _pack(fmt,values):
+    '''Packs a column of values little endian
+    @param fmt: Struct format character
+    @type fmt: String
+    @param values: Column values
+    @type values: List
+    @return: String
+    '''
+    return struct.pack('<{}{}'.format(len(values),fmt),*values)
+
+def _unpack(fmt,buf):
+    '''Unpacks a little endian column
+    @param fmt: Struct format character
+    @type fmt: String
+    @param buf: Column bytes
+    @type buf: String
+    @return: Tuple of values
+    '''
+    return struct.unpack('<{}{}'.format(len(buf)/struct.calcsize(fmt),fmt),buf)
+
+def write(path,feed,token,rows):
+    '''Writes a snapshot file, to a temporary file first which is then renamed so a partial write never replaces a good snapshot
+    @param path: Snapshot file path
+    @type path: String
+    @param feed: Feed key, eg address.features
+    @type feed: String
+    @param token: Identifier matching the snapshot to the local store state
+    @type token: String
+    @param rows: Tuples of (id,seq,version,x,y,blob) in feed order, blob as serialised bytes
+    @type rows: List<Tuple>
+    @return: Size of the written file in bytes
+    '''
+    count = len(rows)
+    ids,xy,ver = [],[],[]
+    offsets,size = [0],0
+    for fid,seq,version,x,y,blob in rows:
+        if isinstance(fid,(int,long)) and fid >= 0: ids.append(fid)
+        elif fid == '#{}'.format(seq): ids.append(-(seq+1))
+        else: raise SnapshotException('Cannot store feature id {} in snapshot'.format(fid))
+        xy.extend((NAN if x is None else x,NAN if y is None else y))
+        ver.append(struct.pack('{}s'.format(VERSION_WIDTH),str(version or '')))
+        size += len(blob)
+        offsets.append(size)
+    tmp = path+'.tmp'
+    with open(tmp,'wb') as handle:
+        handle.write(HEADER.pack(MAGIC,FORMAT,0,feed,token,count))
+        handle.write('\0'*(_sections(count)[0]-HEADER.size))
+        handle.write(_pack('q',ids))
+        handle.write(_pack('d',xy))
+        handle.write(''.join(ver))
+        handle.write(_pack('Q',offsets))
+        for row in rows: handle.write(row[5])
+        handle.flush()
+        os.fsync(handle.fileno())
+    replace(tmp,path)
+    return os.path.getsize(path)
+
+def load(path,feed=None):
+    '''Opens a snapshot returning None if it is missing or unreadable
+    @param path: Snapshot file path
+    @type path: String
+    @param feed: Expected feed key, a snapshot of a different feed is rejected
+    @type feed: String
+    @return: Snapshot or None
+    '''
+    if not os.path.exists(path): return None
+    try:
+        return Snapshot(path,feed)
+    except (SnapshotException,IOError,OSError,ValueError,struct.error) as e:
+        aimslog.warn('Ignoring snapshot {} - {}'.format(path,e))
+        return None
+
+class Snapshot(object):
+    '''Read only, memory-mapped feed snapshot behaving as a sequence of features. Only the header is read on opening,
+    column arrays are read on first use and features are unpickled as they are accessed and kept thereafter
+    '''
+
+    def __init__(self,path,feed=None):
+        '''Maps the snapshot file and validates its header
+        @param path: Snapshot file path
+        @type path: String
+        @param feed: Expected feed key
+        @type feed: String
+        '''
+        self.path = path
+        self.lock = threading.RLock()
+        with open(path,'rb') as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size < HEADER.size: raise SnapshotException('Truncated snapshot header')
+            self.mm = mmap.mmap(handle.fileno(),0,access=mmap.ACCESS_READ)
+        magic,fmt,_,fd,token,count = HEADER.unpack(self.mm[:HEADER.size])
+        if magic != MAGIC: raise SnapshotException('Not a snapshot file')
+        if fmt != FORMAT: raise SnapshotException('Snapshot format {} not supported'.format(fmt))
+        self.feed,self.token,self.count = fd.rstrip('\0'),token.rstrip('\0'),count
+        if feed and self.feed != feed: raise SnapshotException('Snapshot holds {} not {}'.format(self.feed,feed))
+        self._ids,self._xy,self._ver,self._off,self._heap = _sections(count)
+        if size < self._heap: raise SnapshotException('Truncated snapshot columns')
+        self.offsets = _unpack('Q',self.mm[self._off:self._heap])
+        if self._heap+self.offsets[-1] != size: raise SnapshotException('Snapshot heap size mismatch')
+        self._features = [None]*count
+        self._index = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in xrange(self.count): yield self[i]
+
+    def __getitem__(self,i):
+        '''Returns the decoded feature at position i (or a list for a slice)'''
+        if isinstance(i,slice): return [self[j] for j in xrange(*i.indices(self.count))]
+        if i < 0: i += self.count
+        f = self._features[i]
+        if f is None:
+            with self.lock:
+                f = self._features[i]
+                if f is None:
+                    f = self._features[i] = pickle.loads(self.blob(i))
+        return f
+
+    def cached(self,i):
+        '''Returns the feature at position i if it has already been decoded, without decoding it
+        @param i: Feature position
+        @type i: Integer
+        @return: Feature or None
+        '''
+        return self._features[i]
+
+    def blob(self,i):
+        '''Returns the serialised bytes of the feature at position i
+        @param i: Feature position
+        @type i: Integer
+        @return: String
+        '''
+        if not self.mm: raise SnapshotException('Snapshot {} is closed'.format(self.path))
+        return self.mm[self._heap+self.offsets[i]:self._heap+self.offsets[i+1]]
+
+    def ids(self):
+        '''Returns feature ids in feed order
+        @return: List
+        '''
+        ids = _unpack('q',self.mm[self._ids:self._xy])
+        return [fid if fid >= 0 else '#{}'.format(-fid-1) for fid in ids]
+
+    def coordinates(self):
+        '''Returns feature coordinates in feed order, None where absent
+        @return: List<Tuple(Double,Double)>
+        '''
+        xy = _unpack('d',self.mm[self._xy:self._ver])
+        return [(xy[j],xy[j+1]) if xy[j] == xy[j] else None for j in xrange(0,len(xy),2)]
+
+    def locations(self):
+        '''Returns id and coordinates of every feature
+        @return: List<Tuple(id,Tuple(Double,Double))>
+        '''
+        return zip(self.ids(),self.coordinates())
+
+    def versions(self):
+        '''Returns the stored version hash of every feature
+        @return: Dict<id,String>
+        '''
+        w = VERSION_WIDTH
+        vers = self.mm[self._ver:self._off]
+        return dict(zip(self.ids(),[vers[j:j+w].rstrip('\0') for j in xrange(0,len(vers),w)]))
+
+    def index(self):
+        '''Returns a map of feature id to position, built once
+        @return: Dict<id,Integer>
+        '''
+        if self._index is None:
+            self._index = dict([(fid,i) for i,fid in enumerate(self.ids())])
+        return self._index
+
+    def decoded(self):
+        '''Number of features decoded so far
+        @return: Integer
+        '''
+        return self.count - self._features.count(None)
+
+    def close(self):
+        '''Unmaps the snapshot file, features already decoded remain usable'''
+        with self.lock:
+            if self.mm:
+                self.mm.close()
+                self.mm = None
@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''SpatialIndex module providing a uniform grid point index over feature coordinates'''
+
+import math
+import threading
+
+#grid cell width in coordinate units, roughly 100m of latitude in EPSG:4167
+CELL_SIZE = 0.001
+
+class SpatialIndex(object):
+    '''Uniform grid index of feature ids by point location. Points are bucketed into square cells so bbox,
+    radius and nearest neighbour queries only visit cells near the query location.
+    - I{Distances are planar, in the units of the indexed coordinates}.
+    '''
+
+    def __init__(self,cell=CELL_SIZE):
+        '''Initialise empty index
+        @param cell: Grid cell width
+        @type cell: Double
+        '''
+        self.cell = cell
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        '''Removes all points'''
+        with self.lock:
+            self.cells = {}
+            self.points = {}
+            #populated cell extent, only grown so may overstate the extent after removals
+            self.extent = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self,fid):
+        return fid in self.points
+
+    def _key(self,x,y):
+        '''Returns the cell holding a point
+        @return: Tuple(Integer,Integer)
+        '''
+        return (int(math.floor(x/self.cell)),int(math.floor(y/self.cell)))
+
+    def insert(self,fid,x,y):
+        '''Adds or moves a point
+        @param fid: Feature id
+        @param x: X coordinate
+        @type x: Double
+        @param y: Y coordinate
+        @type y: Double
+        '''
+        with self.lock:
+            self.remove(fid)
+            self.points[fid] = (x,y)
+            i,j = self._key(x,y)
+            self.cells.setdefault((i,j),{})[fid] = (x,y)
+            e = self.extent
+            self.extent = (min(e[0],i),min(e[1],j),max(e[2],i),max(e[3],j)) if e else (i,j,i,j)
+
+    def remove(self,fid):
+        '''Removes a point if present
+        @param fid: Feature id
+        '''
+        with self.lock:
+            xy = self.points.pop(fid,None)
+            if xy:
+                k = self._key(*xy)
+                cell = self.cells[k]
+                del cell[fid]
+                if not cell: del self.cells[k]
+
+    def update(self,items):
+        '''Adds, moves or removes many points
+        @param items: Pairs of feature id and coordinates, None coordinates remove the feature
+        @type items: List<Tuple(id,List<Double>{2})>
+        '''
+        with self.lock:
+            for fid,xy in items:
+                if xy and None not in xy: self.insert(fid,xy[0],xy[1])
+                else: self.remove(fid)
+
+    def get(self,fid):
+        '''Returns the indexed coordinates of a feature
+        @param fid: Feature id
+        @return: Tuple(Double,Double) or None
+        '''
+        return self.points.get(fid)
+
+    def _range(self,x0,y0,x1,y1):
+        '''Yields the non empty cells overlapping a box'''
+        (i0,j0),(i1,j1) = self._key(x0,y0),self._key(x1,y1)
+        if (i1-i0+1)*(j1-j0+1) > len(self.cells):
+            #box spans more cells than are populated, check the populated cells instead
+            for (i,j),cell in self.cells.items():
+                if i0<=i<=i1 and j0<=j<=j1: yield cell
+            return
+        for i in xrange(i0,i1+1):
+            for j in xrange(j0,j1+1):
+                cell = self.cells.get((i,j))
+                if cell: yield cell
+
+    def bbox(self,sw,ne):
+        '''Returns ids of features inside a bounding box
+        @param sw: South-West corner
+        @type sw: List<Double>{2}
+        @param ne: North-East corner
+        @type ne: List<Double>{2}
+        @return: List of ids
+        '''
+        x0,x1 = min(sw[0],ne[0]),max(sw[0],ne[0])
+        y0,y1 = min(sw[1],ne[1]),max(sw[1],ne[1])
+        with self.lock:
+            return [fid for cell in self._range(x0,y0,x1,y1) for fid,(x,y) in cell.items() if x0<=x<=x1 and y0<=y<=y1]
+
+    def radius(self,x,y,r):
+        '''Returns ids of features within a distance of a point, nearest first
+        @param x: X coordinate
+        @type x: Double
+        @param y: Y coordinate
+        @type y: Double
+        @param r: Search radius
+        @type r: Double
+        @return: List of ids
+        '''
+        with self.lock:
+            found = [(math.hypot(px-x,py-y),fid) for cell in self._range(x-r,y-r,x+r,y+r) for fid,(px,py) in cell.items()]
+        return [fid for d,fid in sorted(found) if d <= r]
+
+    def nearest(self,x,y,k=1,maxdist=None):
+        '''Returns ids of the k features closest to a point, searching outwards ring by ring from the point's cell
+        @param x: X coordinate
+        @type x: Double
+        @param y: Y coordinate
+        @type y: Double
+        @param k: Number of features to return
+        @type k: Integer
+        @param maxdist: Ignore features further away than this
+        @type maxdist: Double
+        @return: List of ids, nearest first
+        '''
+        with self.lock:
+            if not self.cells: return []
+            ci,cj = self._key(x,y)
+            i0,j0,i1,j1 = self.extent
+            #furthest ring that can hold any point
+            last = max(ci-i0,i1-ci,cj-j0,j1-cj,0)
+            if maxdist is not None: last = min(last,int(math.ceil(maxdist/self.cell)))
+            found,visited = [],0
+            for r in xrange(last+1):
+                for i in xrange(ci-r,ci+r+1):
+                    for j in (xrange(cj-r,cj+r+1) if abs(i-ci)==r else (cj-r,cj+r) if r else (cj,)):
+                        cell = self.cells.get((i,j))
+                        if cell: found += [(math.hypot(px-x,py-y),fid) for fid,(px,py) in cell.items()]
+                visited += 8*r or 1
+                found.sort()
+                #nothing in rings further out can be closer than r cells
+                if len(found) >= k and found[k-1][0] <= r*self.cell: break
+                if visited > len(self.cells):
+                    #sparse grid or distant point, cheaper to check every populated cell than keep walking rings
+                    found = sorted([(math.hypot(px-x,py-y),fid) for cell in self.cells.values() for fid,(px,py) in cell.items()])
+                    break
+        return [fid for d,fid in found[:k] if maxdist is None or d <= maxdist]
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''Supervisor module watching DataSync feed threads and restarting them when they fail'''
+
+import time
+import Queue
+import threading
+from AimsLogging import Logger
+
+aimslog = Logger.setup()
+
+#restart delay doubles on each consecutive failure, from BACKOFF_BASE up to BACKOFF_MAX seconds
+BACKOFF_BASE = 5
+BACKOFF_MAX = 300
+#a feed running this long before failing resets its backoff
+STABLE_PERIOD = 300
+#seconds between heartbeat checks
+CHECK_INTERVAL = 30
+#a feed is stalled after this many fetch intervals (and at least STALL_MIN seconds) without progress
+STALL_FACTOR = 3
+STALL_MIN = 300
+
+class Supervisor(threading.Thread):
+    '''Restarts failed or stalled feed threads with exponential backoff. Feeds report their own exit through a
+    callback and are checked for stale heartbeats on a timer, so no supervision work is done while delivering data
+    '''
+
+    def __init__(self,restart):
+        '''Initialise supervisor
+        @param restart: Function respawning the sync thread for a feed, the new thread is expected to be watched
+        @type restart: Function(FeedRef)
+        '''
+        super(Supervisor,self).__init__()
+        self.restart = restart
+        self.events = Queue.Queue()
+        self.feeds = {}
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self.setDaemon(True)
+        self.setName('Supervisor')
+
+    def watch(self,etft,ds):
+        '''Starts supervising a feed thread
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @param ds: Feed sync thread
+        @type ds: DataSync
+        '''
+        ds.exitcallback = self.exited
+        with self.lock:
+            f = self.feeds.setdefault(etft,{'restarts':0,'failures':0,'error':None,'due':None})
+            f.update({'ds':ds,'started':time.time(),'state':'running','due':None})
+
+    def exited(self,etft,ds,error=None):
+        '''Exit callback, called on the exiting feed thread
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @param ds: Exiting feed sync thread
+        @type ds: DataSync
+        @param error: Exception ending the thread, if any
+        @type error: Exception
+        '''
+        self.events.put((etft,ds,error))
+
+    def run(self):
+        '''Supervisor loop handling exit events and checking heartbeats'''
+        while not self._stop.isSet():
+            try:
+                etft,ds,error = self.events.get(timeout=self._timeout())
+                self._failed(etft,ds,error if error else 'exited')
+            except Queue.Empty:
+                pass
+            if self._stop.isSet(): break
+            self._check()
+            self._restart()
+
+    def _timeout(self):
+        '''Seconds until the next heartbeat check or due restart'''
+        with self.lock:
+            due = [f['due'] for f in self.feeds.values() if f['due']]
+        return max(0.1,min([CHECK_INTERVAL]+[d-time.time() for d in due]))
+
+    def _failed(self,etft,ds,error):
+        '''Schedules a restart for a failed feed, ignoring deliberately stopped and already replaced threads'''
+        with self.lock:
+            f = self.feeds.get(etft)
+            if not f or f['ds'] is not ds or ds.stopped(): return
+            self._schedule(etft,f,error)
+
+    def _schedule(self,etft,f,error):
+        '''Sets a feed's restart time, doubling the delay for each consecutive failure'''
+        f['failures'] = 1 if time.time()-f['started'] > STABLE_PERIOD else f['failures']+1
+        delay = min(BACKOFF_BASE*2**(f['failures']-1),BACKOFF_MAX)
+        f.update({'state':'backoff','error':str(error),'due':time.time()+delay})
+        aimslog.warn('Feed {} failed ({}), restarting in {}s'.format(etft,error,delay))
+
+    def _check(self):
+        '''Flags feeds that have died without reporting or stopped making progress'''
+        now = time.time()
+        for etft,f in self.feeds.items():
+            ds = f['ds']
+            if f['state'] != 'running' or ds.stopped(): continue
+            stall = max(STALL_MIN,STALL_FACTOR*int(ds.ftracker['interval']))
+            if not ds.isAlive():
+                self._failed(etft,ds,'thread not alive')
+            elif now-ds.heartbeat > stall:
+                self._failed(etft,ds,'no progress for {}s'.format(int(now-ds.heartbeat)))
+
+    def _restart(self):
+        '''Restarts feeds whose backoff has expired'''
+        for etft,f in self.feeds.items():
+            if f['due'] and f['due'] <= time.time():
+                f['restarts'] += 1
+                f['due'] = None
+                aimslog.info('Restarting feed {}, restart {}'.format(etft,f['restarts']))
+                try:
+                    self.restart(etft)
+                except Exception as e:
+                    with self.lock: self._schedule(etft,f,e)
+
+    def health(self):
+        '''Returns the supervision state of each feed
+        @return: Dict<FeedRef,Dict> of state, uptime, restart count, last error and seconds since last progress
+        '''
+        now = time.time()
+        with self.lock:
+            return dict([(etft,{'state':f['state'],'uptime':now-f['started'] if f['state']=='running' else 0,
+                                'restarts':f['restarts'],'error':f['error'],'idle':now-f['ds'].heartbeat})
+                         for etft,f in self.feeds.items()])
+
+    def stop(self):
+        '''Stops supervising, feeds are no longer restarted'''
+        self._stop.set()
+        self.events.put((None,None,None))
@@ -0,0 +1,360 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+################################################################################
+#
+# Copyright 2015 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+'''SyncProcess module running the DataManager sync engine in a child process.
+
+Feed fetching, parsing and request handling all happen in the child so they don't compete with the calling process
+(eg the QGIS main thread) for the GIL. Messages on the pipe are small tuples
+ - parent to child: ('call',callid,method,args,kwargs) and ('close',)
+ - child to parent: ('ret',callid,kind,value,error), ('res',etft,reqid,feature,error) and ('feed',etft,path,token,data,delta)
+Feed data isn't sent over the pipe, each update is written to a memory-mapped snapshot file which the parent opens
+and decodes lazily, with only the ids of changed features sent as its delta. Data is only pickled onto the pipe for 
+feeds that can't be snapshotted.
+'''
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import itertools
+import threading
+import multiprocessing
+
+from AimsUtility import FEEDS,FIRST,AimsException
+from AimsLogging import Logger
+from Request import RequestFuture,BatchFuture,RequestTimeoutException,nextRequestId
+from SpatialIndex import SpatialIndex
+from DataStore import DataStore
+import Snapshot
+
+aimslog = Logger.setup()
+
+#seconds to wait for the child to answer a query
+CALL_TIMEOUT = 30
+#seconds to wait for the child to close its DataManager and exit
+CLOSE_TIMEOUT = 30
+#snapshots kept open per feed, older ones are closed and deleted
+SNAPSHOTS_KEPT = 2
+
+class SyncProcessException(AimsException):pass
+
+if sys.platform.startswith('win'):
+    #the child can't be started with the host application's executable (eg qgis.exe)
+    multiprocessing.set_executable(os.path.join(sys.exec_prefix,'pythonw.exe'))
+
+def _serve(conn,root,kwargs):
+    '''Child process main. Runs a DataManager, answering calls from the parent until closed or the parent goes away
+    @param conn: Child end of the pipe
+    @type conn: multiprocessing.Connection
+    @param root: Directory for feed snapshots
+    @type root: String
+    @param kwargs: DataManager initialiser args
+    @type kwargs: Dict
+    '''
+    from DataManager import DataManager
+    publisher = Publisher(conn,root)
+    dm = DataManager(**kwargs)
+    dm.registermain(publisher)
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                break
+            if msg[0] == 'close': break
+            publisher.call(dm,*msg[1:])
+    finally:
+        dm.close()
+        publisher.close()
+
+class Publisher(object):
+    '''Child side of the pipe, registered as the DataManager main listener'''
+
+    def __init__(self,conn,root):
+        '''Initialise publisher
+        @param conn: Child end of the pipe
+        @type conn: multiprocessing.Connection
+        @param root: Directory for feed snapshots
+        @type root: String
+        '''
+        self.conn = conn
+        self.root = root
+        self.lock = threading.Lock()
+        #serialises publishing, feed updates arrive from the bus and request threads and share the snapshots
+        self.publishing = threading.Lock()
+        self.snapshots = {}
+        self.seq = itertools.count()
+
+    def send(self,msg):
+        '''Sends a message to the parent, messages come from the main loop, feed and request threads'''
+        with self.lock:
+            self.conn.send(msg)
+
+    def call(self,dm,cid,name,args,kwargs):
+        '''Calls a DataManager method returning its result. Futures are returned as request ids and their responses
+        sent as they arrive
+        '''
+        try:
+            result = getattr(dm,name)(*args,**kwargs)
+        except Exception as e:
+            self.send(('ret',cid,'value',None,'{}: {}'.format(type(e).__name__,e)))
+            return
+        if isinstance(result,RequestFuture):
+            self.send(('ret',cid,'future',(result.etft,result.reqid),None))
+            result.addCallback(self.resolved)
+        elif isinstance(result,BatchFuture):
+            self.send(('ret',cid,'batch',[(f.etft,f.reqid) for f in result.futures],None))
+            for f in result.futures: f.addCallback(self.resolved)
+        else:
+            self.send(('ret',cid,'value',result,None))
+
+    def resolved(self,future):
+        '''Request callback sending the response'''
+        error = future.error()
+        self.send(('res',future.etft,future.reqid,future.result(0),str(error) if error else None))
+
+    def observe(self,observable,*args,**kwargs):
+        '''DataManager main listener, publishes each feed update as a new snapshot'''
+        etft,data,delta = args[0],args[1],kwargs.get('delta')
+        from DataManager import Persistence
+        with self.publishing:
+            old = self.snapshots.get(etft)
+            path = os.path.join(self.root,'{}.{}.snap'.format(etft.k,self.seq.next()))
+            token = '{:016x}'.format(random.getrandbits(64))
+            t1 = time.time()
+            try:
+                Snapshot.write(path,etft.k,token,Persistence.snapshotRows(etft,list(data),old))
+                self.snapshots[etft] = Snapshot.load(path,etft.k)
+                if old: old.close()
+                self.send(('feed',etft,path,token,None,(list(delta[0]),delta[1]) if delta is not None else None))
+                aimslog.info('Published {} snapshot, {} features in {:.3f}s'.format(etft,len(data),time.time()-t1))
+            except (Snapshot.SnapshotException,IOError,OSError) as e:
+                aimslog.warn('Cannot snapshot {}, sending data - {}'.format(etft,e))
+                self.send(('feed',etft,None,None,list(data),delta))
+
+    def close(self):
+        '''Releases the child's snapshot mappings'''
+        with self.publishing:
+            for snap in self.snapshots.values(): snap.close()
+
+class DataManagerClient(object):
+    '''Stand in for DataManager in the calling process. The sync engine runs in a child process, feed data arrives
+    as memory-mapped snapshots and DataManager methods are proxied over a pipe
+    '''
+
+    #DataManager methods called in the child. Only queries wait for the child's answer, the rest are sent and 
+    #return at once so the caller (eg the QGIS main thread) never waits behind calls the child is still handling
+    QUERIES = ('response','health','requestStats','queueStats')
+    COMMANDS = ('setbb',)
+    ACTIONS = ('addAddress','retireAddress','updateAddress','acceptAddress','declineAddress','repairAddress','supplementAddress',
+               'acceptGroup','declineGroup','repairGroup','replaceGroup','updateGroup','submitGroup','closeGroup','addGroup','removeGroup',
+               'addUser','removeUser','updateUser')
+    BATCHES = ('retireAddresses','updateAddresses','acceptAddresses','declineAddresses','acceptGroups','declineGroups')
+    PROXIED = QUERIES+COMMANDS+ACTIONS+BATCHES
+    INDEXED = (FEEDS['AF'],FEEDS['AR'])
+
+    def __init__(self,start=FIRST,initialise=False,warm=True):
+        '''Starts the sync process, see DataManager for the args'''
+        self.root = tempfile.mkdtemp(prefix='aimssync')
+        self.conn,child = multiprocessing.Pipe()
+        kwargs = {'start':start,'initialise':initialise,'warm':warm}
+        self.proc = multiprocessing.Process(target=_serve,args=(child,self.root,kwargs),name='AimsSync')
+        self.proc.daemon = True
+        self.proc.start()
+        child.close()
+        self.registered = None
+        self.data = {}
+        self.snapshots = {}
+        self.indexes = {}
+        self.calls = {}
+        self.futures = {}
+        self.cids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self._read,name='AimsSyncReader')
+        self.reader.setDaemon(True)
+        self.reader.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type=None,exc_val=None,exc_tb=None):
+        self.close()
+
+    def __getattr__(self,name):
+        if name in self.QUERIES:
+            return lambda *args,**kwargs: self._call(name,*args,**kwargs)
+        if name in self.COMMANDS:
+            return lambda *args,**kwargs: self._send(name,args,kwargs,[])
+        if name in self.ACTIONS:
+            return lambda *args,**kwargs: self._send(name,args,kwargs,[self._local(args,kwargs)])[0]
+        if name in self.BATCHES:
+            return lambda *args,**kwargs: BatchFuture(self._send(name,args,kwargs,[self._local() for f in args[0]]))
+        raise AttributeError(name)
+
+    def _local(self,args=(),kwargs={}):
+        '''Creates the local future of a request, with the caller's request id if one was given
+        @return: RequestFuture
+        '''
+        reqid = kwargs.get('reqid') or (args[1] if len(args) > 1 else None)
+        return RequestFuture(reqid or nextRequestId())
+
+    def _send(self,name,args,kwargs,futures):
+        '''Calls a DataManager method in the child without waiting. The local futures are tied to the child's 
+        requests once it answers, or failed if the call fails
+        @param name: DataManager method
+        @type name: String
+        @param futures: Local futures, one per request the call makes
+        @type futures: List<RequestFuture>
+        @return: The local futures
+        '''
+        cid = self.cids.next()
+        try:
+            with self.lock:
+                self.calls[cid] = (name,futures)
+                self.conn.send(('call',cid,name,args,kwargs))
+        except (IOError,EOFError) as e:
+            self.calls.pop(cid,None)
+            self._fail(name,futures,'sync process unavailable, {}'.format(e))
+        return futures
+
+    def _fail(self,name,futures,error):
+        '''Fails the local futures of a call, logging failures of calls without futures'''
+        if not futures: aimslog.error('Sync process call {} failed - {}'.format(name,error))
+        for future in futures: future._resolve(error=SyncProcessException(error))
+
+    def _call(self,name,*args,**kwargs):
+        '''Calls a DataManager query in the child, waiting for its result
+        @return: Method result
+        '''
+        cid = self.cids.next()
+        waiter = RequestFuture(cid)
+        with self.lock:
+            self.calls[cid] = waiter
+            self.conn.send(('call',cid,name,args,kwargs))
+        try:
+            result = waiter.result(CALL_TIMEOUT)
+        except RequestTimeoutException:
+            self.calls.pop(cid,None)
+            raise SyncProcessException('No answer from sync process to {} after {}s'.format(name,CALL_TIMEOUT))
+        if waiter.error(): raise SyncProcessException(waiter.error())
+        return result
+
+    def _bind(self,future,etft,reqid):
+        '''Ties a local future to the request made in the child, whose response resolves it'''
+        future.etft = etft
+        self.futures[(etft,reqid)] = future
+
+    def _read(self):
+        '''Reader thread handling messages from the child'''
+        while True:
+            try:
+                msg = self.conn.recv()
+            except (EOFError,IOError):
+                break
+            try:
+                getattr(self,'_'+msg[0])(*msg[1:])
+            except Exception as e:
+                aimslog.error('Sync process message {} failed - {}'.format(msg[0],e))
+        aimslog.info('Sync process pipe closed')
+        for waiter in self.calls.values(): 
+            if isinstance(waiter,tuple): self._fail(waiter[0],waiter[1],'sync process exited')
+            else: waiter._resolve(error='sync process exited')
+        for future in self.futures.values(): future._resolve(error=SyncProcessException('sync process exited'))
+
+    def _ret(self,cid,kind,value,error):
+        '''Call result'''
+        waiter = self.calls.pop(cid,None)
+        if not waiter: return
+        if isinstance(waiter,tuple):
+            name,futures = waiter
+            if error: self._fail(name,futures,error)
+            elif kind == 'future': self._bind(futures[0],*value)
+            elif kind == 'batch':
+                for future,v in zip(futures,value): self._bind(future,*v)
+            else: 
+                for future in futures: future._resolve(value)
+        elif error: waiter._resolve(error=error)
+        else: waiter._resolve(value)
+
+    def _res(self,etft,reqid,feature,error):
+        '''Request response'''
+        future = self.futures.pop((etft,reqid),None)
+        if future: future._resolve(feature,SyncProcessException(error) if error else None)
+
+    def _feed(self,etft,path,token,data,delta=None):
+        '''Feed update, opens the new snapshot and passes it to the main listener with the changed features'''
+        if path:
+            data = Snapshot.load(path,etft.k)
+            if not data or data.token != token:
+                aimslog.error('Cannot open published snapshot {}'.format(path))
+                return
+            kept = self.snapshots.setdefault(etft,[])
+            kept.append(data)
+            #the listener may still be reading recent snapshots so only the oldest are released
+            while len(kept) > SNAPSHOTS_KEPT:
+                old = kept.pop(0)
+                old.close()
+                try: os.remove(old.path)
+                except OSError as e: aimslog.warn('Cannot remove snapshot {} - {}'.format(old.path,e))
+            if delta is not None:
+                index = data.index()
+                delta = (dict([(fid,data[index[fid]]) for fid in delta[0] if fid in index]),delta[1])
+        if etft in self.INDEXED:
+            if delta is not None and etft in self.indexes:
+                #only the changed features move in the index
+                self.indexes[etft].update([(fid,f.getCoordinates()) for fid,f in delta[0].items()]+[(fid,None) for fid in delta[1]])
+            else:
+                index = SpatialIndex()
+                index.update(data.locations() if path else [(DataStore.key(etft,f,i),f.getCoordinates()) for i,f in enumerate(data)])
+                self.indexes[etft] = index
+        self.data[etft] = data
+        if self.registered: self.registered.observe(self,etft,data,delta=delta)
+
+    def registermain(self,reg):
+        '''Register the main listener, it receives the latest data of each feed at once then each update
+        @param reg: Registered (main) object
+        '''
+        self.registered = reg if hasattr(reg,'observe') else None
+        if self.registered:
+            for etft,data in self.data.items(): self.registered.observe(self,etft,data)
+
+    def pull(self,etft=None):
+        '''Returns the latest data received for a feed, or for all feeds
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @return: Snapshot/List of features or Dict of feeds
+        '''
+        return self.data.get(etft) if etft else dict(self.data)
+
+    def index(self,etft=FEEDS['AF']):
+        '''Returns the spatial index of a feed, built from the latest snapshot
+        @param etft: FeedRef of the feed
+        @type etft: FeedRef
+        @return: SpatialIndex or None
+        '''
+        return self.indexes.get(etft)
+
+    def close(self):
+        '''Closes the child's DataManager and removes the snapshots'''
+        try:
+            with self.lock: self.conn.send(('close',))
+        except (IOError,EOFError):
+            pass
+        self.proc.join(CLOSE_TIMEOUT)
+        if self.proc.is_alive():
+            aimslog.warn('Sync process did not exit, terminating')
+            self.proc.terminate()
+        for kept in self.snapshots.values():
+            for snap in kept: snap.close()
+        shutil.rmtree(self.root,ignore_errors=True)
@@ -179,20 +179,20 @@ class EditFeatureWidget( Ui_EditFeatureDialog, QWidget ):
         if not UiUtility.formCompleteness(self.parent, self, self._iface ):
             return
         
-        respId = int(time.time())
+        future = None
 
         if self.parent == 'add': 
             self.setPosition()   
             UiUtility.formToObj(self)
-            self._controller.uidm.addAddress(self.feature, respId)
+            future = self._controller.uidm.addAddress(self.feature)
         
         elif self.parent == 'update': 
             UiUtility.formToObj(self)
             self.feature = self.af[FeedType.CHANGEFEED].cast(self.feature)            
-            self._controller.uidm.updateAddress(self.feature, respId)
+            future = self._controller.uidm.updateAddress(self.feature)
         
         # check the response 
-        self._controller.RespHandler.handleResp(respId, FEEDS['AC'])
+        if future: self._controller.RespHandler.handleResp(future, FEEDS['AC'])
         # revert back to review tab 
         self._controller._queues.tabWidget.setCurrentIndex(1)
         self.hideMarker()
@@ -12,6 +12,54 @@
 from PyQt4.QtCore import *
 from PyQt4.QtGui import *
 
+# group rows exposed to views per fetch
+FETCH_SIZE = 500
+# group attributes indexed for filtering
+INDEXES = ('change', 'organisation', 'submitter', 'locality')
+
+def syncRows(model, rows, newRows, ref):
+    """
+    Updates a models rows in place to match newRows. Rows are matched 
+    by reference, changed rows are signalled as changed, new rows are 
+    appended and missing rows removed, so views keep their selection 
+    and scroll position rather than being reset
+    
+    @param model: Model the rows belong to
+    @type model: QAbstractTableModel
+    @param rows: The models current rows, modified in place
+    @type rows: list
+    @param newRows: Rows the model is to hold 
+    @type newRows: list
+    @param ref: Returns the reference identifying a row
+    @type ref: function
+    """
+    
+    newByRef = dict((ref(row), row) for row in newRows)
+    present = set()
+    for i, row in enumerate(rows):
+        r = ref(row)
+        present.add(r)
+        if r in newByRef and newByRef[r] != row:
+            rows[i] = newByRef[r]
+            model.dataChanged.emit(model.index(i, 0), model.index(i, model.columnCount()-1))
+    # append before removing so the column count holds while a model is emptied and refilled
+    added = [row for row in newRows if ref(row) not in present]
+    if added:
+        model.beginInsertRows(QModelIndex(), len(rows), len(rows)+len(added)-1)
+        rows.extend(added)
+        model.endInsertRows()
+    # remove runs of missing rows, last first so row numbers stay valid
+    i = len(rows)
+    while i > 0:
+        i -= 1
+        if ref(rows[i]) in newByRef: continue
+        last = i
+        while i > 0 and ref(rows[i-1]) not in newByRef: 
+            i -= 1
+        model.beginRemoveRows(QModelIndex(), i, last)
+        del rows[i:last+1]
+        model.endRemoveRows()
+
 class QueueView(QTableView):
     """
     View for AIMS Queues
@@ -102,6 +150,7 @@ class FeatureTableModel(QAbstractTableModel):
         @type key: tuple
         """
         
+        if key == self.dict_key: return
         self.beginResetModel()
         self.dict_key = key
         self.endResetModel()
@@ -151,16 +200,31 @@ class FeatureTableModel(QAbstractTableModel):
     
     def refreshData(self, data):
         """
-        Update the models data and key indicating the current selected feature
+        Update the models data and key indicating the current selected feature.
+        While the selected group remains its rows are updated in place, 
+        otherwise the model is reset to the first group
 
         @param data: Data as formatted bu UIDataManager
         @type data: dictionary
         """
         
-        if data:
+        if not data: return
+        key = None
+        if self.dict_key and self._data != self.dummyData:
+            # group rows change key when their values change, match on (id, change type) 
+            key = next((k for k in data if k[:2] == self.dict_key[:2]), None)
+        if key is None:
+            self.beginResetModel()
             self._data = data
-            # reset dict key
             self.dict_key = self._data.keys()[0]
+            self.endResetModel()
+            return
+        # the models own copy of the selected rows, updated in place
+        rows = list(self._data[self.dict_key])
+        self._data = dict(data)
+        self._data[key] = rows
+        self.dict_key = key
+        syncRows(self, rows, data[key], lambda row: row[0])
     
     def headerData(self, col, orientation, role):
         """ 
@@ -212,7 +276,11 @@ class FeatureTableModel(QAbstractTableModel):
         
 class GroupTableModel(QAbstractTableModel):
     """ 
-    Table Model for Group Tables
+    Table Model for Group Tables. Rows are exposed lazily, in blocks 
+    fetched as the view scrolls, and are sorted and filtered by the model 
+    over an index array of row references using typed sort keys 
+    computed once per row. Filters are resolved through inverted indexes 
+    of the INDEXES attributes, maintained as the data changes
     
     @param QAbstractTableModel: Inherits from QAbstractTableModel
     @type QAbstractTableModel: QAbstractTableModel
@@ -235,11 +303,125 @@ class GroupTableModel(QAbstractTableModel):
         QAbstractTableModel.__init__(self, parent)
         self.dummyData = {('','', '', '', ''): [['', '', '', '', '']]}
         if not data: data = self.dummyData
-        self._data = sorted(data.keys())
+        # row reference (id, change type): row 
+        self._rows = dict((self.ref(row), row) for row in data.keys())
+        # row reference: sort key per column
+        self._keys = dict((ref, self.sortKey(row)) for ref, row in self._rows.items())
+        # index name: {value: set of row references}
+        self._indexes = dict((name, {}) for name in INDEXES)
+        # row reference: (feature rows, {index name: values}) the row is indexed by
+        self._indexed = {}
+        for row, features in data.items():
+            self._index(self.ref(row), row, features)
+        # references of the rows passing the filter, in display order
+        self._view = sorted(self._rows)
+        # number of leading view rows exposed to views
+        self._fetched = min(len(self._view), FETCH_SIZE)
+        self._sortColumn = None
+        self._sortOrder = Qt.AscendingOrder
+        # index name: values accepted, and the references of the rows matching
+        self._filters = {}
+        self._matches = None
         self.groupModel = featureModel
         self.headerdata = headerdata
         self._lookup = None
 
+    @staticmethod
+    def ref(row):
+        """
+        Returns the reference identifying a group row
+
+        @param row: Group row
+        @type row: tuple
+
+        @return: (GroupId, ChangeType)
+        @rtype: tuple
+        """
+
+        return row[:2]
+
+    @staticmethod
+    def sortKey(row):
+        """
+        Returns the typed sort key of each column of a row. Numbers sort 
+        numerically and ahead of text, text sorts case insensitively
+
+        @param row: Group row
+        @type row: tuple
+
+        @return: Sort key per column
+        @rtype: tuple
+        """
+
+        return tuple((0, value) if isinstance(value, (int, long, float)) else (1, unicode(value).lower()) for value in row)
+
+    @staticmethod
+    def indexValues(row, features):
+        """
+        Returns the values a group is indexed under 
+
+        @param row: Group row
+        @type row: tuple
+        @param features: Feature rows of the group
+        @type features: list
+
+        @return: Values per index name
+        @rtype: dictionary
+        """
+
+        return {'change': (row[1],), 'organisation': (row[2],), 'submitter': (row[3],), 
+                'locality': tuple(set(f[5] for f in features if len(f) > 5))}
+
+    def _index(self, ref, row, features):
+        """
+        Adds a row to the inverted indexes
+        """
+
+        values = self.indexValues(row, features)
+        for name, vals in values.items():
+            index = self._indexes[name]
+            for value in vals:
+                index.setdefault(value, set()).add(ref)
+        self._indexed[ref] = (features, values)
+
+    def _unindex(self, ref):
+        """
+        Removes a row from the inverted indexes
+        """
+
+        features, values = self._indexed.pop(ref)
+        for name, vals in values.items():
+            index = self._indexes[name]
+            for value in vals:
+                index[value].discard(ref)
+                if not index[value]: del index[value]
+
+    def _match(self):
+        """
+        Returns the references of the rows matching the filters, intersecting
+        the union of the rows of the values accepted by each filter. None
+        if there are no filters 
+        """
+
+        if not self._filters: return None
+        matches = [set().union(*[self._indexes[name].get(value, ()) for value in values]) 
+                   for name, values in self._filters.items()]
+        matches.sort(key = len)
+        return matches[0].intersection(*matches[1:])
+
+    def indexedValues(self, name):
+        """
+        Returns the distinct values of an indexed attribute
+
+        @param name: Index name, one of INDEXES
+        @type name: string
+
+        @return: Values held by at least one row
+        @rtype: list
+        """
+
+        return self._indexes[name].keys()
+
     def tableSelectionMade(self, row):
         """ 
         Returns the reference to the selected group data
@@ -253,7 +435,8 @@ class GroupTableModel(QAbstractTableModel):
         """
         
         self.setKey(row)
-        return (self._data[row][0],self._data[row][1])
+        if row == -1: return (None, None)
+        return self._view[row]
         
     def setKey(self, row):
         """
@@ -266,19 +449,18 @@ class GroupTableModel(QAbstractTableModel):
         if row == -1:
             key = None
         else:
-            key = self._data[row]
+            key = self._rows[self._view[row]]
         self.groupModel.setKey(key)
         
     def rowCount(self, QModelIndex_parent=None, *args, **kwargs):
         """
-        Return the number of rows in a table
+        Return the number of rows exposed to views
         
         @return: number of rows in a table
         @rtype: integer
         """
         
-        if self._data == self.dummyData: return 0
-        return len(self._data)
+        return self._fetched
     
     def columnCount(self, QModelIndex_parent=None, *args, **kwargs):
         """
@@ -288,8 +470,34 @@ class GroupTableModel(QAbstractTableModel):
         @rtype: integer
         """
         
-        if self._data == self.dummyData: return 0
-        return len(self._data[0])
+        return len(self.headerdata) if self.headerdata else 0
+
+    def canFetchMore(self, parent):
+        """
+        Returns True while view rows remain to be exposed
+        """
+
+        return not parent.isValid() and self._fetched < len(self._view)
+
+    def fetchMore(self, parent):
+        """
+        Exposes the next block of view rows
+        """
+
+        self._expose(min(len(self._view), self._fetched + FETCH_SIZE))
+
+    def _expose(self, count):
+        """
+        Exposes the leading count rows of the view
+
+        @param count: Number of rows to be exposed
+        @type count: integer
+        """
+
+        if count <= self._fetched: return
+        self.beginInsertRows(QModelIndex(), self._fetched, count-1)
+        self._fetched = count
+        self.endInsertRows()
 
     def data(self, index, int_role=None):
         """ 
@@ -309,18 +517,130 @@ class GroupTableModel(QAbstractTableModel):
         row =index.row()
         col =index.column()
         if int_role == Qt.DisplayRole:
-            return str(self._data[row][col])
-    
+            return str(self._rows[self._view[row]][col])
+
+    def sort(self, column, order = Qt.AscendingOrder):
+        """
+        Sorts the view rows by the typed keys of a column
+
+        @param column: Column to sort on, -1 restores the data order
+        @type column: integer
+        @param order: Qt.AscendingOrder or Qt.DescendingOrder
+        @type order: Qt.SortOrder
+        """
+
+        self._sortColumn = column if column >= 0 else None
+        self._sortOrder = order
+        self._relayout(self._ordered(self._view))
+
+    def setFilter(self, filters = None):
+        """
+        Filters the rows shown to those having one of the accepted values 
+        of each index filtered on
+
+        @param filters: Accepted values by index name, indexes without values are not filtered on. None shows all rows
+        @type filters: dictionary
+        """
+
+        self._filters = dict((name, set(values)) for name, values in (filters or {}).items() if values)
+        self._matches = self._match()
+        self._relayout(self._ordered(self._rows.keys() if self._matches is None else list(self._matches)))
+
+    def _accepted(self, ref):
+        return self._matches is None or ref in self._matches
+
+    def _ordered(self, refs):
+        """
+        Returns row references in the current sort order
+        """
+
+        if self._sortColumn is None: return sorted(refs)
+        keys, column = self._keys, self._sortColumn
+        return sorted(refs, key = lambda ref: keys[ref][column], reverse = self._sortOrder == Qt.DescendingOrder)
+
+    def _relayout(self, view):
+        """
+        Replaces the view rows by a new order or selection of rows. 
+        Persistent indexes, and so view selections, follow their rows 
+        and rows are exposed as far as needed to keep them
+
+        @param view: Row references in display order
+        @type view: list
+        """
+
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        refs = [self._view[index.row()] for index in persistent]
+        pos = dict((ref, i) for i, ref in enumerate(view))
+        self._view = view
+        needed = max([pos[ref] + 1 for ref in refs if ref in pos] or [0])
+        self._fetched = max(needed, min(self._fetched, len(view)))
+        self.changePersistentIndexList(persistent, [self.index(pos[ref], index.column()) if ref in pos else QModelIndex() 
+                                                    for ref, index in zip(refs, persistent)])
+        self.layoutChanged.emit()
+
     def refreshData(self, data):
         """
-        Update the models data
+        Update the models data, signalling only the exposed groups 
+        added, removed or changed
 
         @param data: Data as formatted by UIDataManager
         @type data: dictionary
         """
         
-        if data:
-            self._data = sorted(data.keys())
+        if not data: return
+        rows = dict((self.ref(row), row) for row in data.keys())
+        changed = [ref for ref, row in rows.items() if ref in self._rows and self._rows[ref] != row]
+        for ref in changed:
+            self._keys[ref] = self.sortKey(rows[ref])
+        for ref in rows.viewkeys() - self._rows.viewkeys():
+            self._keys[ref] = self.sortKey(rows[ref])
+        for ref in self._rows.viewkeys() - rows.viewkeys():
+            del self._keys[ref]
+            self._unindex(ref)
+        # reindex rows that are new or changed, or whose feature rows were reformatted
+        reindex = set(changed)
+        for row, features in data.items():
+            ref = self.ref(row)
+            if ref in self._indexed:
+                if ref not in reindex and self._indexed[ref][0] is features: continue
+                self._unindex(ref)
+            self._index(ref, row, features)
+        self._rows = rows
+        self._matches = self._match()
+        # remove runs of rows deleted or now filtered out, last first so row numbers stay valid
+        shown = set(self._view)
+        i = len(self._view)
+        while i > 0:
+            i -= 1
+            if self._shows(self._view[i]): continue
+            last = i
+            while i > 0 and not self._shows(self._view[i-1]): 
+                i -= 1
+            if i < self._fetched:
+                self.beginRemoveRows(QModelIndex(), i, min(last, self._fetched-1))
+                del self._view[i:last+1]
+                self._fetched -= min(last, self._fetched-1) - i + 1
+                self.endRemoveRows()
+            else:
+                del self._view[i:last+1]
+        # changed rows remaining in view
+        if changed:
+            pos = dict((ref, i) for i, ref in enumerate(self._view[:self._fetched]))
+            for ref in changed:
+                if ref in pos:
+                    self.dataChanged.emit(self.index(pos[ref], 0), self.index(pos[ref], self.columnCount()-1))
+        # append rows added or now passing the filter, views see them once fetched
+        added = self._ordered([ref for ref in rows if ref not in shown and self._accepted(ref)])
+        if added:
+            self._view.extend(added)
+            self._expose(min(len(self._view), max(self._fetched, FETCH_SIZE)))
+        # keep the sort order, added rows are already in order amongst themselves
+        if 0 < len(added) < len(self._view) or changed and self._sortColumn is not None:
+            self._relayout(self._ordered(self._view))
+
+    def _shows(self, ref):
+        return ref in self._rows and self._accepted(ref)
     
     def getObjRef(self, rowIndex):
         """
@@ -333,26 +653,26 @@ class GroupTableModel(QAbstractTableModel):
         @rtype: tuple   
         """
         
-        return (self._data[rowIndex.row()][0], self._data[rowIndex.row()][1]) 
+        return self._view[rowIndex.row()]
     
     def getUsers(self):
         """
-        Return all unique sourceUsers as defined in self._data 
+        Return all unique sourceUsers, read from the submitter index 
         
-        @return: unique sourceUsers as defined in self._data 
+        @return: unique sourceUsers of the groups
         @rtype: list
         """
-        return list(set([i[3] for i in self._data]))
+        return self.indexedValues('submitter')
         
     def getOrgs(self):
         """
-        Return all unique sourceOrganisations as defined in self._data 
+        Return all unique sourceOrganisations, read from the organisation index 
         
-        @return: unique sourceOrganisations as defined in self._data 
+        @return: unique sourceOrganisations of the groups
         @rtype: list
         """
         
-        return list(set([i[2] for i in self._data]))
+        return self.indexedValues('organisation')
         
     def headerData(self, col, orientation, role):
         """ 
@@ -386,13 +706,14 @@ class GroupTableModel(QAbstractTableModel):
         if row+1 == self.rowCount():
             #last row, there is no 'next row'
             # rather than row below return row above as alt
-            return self._data[row-1][0]
-        return self._data[row+1][0]
+            return self._view[row-1][0]
+        return self._view[row+1][0]
      
     def findfield(self, recId):
         """ 
         Returns a QmodelIndex when matched the record Id
-        matches a record Id in table model
+        matches a record Id in table model. Rows not yet 
+        fetched are exposed up to the match
 
         @param recId: The Id the repersents an AIMS feature
         @type recId: string
@@ -402,10 +723,8 @@ class GroupTableModel(QAbstractTableModel):
         @rtype: QmodelIndex
         """
         
-        startindex = self.index(0, 0)
-        items = self.match(startindex, Qt.DisplayRole, recId, 1, Qt.MatchExactly | Qt.MatchWrap)
-        try:
-            return items[0]
-        except IndexError:
-            return QModelIndex()
-  
\ No newline at end of file
+        for row, ref in enumerate(self._view):
+            if str(ref[0]) == recId:
+                self._expose(row + 1)
+                return self.index(row, 0)
+        return QModelIndex()
@@ -11,8 +11,8 @@
 
 from qgis.core import *
 from qgis.gui import *
+from PyQt4.QtCore import QObject, QTimer, Qt, pyqtSlot, pyqtSignal
 from PyQt4.QtGui import *
-import time
 
 from AIMSDataManager.AddressFactory import AddressFactory
 from AIMSDataManager.Address import Entity, FeedType
@@ -22,18 +22,29 @@ from AIMSDataManager.AimsLogging import Logger
 
 uilog = None
 
-class ResponseHandler(object):
+# seconds to wait for a response before warning the user
+RESPONSE_TIMEOUT = 20
+
+class ResponseHandler(QObject):
+    
+    # answered and total requests of a batch being handled
+    batchProgressSignal = pyqtSignal(int, int)
     
     # logging
     global uilog
     uilog = Logger.setup(lf='uiLog')
     
     def __init__(self, iface, uidm):
+        QObject.__init__(self)
         self._iface = iface
         self.uidm = uidm
         self.updateSuccessful = None
+        # request id: [feedType, action, callback, expired, batch warnings]
+        self.pending = {}
+        # warnings raised while handling a batch item are held for the end of the batch
+        self.collected = None
+        self.uidm.responseSignal.connect(self.received, Qt.QueuedConnection)
         self.afar= {ft:AddressFactory.getInstance(FEEDS['AR']) for ft in FeedType.reverse}
-        self.afaf= {ft:AddressFactory.getInstance(FEEDS['AF']) for ft in FeedType.reverse}
 
     def updateData(self, respObj , feedType, action):
         """
@@ -62,30 +73,15 @@ class ResponseHandler(object):
             if action == 'supplement':
                 self.updateSuccessful = respObj
                 return
+            # accepted features are written through to the DataManager's
+            # features store and arrive with its next publication
             self.uidm.updateRdata(respObj, feedType)
-            if respObj._queueStatus == 'Accepted':
-                self.ismeshblockoverride(respObj)
-                respObj = self.afaf[FeedType.FEATURES].cast(respObj)
-                self.uidm.updateFdata(respObj)
         else:
             self.updateSuccessful = False
             return 
         self.updateSuccessful = True
         return 
     
-    def ismeshblockoverride(self, respObj):
-        """
-        The derived mblk override flag is not in the resp
-        obj, here we check and create if need be
-        
-        @param respObj: AIMS Feature
-        @type  respObj: AIMSDataManager.Address.AddressResolution
-        """
-         
-        if hasattr(respObj, '_codes_meshblock'): 
-            if respObj._codes_meshblock:
-                respObj.setIsMeshblockOverride(True)
-    
     def displayWarnings (self, warnings):
         """
         Raise warnings to the user
@@ -94,73 +90,199 @@ class ResponseHandler(object):
         @type  warnings: tuple
         """
         
+        if self.collected is not None:
+            self.collected.extend(warnings)
+            return
         message = ''
         for warning in warnings:
             message += u'\u2022 {}\n'.format(warning)
         QMessageBox.warning(self._iface.mainWindow(),"Action Rejected", message)
      
-    def matchResp (self, response, respId, feedType, i, action):
+    def matchResp (self, resp, feedType, waited, action):
         """
         Compile a list of warnings that are at the "Reject" level.
-        If there are no warnings for the matching respID, proceed to update data
+        If there are no warnings for the response, proceed to update data
 
-        @param response: AIMS Feature
-        @type  response: AIMSDataManager.Address.AddressResolution
-        @param respId: Int that relates the request and response
-        @type  respId: integer
+        @param resp: AIMS Feature
+        @type  resp: AIMSDataManager.Address.AddressResolution
         @param feedType: feed type indicator
         @type feedType: AIMSDataManager.AimsUtility.FeedRef
-        @param i: Number iterations taken the responseHandler to receive a response. Logging only
-        @type i: integer
+        @param waited: Seconds taken to receive the response. Logging only
+        @type waited: float
         @param action: Either Accept or Decline indicating review actions
         @type action: QtGui.QWidget()
         """
         
-        warnings = []
-        for resp in response:
-            if resp.meta._requestId == respId:  
-                #logging
-                uilog.info(' *** DATA ***    response received from DM for respId: {0} of type: {1} after {2} seconds'.format(respId, feedType, i))    
-                if resp.meta._errors['reject']:
-                    self.displayWarnings(resp.meta.errors['reject'])
-                    return True
-                
-                # Hack -- failed acceptance but has an accepted status
-                elif resp.meta._errors['warning'] and resp._queueStatus == 'Accepted':
-                    self.displayWarnings(resp.meta.errors['warning'])    
-                    resp.setQueueStatus('Under Review') 
-                # Hack -- failed acceptance but  has an accepted status
-                elif resp.meta._errors['error'] and resp._queueStatus == 'Accepted':
-                    self.displayWarnings(resp.meta.errors['error'])
-                    resp.setQueueStatus('Under Review')         
+        #logging
+        uilog.info(' *** DATA ***    response received from DM for respId: {0} of type: {1} after {2:.1f} seconds'.format(resp.meta._requestId, feedType, waited))    
+        if resp.meta._errors['reject']:
+            self.displayWarnings(resp.meta.errors['reject'])
+            return
+        
+        # Hack -- failed acceptance but has an accepted status
+        elif resp.meta._errors['warning'] and resp._queueStatus == 'Accepted':
+            self.displayWarnings(resp.meta.errors['warning'])    
+            resp.setQueueStatus('Under Review') 
+        # Hack -- failed acceptance but  has an accepted status
+        elif resp.meta._errors['error'] and resp._queueStatus == 'Accepted':
+            self.displayWarnings(resp.meta.errors['error'])
+            resp.setQueueStatus('Under Review')         
 
-                # else captured resp and no critical warnings
-                # precede to update self._data
-                self.updateData(resp, feedType, action)
-                return True
+        # else captured resp and no critical warnings
+        # precede to update self._data
+        self.updateData(resp, feedType, action)
             
-    def handleResp(self, respId, feedType, action = None):
+    def handleResp(self, future, feedType, action = None, callback = None):
         """
-        Test for a response in the response queue with the relevant repId'''
+        Register handling of the response to a request and return at once.
+        When the response arrives the UI data is updated and the callback 
+        called with the outcome. If it takes longer than RESPONSE_TIMEOUT 
+        seconds the user is warned and the callback called with None
         
-        @param respId: Int that relates the request and response
-        @type  respId: integer
+        @param future: Handle on the response, as returned by the UiDataManager action methods
+        @type  future: AIMSDataManager.Request.RequestFuture
         @param feedType: feed type indicator
         @type feedType: AIMSDataManager.AimsUtility.FeedRef
         @param action: Either Accept or Decline indicating review actions
         @type action: QtGui.QWidget()
+        @param callback: Called once with the update result, True/False, for 'supplement' the response feature or None on time out
+        @type callback: function
         """
-        self.updateSuccessful = False 
         
-        for i in range(0,20):
-            resp = self.uidm.response(feedType)
-            if resp and resp != (None,): # found and processed response
-                if self.matchResp(resp, respId, feedType, i, action):
-                    return self.updateSuccessful  
-            else: time.sleep(1)                                            
+        self.pending[future.reqid] = [feedType, action, callback, False, None]
+        QTimer.singleShot(RESPONSE_TIMEOUT*1000, lambda: self.expire(future))
+    
+    def expire(self, future):
+        """
+        Warn the user if a response is still outstanding. A late response
+        still updates the data but the callback has already been called
+
+        @param future: Handle on the response
+        @type  future: AIMSDataManager.Request.RequestFuture
+        """
         
+        entry = self.pending.get(future.reqid)
+        if not entry or entry[3]: return
+        entry[3] = True
         self._iface.messageBar().pushMessage("Incomplete Response", "Data may not be complete - Please expect a data refresh shortly", level=QgsMessageBar.WARNING)
         #logging 
-        uilog.info(' *** DATA ***    Time Out ({0} seconds): No response received from DM for respId: {1} of feedtype: {2}'.format(i, respId, feedType))    
+        uilog.info(' *** DATA ***    Time Out ({0} seconds): No response received from DM for respId: {1} of feedtype: {2}'.format(RESPONSE_TIMEOUT, future.reqid, entry[0]))    
+        if entry[2]: entry[2](None)
+    
+    @pyqtSlot(object)
+    def received(self, future):
+        """
+        Slot receiving completed requests from the UiDataManager, handles
+        responses to requests registered with handleResp
+
+        @param future: Handle on the completed request
+        @type  future: AIMSDataManager.Request.RequestFuture
+        """
+        
+        entry = self.pending.pop(future.reqid, None)
+        if not entry: return
+        feedType, action, callback, expired, self.collected = entry
+        self.updateSuccessful = False
+        resp = future.result(0)
+        try:
+            if resp is None:
+                uilog.info(' *** DATA ***    Request failed for respId: {0} of feedtype: {1} - {2}'.format(future.reqid, feedType, future.error()))
+                self.displayWarnings(('Request failed - {}'.format(future.error()),))
+            else:
+                self.matchResp(resp, feedType, future.completed - future.created, action)
+        finally:
+            self.collected = None
+        if callback and not expired: callback(self.updateSuccessful)
+    
+    def handleBatch(self, batch, feedType, action = None, callback = None):
+        """
+        Register handling of the responses to a batch of requests and 
+        return at once. Each response updates the UI data as it arrives,
+        progress is shown in the message bar and emitted as batchProgressSignal.
+        Warnings are shown together once the batch completes. If no response
+        arrives for RESPONSE_TIMEOUT seconds the rest of the batch is abandoned
+        
+        @param batch: Handle on the responses, as returned by the UiDataManager batch methods
+        @type  batch: AIMSDataManager.Request.BatchFuture
+        @param feedType: feed type indicator
+        @type feedType: AIMSDataManager.AimsUtility.FeedRef
+        @param action: Either Accept or Decline indicating review actions
+        @type action: QtGui.QWidget()
+        @param callback: Called once with the update result of each request, in request order
+        @type callback: function
+        """
+        
+        state = {'outcomes':[None]*len(batch), 'count':0, 'warnings':[], 'callback':callback, 'finished':False}
+        for i, future in enumerate(batch.futures):
+            self.pending[future.reqid] = [feedType, action, lambda outcome, i=i: self.batchItem(state, i, outcome), False, state['warnings']]
+        
+        messageBar = self._iface.messageBar()
+        state['message'] = messageBar.createMessage('Processing', '{} requests'.format(len(batch)))
+        state['progress'] = QProgressBar()
+        state['progress'].setMaximum(len(batch))
+        state['message'].layout().addWidget(state['progress'])
+        messageBar.pushWidget(state['message'], QgsMessageBar.INFO)
+        
+        # restarted on each response so only a stalled batch times out
+        state['timer'] = QTimer(self)
+        state['timer'].setSingleShot(True)
+        state['timer'].timeout.connect(lambda: self.expireBatch(batch, state))
+        state['timer'].start(RESPONSE_TIMEOUT*1000)
+        if not batch.futures: self.finishBatch(state)
+    
+    def batchItem(self, state, i, outcome):
+        """
+        Response callback for a batch item, records the outcome and progress
+
+        @param state: Batch handling state
+        @type  state: dictionary
+        @param i: Position of the request in the batch
+        @type  i: integer
+        @param outcome: Update result of the request
+        @type  outcome: boolean
+        """
+        
+        state['outcomes'][i] = outcome
+        state['count'] += 1
+        state['progress'].setValue(state['count'])
+        self.batchProgressSignal.emit(state['count'], len(state['outcomes']))
+        if state['count'] == len(state['outcomes']):
+            self.finishBatch(state)
+        else:
+            state['timer'].start(RESPONSE_TIMEOUT*1000)
+    
+    def expireBatch(self, batch, state):
+        """
+        Abandon the outstanding requests of a stalled batch, late 
+        responses still update the data
+
+        @param batch: Handle on the responses
+        @type  batch: AIMSDataManager.Request.BatchFuture
+        @param state: Batch handling state
+        @type  state: dictionary
+        """
+        
+        outstanding = [self.pending[f.reqid] for f in batch.futures if f.reqid in self.pending]
+        for entry in outstanding: entry[3] = True
+        self._iface.messageBar().pushMessage("Incomplete Response", "{} requests unanswered - Please expect a data refresh shortly".format(len(outstanding)), level=QgsMessageBar.WARNING)
+        uilog.info(' *** DATA ***    Time Out ({0} seconds): {1} of {2} batch requests unanswered'.format(RESPONSE_TIMEOUT, len(outstanding), len(batch)))
+        self.finishBatch(state)
+    
+    def finishBatch(self, state):
+        """
+        Clear batch progress, show any collected warnings and 
+        call the batch callback
+
+        @param state: Batch handling state
+        @type  state: dictionary
+        """
+        
+        if state['finished']: return
+        state['finished'] = True
+        state['timer'].stop()
+        self._iface.messageBar().popWidget(state['message'])
+        if state['warnings']:
+            self.displayWarnings(state['warnings'])
+        if state['callback']: state['callback'](state['outcomes'])
     
            
\ No newline at end of file
@@ -18,6 +18,7 @@ from qgis.gui import *
 from Ui_ReviewQueueWidget import Ui_ReviewQueueWidget
 from QueueEditorWidget import QueueEditorWidget
 from AIMSDataManager.AimsUtility import FeedType, FEEDS
+from AIMSDataManager.Address import ROAD_COMPONENTS
 from QueueModelView import *
 from UiUtility import UiUtility 
 import time
@@ -38,6 +39,12 @@ except:
 
 uilog = None
 
+# distance (degrees, about 5m) within which the same number on the same road is a duplicate
+DUPLICATE_RADIUS = 0.00005
+# flat address attributes compared to find a duplicate
+DUPLICATE_COMPONENTS = ('_components_unitValue', '_components_addressNumber', '_components_addressNumberHigh',
+                        '_components_addressNumberSuffix') + ROAD_COMPONENTS
+
 class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
     ''' connects View <--> Proxy <--> Data Model 
                 and manage review data'''
@@ -60,6 +67,8 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
         self.currentGroup = (0,0) #(id, type)
         self.altSelectionId = ()
         self.comboSelection = []   
+        # formatted review data received so far from the worker
+        self.tableData = {}
         
         
         # Connections
@@ -80,16 +89,13 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
         self.featuresTableView.setColumnHidden(5, True)
         self.featuresTableView.selectRow(0)       
         
-        # Group View 
-        self._groupProxyModel = QSortFilterProxyModel()
-        self._groupProxyModel.setFilterCaseSensitivity(Qt.CaseInsensitive)
-        self._groupProxyModel.layoutChanged.connect(self.groupSelected)
+        # Group View, sorted and filtered by the model itself
         groupHeader = ['Id', 'Change', 'Source Org.', 'Submitter Name', 'Date']   
         self.groupTableView = self.uGroupTableView
         
         self.groupModel = GroupTableModel(self.reviewData, self.featureModel, groupHeader)
-        self._groupProxyModel.setSourceModel(self.groupModel)
-        self.groupTableView.setModel(self._groupProxyModel)
+        self.groupModel.layoutChanged.connect(self.groupSelected)
+        self.groupTableView.setModel(self.groupModel)
         self.groupTableView.resizeColumnsToContents()
         self.groupTableView.rowSelectionChanged.connect(self.groupSelected)
                 
@@ -137,19 +143,40 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
         
     def refreshData(self):
         """
-        Update Review Queue data 
+        Request Review Queue data, formatted off the main thread
         """
         
-        # request new data
-        self.reviewData = self.uidm.formatTableData((FEEDS['GR'],FEEDS['AR']))
+        self.tableData = {}
+        self.uidm.requestTableData(self.tableDataReceived)
+
+    def tableDataReceived(self, chunk, last, error = None):
+        """
+        Receives formatted review data in chunks. Once complete the models 
+        are updated, signalling only the rows that changed so the views 
+        keep their selection and scroll state
+
+        @param chunk: (group row, feature rows) pairs
+        @type chunk: list
+        @param last: True for the final chunk
+        @type last: boolean
+        @param error: Exception that ended formatting early, otherwise None
+        @type error: Exception
+        """
+        
+        self.tableData.update(chunk)
+        if not last: return
+        if error:
+            # keep the tables as they were rather than show a partial queue
+            self.tableData = {}
+            uilog.error('*** NOTIFY ***     Table Data not refreshed, {}'.format(error))
+            self._iface.messageBar().pushMessage("Review Queue", "Review data could not be refreshed", 
+                                                 level=QgsMessageBar.WARNING, duration = 5)
+            return
+        self.reviewData = self.tableData or {('','', '', '', ''): [['', '', '', '', '']]}
+        self.tableData = {}
  
-        self.groupModel.beginResetModel()
         self.groupModel.refreshData(self.reviewData)        
-        self.groupModel.endResetModel()
-        
-        self.featureModel.beginResetModel()
         self.featureModel.refreshData(self.reviewData)
-        self.featureModel.endResetModel()
         self.popUserCombo()
         
         uilog.info('*** NOTIFY ***     Table Data Refreshed')
@@ -172,7 +199,7 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
             self.groupModel.setKey(row)
 
             if row != -1:
-                self.groupTableView.selectRow(self._groupProxyModel.mapFromSource(matchedIndex).row())
+                self.groupTableView.selectRow(matchedIndex.row())
                 #self.featuresTableView.selectRow(0)
                 self.reinstateFeatSelection()
                 coords = self.uidm.reviewItemCoords(self.currentGroup, self.currentFeatureKey)
@@ -249,24 +276,23 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
         @type row: integer
         """
 
-        proxyIndex = self.groupTableView.selectionModel().currentIndex()
-        sourceIndex = self._groupProxyModel.mapToSource(proxyIndex)
-        self.currentGroup = self.groupModel.tableSelectionMade(sourceIndex.row())
+        index = self.groupTableView.selectionModel().currentIndex()
+        self.currentGroup = self.groupModel.tableSelectionMade(index.row())
 
-        altProxyIndex = self.groupTableView.model().index(proxyIndex.row()+1,0)
+        altIndex = self.groupModel.index(index.row()+1,0)
         
-        if self._groupProxyModel.rowCount() == 0:
+        if self.groupModel.rowCount() == 0:
             self.currentGroup = None
             self.altSelectionId = 0
-        elif self._groupProxyModel.rowCount() == 1:
+        elif self.groupModel.rowCount() == 1:
             self.altSelectionId = 0
             #self.featuresTableView.selectRow(0)
             self.reinstateFeatSelection()
             return
-        elif altProxyIndex.row() == -1:
-            altProxyIndex = self.groupTableView.model().index(proxyIndex.row()-1,0)
+        elif altIndex.row() == -1:
+            altIndex = self.groupModel.index(index.row()-1,0)
             
-        self.altSelectionId = self.groupTableView.model().data(altProxyIndex)
+        self.altSelectionId = self.groupModel.data(altIndex, Qt.DisplayRole)
         self.reinstateFeatSelection()
         #self.featuresTableView.selectRow(0)
    
@@ -286,30 +312,27 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
         self.applyFilter(self.comboBoxUser)
         self.groupSelected()
 
-    def groupsFilter(self, row, data):
+    def groupsFilter(self, users):
         """
-        Apply filter to group data
+        Apply filter to group data, showing the groups submitted by users
         
-        @param data: String of active group filter item separated by vBars
-        @type data: string     
+        @param users: Active group filter items, all groups are shown if empty
+        @type users: list     
         """
         
-        self._groupProxyModel.setFilterKeyColumn(-1)
-        self._groupProxyModel.setFilterRegExp(data)      
+        self.groupModel.setFilter({'submitter': users})
       
     def applyFilter(self, parent):
         """ 
         Filter Group Table when the comboBoxUser parameters are modified
         """
         self.comboSelection = []   
-        uFilter = ''
         model = parent.model()
         for row in range(model.rowCount()): 
             item = model.item(row)
             if item.checkState() == Qt.Checked:
-                uFilter+='|'+item.text()
                 self.comboSelection.append(item.text())
-        self.groupsFilter(row, str(uFilter)[1:])
+        self.groupsFilter(self.comboSelection)
                 
     def popUserCombo(self):
         """
@@ -351,9 +374,8 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
             return
         if UiUtility.formCompleteness('update', self.uQueueEditor, self._iface ):        
             UiUtility.formToObj(self)
-            respId = int(time.time())
-            self.uidm.repairAddress(self.feature, respId)
-            self._controller.RespHandler.handleResp(respId, FEEDS['AR'])
+            future = self.uidm.repairAddress(self.feature)
+            self._controller.RespHandler.handleResp(future, FEEDS['AR'])
             self.feature = None
             self.uQueueEditor.featureId = 0
     
@@ -371,15 +393,17 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
         """
         info = []
         dupOnRoad = 'Address is not Unique on the road object'
+        # Existing features nearby, where indexed
+        if self.nearbyDuplicate(reviewObj): info.append(dupOnRoad)
         # Standard API feed
         if hasattr(reviewObj.meta,'_entities'):
-            info = [reviewObj.meta._entities[x]._description for x in range(len(reviewObj.meta._entities))
+            info += [reviewObj.meta._entities[x]._description for x in range(len(reviewObj.meta._entities))
                     if hasattr(reviewObj.meta._entities[x], '_description')] 
         # Temp obj created from API response
         if hasattr(reviewObj.meta,'_errors'):
             # is dict if populated 
             if type(reviewObj.meta._errors) is dict:
-                info = [reviewObj.meta._errors['info'][x] for x in range(len(reviewObj.meta._errors['info']))
+                info += [reviewObj.meta._errors['info'][x] for x in range(len(reviewObj.meta._errors['info']))
                         if reviewObj.meta._errors.has_key('info')]
             
         if dupOnRoad in info: 
@@ -390,6 +414,32 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
                 return False
         
         return True
+    
+    def nearbyDuplicate(self, reviewObj):
+        """
+        Searches the spatially indexed features near an add or update 
+        review item for an address with the same number on the same road
+
+        @param reviewObj: resolution object that is being accepted
+        @type reviewObj: AIMSDataManager.Address
+
+        @return: Duplicate Address object or None
+        @rtype: AIMSDataManager.Address
+        """
+        
+        if getattr(reviewObj, '_changeType', None) not in ('Add', 'Update'): return None
+        coords = reviewObj.getCoordinates()
+        if not coords: return None
+        if getattr(reviewObj, '_components_addressNumber', None) is None: return None
+        # features and add/update review items both hold their components flat
+        key = lambda f: tuple(getattr(f, k, None) for k in DUPLICATE_COMPONENTS)
+        address = key(reviewObj)
+        addressId = getattr(reviewObj, '_components_addressId', None)
+        for feature in self.uidm.featuresWithin(coords, DUPLICATE_RADIUS) or []:
+            if getattr(feature, '_components_addressId', None) == addressId: continue
+            if key(feature) == address:
+                return feature
+        return None
         
     
     def reviewResolution(self, action):
@@ -400,23 +450,38 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
         @type feedType: AIMSDataManager.AimsUtility.FeedRef
         """
         
+        # selected items are sent as one batch per feed
+        batches = {FEEDS['AR']:[], FEEDS['GR']:[]}
         for row in self.groupTableView.selectionModel().selectedRows():
-            sourceIndex = self._groupProxyModel.mapToSource(row)
             objRef = ()
-            objRef = self.groupModel.getObjRef(sourceIndex)
+            objRef = self.groupModel.getObjRef(row)
             feedType = FEEDS['GR'] if objRef[1] not in ('Add', 'Update', 'Retire' ) else FEEDS['AR'] 
             reviewObj = self.singleReviewObj(feedType, objRef[0])
             if reviewObj: 
-                respId = int(time.time()) 
-                if action == 'accept':
-                    if not self.isDuplicateOnRoad(reviewObj): return
-                    self.uidm.accept(reviewObj,feedType, respId)
-                elif action == 'decline':
-                    self.uidm.decline(reviewObj, feedType, respId)
-                    
-                if self._controller.RespHandler.handleResp(respId, feedType, action):
-                    self.highlight.hideReview()
-                self.reinstateSelection()
+                # declining the duplicate warning stops the selection at this item
+                if action == 'accept' and not self.isDuplicateOnRoad(reviewObj): break
+                batches[feedType].append(reviewObj)
+        
+        for feedType, reviewObjs in batches.items():
+            if not reviewObjs: continue
+            if action == 'accept':
+                batch = self.uidm.acceptFeatures(reviewObjs, feedType)
+            elif action == 'decline':
+                batch = self.uidm.declineFeatures(reviewObjs, feedType)
+            self._controller.RespHandler.handleBatch(batch, feedType, action, self.resolved)
+    
+    def resolved(self, outcomes):
+        """
+        Response callback for batched review actions, hides the review 
+        highlight once data is updated and reselects the next item
+
+        @param outcomes: Update result of each review item
+        @type outcomes: list
+        """
+        
+        if any(outcomes):
+            self.highlight.hideReview()
+        self.reinstateSelection()
                 
     def decline(self):
         """
@@ -443,8 +508,10 @@ class ReviewQueueWidget( Ui_ReviewQueueWidget, QWidget ):
                 return
             self.currentAdrCoord = coords
             buffer = .00100
-            extents = QgsRectangle( coords[0]-buffer,coords[1]-buffer,
-                                  coords[0]+buffer,coords[1]+buffer)
+            # corners are in AIMS srs, take them to the canvas srs in one pass
+            sw, ne = UiUtility.transformPoints(self._iface, [(coords[0]-buffer,coords[1]-buffer),
+                                                             (coords[0]+buffer,coords[1]+buffer)], reverse=True)
+            extents = QgsRectangle(sw, ne)
             self._iface.mapCanvas().setExtent( extents )
             self._iface.mapCanvas().refresh()
             self.setMarker(coords)
@@ -16,9 +16,11 @@ import time
 import threading
 
 from AIMSDataManager.DataManager import DataManager
+from AIMSDataManager.SyncProcess import DataManagerClient
 from AIMSDataManager.AimsLogging import Logger
-from AIMSDataManager.AimsUtility import FeedType, FeedRef, FeatureType, FEEDS
+from AIMSDataManager.AimsUtility import FeedType, FeedRef, FeatureType, FEEDS, mergeDelta
 from AimsUI.AimsClient.Gui.ReviewQueueWidget import ReviewQueueWidget
+from AimsUI.AimsClient.Gui.UiWorker import UiWorker
 # Dev only - debugging
 try:
     import sys
@@ -29,7 +31,16 @@ try:
 except:
     pass
 
+try:
+    from AIMSDataManager.Const import SYNC_PROCESS
+except ImportError:
+    # config files predating the option
+    SYNC_PROCESS = False
+
 uilog = None
+
+# features closer than this (degrees) are treated as stacked
+STACK_TOLERANCE = 1e-7
     
 class UiDataManager(QObject):
     """ 
@@ -42,6 +53,8 @@ class UiDataManager(QObject):
 
     rDataChangedSignal = pyqtSignal()
     fDataChangedSignal = pyqtSignal()
+    # emitted with the RequestFuture of each request once its response arrives
+    responseSignal = pyqtSignal(object)
     
     #logging 
     global uilog
@@ -68,6 +81,17 @@ class UiDataManager(QObject):
                         FEEDS['GC']:{},
                         FEEDS['GR']:{}
                     }
+        # review items of the AR and GR feeds keyed by change id
+        self.combined = {}
+        # change id: group id of grouped review items
+        self.grouped = {}
+        # group id: (group id, group) key of the GR data
+        self.groupKeys = {}
+        # review table rows keyed by (feed, id): (objects projected, group row, feature rows)
+        # only used by the worker thread
+        self.rowCache = {}
+        # formats table and layer data off the main thread
+        self.worker = UiWorker()
 
         self.groups = ('Replace', 'AddLineage', 'ParcelReferenceData') # more to come...
         
@@ -76,22 +100,15 @@ class UiDataManager(QObject):
         
     def startDM(self):
         """
-        Start running the DM observer thread and Listener
-        (of the DM observer) thread when the plugin is enabled 
+        Start the DataManager when the plugin is enabled and register 
+        the DM observer, which delivers each feed update to dataUpdated
         """
 
-        self.dm = DataManager()
-        # common data obj
-        self.DMData = DMData()           
-        dmObserver = DMObserver(self.DMData, self.dm)
-                
-        listener = Listener(self.DMData)
-        self.connect(listener, SIGNAL('dataChanged'), self.dataUpdated)
-        #### 
-
-
-        listener.start()
-        dmObserver.start()
+        # optionally run the sync engine out of process, keeping feed parsing off the QGIS main thread
+        self.dm = DataManagerClient() if SYNC_PROCESS else DataManager()
+        self.dmObserver = DMObserver()
+        self.dmObserver.feedSignal.connect(self.feedUpdated, Qt.QueuedConnection)
+        self.dm.registermain(self.dmObserver)
         uilog.info('dm started')
         
     def killDm(self):
@@ -99,6 +116,7 @@ class UiDataManager(QObject):
         Close DataManager at plugin unload
         """
         
+        self.worker.close()
         if self.dm:
             self.dm.close()
     
@@ -113,8 +131,26 @@ class UiDataManager(QObject):
 
         self._observers.append(observer)
 
-    @pyqtSlot()
-    def dataUpdated(self, data = None, feedType = FEEDS['AR']):
+    @pyqtSlot(object, int)
+    def feedUpdated(self, feedType, version):
+        """
+        Slot receiving feed updates from the DM observer. Updates 
+        queued while earlier ones were handled have already been 
+        merged and applied, so a burst of updates is only applied once
+
+        @param feedType: Type of AIMS API feed
+        @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+        @param version: update number of the feed
+        @type  version: integer
+        """
+
+        update = self.dmObserver.take(feedType)
+        if not update:
+            return
+        uilog.info('*** DATA ***    {} update {} applied'.format(feedType, version))
+        self.dataUpdated(update[0], feedType, update[1])
+
+    def dataUpdated(self, data = None, feedType = FEEDS['AR'], delta = None):
         """
         Slot communicated to when Review data changed. Updates review layer and table data
 
@@ -122,9 +158,14 @@ class UiDataManager(QObject):
         @type  data: list
         @param feedType: Type of AIMS API feed
         @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+        @param delta: features changed since the last update, None rekeys all of data
+        @type  delta: tuple ({id: feature}, [id])
         """
 
-        self.setData(data,feedType)
+        if delta is None:
+            self.setData(data,feedType)
+        else:
+            self.applyDelta(delta, feedType)
         for observer in self._observers:
             observer.notify(feedType)
 
@@ -135,13 +176,111 @@ class UiDataManager(QObject):
             {(groupId, groupObj): {addId: addObj, addId: addObj}, (gro...}} 
         """
 
-        gDict = {}
-        for gId, gFeats in self.data[FEEDS['GR']].items():
-            fDict = {}
-            for gFeat in gFeats.meta._entities:
-                fDict[gFeat._changeId]=gFeat
-            gDict[(gId, gFeats)]=fDict
-        self.data[FEEDS['GR']] = gDict
+        groups = self.data[FEEDS['GR']]
+        self.data[FEEDS['GR']] = {}
+        self.groupKeys = {}
+        for gId, gFeats in groups.items():
+            self._keyGroup(gId, gFeats)
+
+    def _keyGroup(self, gId, group):
+        """
+        Adds a group and its review items to the GR data
+
+        @param gId: group id
+        @type  gId: integer
+        @param group: Aims Group object
+        @type  group: AIMSDataManager.Group
+
+        @return: Group items keyed by change id
+        @rtype: dictionary
+        """
+
+        fDict = dict((gFeat._changeId, gFeat) for gFeat in group.meta._entities)
+        key = (gId, group)
+        self.data[FEEDS['GR']][key] = fDict
+        self.groupKeys[gId] = key
+        return fDict
+
+    def _addGroup(self, gId, group):
+        """
+        Adds a group to the GR data and its items to the combined review data
+        """
+
+        for cId, gFeat in self._keyGroup(gId, group).items():
+            self.grouped[cId] = gId
+            self.combined[cId] = gFeat
+
+    def _removeGroup(self, gId):
+        """
+        Removes a group from the GR data and its items from the combined 
+        review data, where an AR item shares their id it takes their place
+        """
+
+        key = self.groupKeys.pop(gId, None)
+        if not key: return
+        for cId in self.data[FEEDS['GR']].pop(key):
+            if self.grouped.get(cId) != gId: continue
+            del self.grouped[cId]
+            self.combined.pop(cId, None)
+            if cId in self.data[FEEDS['AR']]: 
+                self.combined[cId] = self.data[FEEDS['AR']][cId]
+
+    def _setReview(self, cId, feature):
+        """
+        Adds or replaces an AR item, grouped items keep precedence in the combined review data
+        """
+
+        self.data[FEEDS['AR']][cId] = feature
+        if cId not in self.grouped: 
+            self.combined[cId] = feature
+
+    def _removeReview(self, cId):
+        """
+        Removes an AR item
+        """
+
+        if self.data[FEEDS['AR']].pop(cId, None) is not None and cId not in self.grouped: 
+            self.combined.pop(cId, None)
+
+    def _combineReview(self):
+        """
+        Rebuilds the combined review data from the AR and GR data
+        """
+
+        self.combined = dict(self.data[FEEDS['AR']])
+        self.grouped = {}
+        for (gId, group), fDict in self.data[FEEDS['GR']].items():
+            for cId in fDict: 
+                self.grouped[cId] = gId
+            self.combined.update(fDict)
+
+    def applyDelta(self, delta, feedtype):
+        """
+        Applies the features changed in a feed to the keyed data,
+        at a cost proportional to the number of changes
+
+        @param delta: upserted features by id and deleted ids
+        @type  delta: tuple ({id: feature}, [id])
+        @param feedType: Type of AIMS API feed
+        @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+        """
+
+        upserts, deletes = delta
+        if feedtype == FEEDS['GR']:
+            for gId in list(deletes) + upserts.keys():
+                self._removeGroup(gId)
+            for gId, group in upserts.items():
+                self._addGroup(gId, group)
+        elif feedtype == FEEDS['AR']:
+            for cId in deletes:
+                self._removeReview(cId)
+            for cId, feature in upserts.items():
+                self._setReview(cId, feature)
+        else:
+            data = self.data[feedtype]
+            for fid in deletes:
+                data.pop(fid, None)
+            data.update(upserts)
     
     def idProperty(self, feedtype):
         """
@@ -173,9 +312,11 @@ class UiDataManager(QObject):
             self.data[feedtype] = li
                        
             # [GroupKey:{AdKey:}]            
-        if feedtype == FEEDS['GR']:
-            # key group objects
-            self.exlopdeGroup()
+            if feedtype == FEEDS['GR']:
+                # key group objects
+                self.exlopdeGroup()
+            if feedtype in (FEEDS['AR'], FEEDS['GR']):
+                self._combineReview()
 
     def setData(self, dataRefresh, FeedType):
         # redundant? now straight to keyData?
@@ -205,10 +346,10 @@ class UiDataManager(QObject):
         """
         # remove from data
         if respFeature._queueStatus in ('Declined', 'Accepted'):
-            del self.data[FEEDS['AR']][respFeature._changeId]
+            self._removeReview(respFeature._changeId)
         else:                                
             # add to data 
-            self.data[FEEDS['AR']][respFeature._changeId] = respFeature
+            self._setReview(respFeature._changeId, respFeature)
             #uilog.info('new AR record with changeid: {}'.format(respFeature._changeId))
         self.rDataChangedSignal.emit()
         
@@ -234,12 +375,12 @@ class UiDataManager(QObject):
     def updateGdata(self, respFeature):
         groupKey = self.matchGroupKey(respFeature._changeGroupId)
         self.data[FEEDS['GR']][groupKey][respFeature._changeId] = respFeature
+        self.grouped[respFeature._changeId] = respFeature._changeGroupId
+        self.combined[respFeature._changeId] = respFeature
         self.rDataChangedSignal.emit()
         
     def matchGroupKey(self, groupId):
-        for groupKey in self.data.get(FEEDS['GR']).keys():
-            if groupId in groupKey:
-                return groupKey
+        return self.groupKeys.get(groupId)
     
     def setBbox(self, sw, ne):
         """
@@ -272,22 +413,15 @@ class UiDataManager(QObject):
         
     def combinedReviewData(self):
         """ 
-        De-nests group review data and combines with standard
-        review data, Returning a complete "Review Data" set 
+        Returns the complete "Review Data" set, group review items 
+        de-nested and combined with standard review data. The set is 
+        maintained as the feeds change and must not be modified
         
         @return: Flat dictionary of review items
         @rtype: dictionary
         """
 
-        groupData = self.groupReviewData()
-        addData = self.reviewData()
-        
-        combinedData = {}
-        combinedData.update(addData)
-        if not groupData: return addData 
-        for k ,v in groupData.items():
-            combinedData.update(v)
-        return combinedData
+        return self.combined
         
     def featureData(self):
         """
@@ -300,6 +434,37 @@ class UiDataManager(QObject):
     
     # --- DM convenience methods---
     
+    def _track(self, future):
+        """
+        Emit the response signal when a request completes. The future
+        resolves on a DataManager thread, the signal is delivered to
+        receivers on their own thread
+
+        @param future: Handle on the pending response
+        @type  future: AIMSDataManager.Request.RequestFuture
+
+        @return: The same future
+        @rtype: AIMSDataManager.Request.RequestFuture
+        """
+
+        future.addCallback(self.responseSignal.emit)
+        return future
+    
+    def _trackBatch(self, batch):
+        """
+        Emit the response signal as each request in a batch completes
+
+        @param batch: Handle on the pending responses
+        @type  batch: AIMSDataManager.Request.BatchFuture
+
+        @return: The same batch
+        @rtype: AIMSDataManager.Request.BatchFuture
+        """
+
+        for future in batch.futures:
+            self._track(future)
+        return batch
+    
     def addAddress(self, feature, respId = None):
         """
         Passes an new AIMS Feature to DataManager 
@@ -309,11 +474,14 @@ class UiDataManager(QObject):
         @type  feature: AIMSDataManager.Address
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
 
 
         uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'addAddress'))
-        self.dm.addAddress(feature, respId)
+        return self._track(self.dm.addAddress(feature, respId))
         
     def retireAddress(self, feature, respId = None):
         """
@@ -323,11 +491,14 @@ class UiDataManager(QObject):
         @type  feature: AIMSDataManager.Address
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
 
 
         uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'retireAddress'))
-        self.dm.retireAddress(feature, respId)
+        return self._track(self.dm.retireAddress(feature, respId))
         
     def updateAddress(self, feature, respId = None):
         """
@@ -338,10 +509,13 @@ class UiDataManager(QObject):
         @type  feature: AIMSDataManager.Address
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
 
         uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'updateAddress'))
-        self.dm.updateAddress(feature, respId)        
+        return self._track(self.dm.updateAddress(feature, respId))
 
     def decline(self, feature, feedType, respId = None):
         """
@@ -354,13 +528,16 @@ class UiDataManager(QObject):
         @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
 
         uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'declineAddress'))
         if feedType == FEEDS['AR']:
-            self.dm.declineAddress(feature, respId)
+            return self._track(self.dm.declineAddress(feature, respId))
         else:
-            self.dm.declineGroup(feature, respId)
+            return self._track(self.dm.declineGroup(feature, respId))
     
     def accept(self, feature, feedType, respId = None):
         """
@@ -373,14 +550,16 @@ class UiDataManager(QObject):
         @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
         
-        if respId:
-            uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'acceptAddress'))
-            if feedType == FEEDS['AR']:
-                self.dm.acceptAddress(feature, respId)
-            else:
-                self.dm.acceptGroup(feature, respId)
+        uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'acceptAddress'))
+        if feedType == FEEDS['AR']:
+            return self._track(self.dm.acceptAddress(feature, respId))
+        else:
+            return self._track(self.dm.acceptGroup(feature, respId))
     
     def repairAddress(self, feature, respId = None):
         """
@@ -393,10 +572,13 @@ class UiDataManager(QObject):
         @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
         
         uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'repairAddress'))
-        self.dm.repairAddress(feature, respId)
+        return self._track(self.dm.repairAddress(feature, respId))
     
     def supplementAddress(self, feature, reqid=None): 
         """
@@ -407,9 +589,84 @@ class UiDataManager(QObject):
         @type  feature: AIMSDataManager.Address
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
         
-        self.dm.supplementAddress(feature, reqid)
+        return self._track(self.dm.supplementAddress(feature, reqid))
+    
+    # --- DM batch convenience methods ---
+    
+    def retireAddresses(self, features):
+        """
+        Passes many AIMS Features to DataManager for retirement
+        as a single batch
+
+        @param features: Aims Address objects
+        @type  features: list
+
+        @return: Handle on the responses
+        @rtype: AIMSDataManager.Request.BatchFuture
+        """
+
+        uilog.info('{0} objs passed to convenience method "{1}" '.format(len(features), 'retireAddresses'))
+        return self._trackBatch(self.dm.retireAddresses(features))
+    
+    def updateAddresses(self, features):
+        """
+        Passes many AIMS Features to DataManager to update
+        published features as a single batch
+
+        @param features: Aims Address objects
+        @type  features: list
+
+        @return: Handle on the responses
+        @rtype: AIMSDataManager.Request.BatchFuture
+        """
+
+        uilog.info('{0} objs passed to convenience method "{1}" '.format(len(features), 'updateAddresses'))
+        return self._trackBatch(self.dm.updateAddresses(features))
+    
+    def acceptFeatures(self, features, feedType):
+        """
+        Passes many AIMS Features to the DataManager 
+        to accept review items as a single batch
+
+        @param features: Aims Address or Group objects
+        @type  features: list
+        @param feedType: Type of AIMS API feed
+        @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+
+        @return: Handle on the responses
+        @rtype: AIMSDataManager.Request.BatchFuture
+        """
+
+        uilog.info('{0} objs passed to convenience method "{1}" '.format(len(features), 'acceptFeatures'))
+        if feedType == FEEDS['AR']:
+            return self._trackBatch(self.dm.acceptAddresses(features))
+        else:
+            return self._trackBatch(self.dm.acceptGroups(features))
+    
+    def declineFeatures(self, features, feedType):
+        """
+        Passes many AIMS Features to the DataManager 
+        to decline review items as a single batch
+
+        @param features: Aims Address or Group objects
+        @type  features: list
+        @param feedType: Type of AIMS API feed
+        @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+
+        @return: Handle on the responses
+        @rtype: AIMSDataManager.Request.BatchFuture
+        """
+
+        uilog.info('{0} objs passed to convenience method "{1}" '.format(len(features), 'declineFeatures'))
+        if feedType == FEEDS['AR']:
+            return self._trackBatch(self.dm.declineAddresses(features))
+        else:
+            return self._trackBatch(self.dm.declineGroups(features))
     
     #--- Groups DM Methods ---
     
@@ -422,10 +679,13 @@ class UiDataManager(QObject):
         @type  feature: AIMSDataManager.Address
         @param respId: id used to match response 
         @type  respId: integer 
+
+        @return: Handle on the response
+        @rtype: AIMSDataManager.Request.RequestFuture
         """
         
         uilog.info('obj with respId: {0} passed to convenience method "{1}" '.format(respId, 'repairAddress'))
-        self.dm.repairGroup(feature, respId)
+        return self._track(self.dm.repairGroup(feature, respId))
         
 # Lineage Related - ON HOLD
 #     def openGroup(self):
@@ -506,44 +766,6 @@ class UiDataManager(QObject):
         return att if att else ''
         
     
-    def fullRoad(self, feat, feedtype):
-        """ 
-        Compiles a full road name 'label' for the UI 
-
-        @param feat: Group object
-        @type  feat: AIMSDataManager.Address
-        @param feedType: Type of AIMS API feed
-        @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
-
-        @return: Individual road components concatenated
-        @rtype: string
-        """
-
-        fullRoad = ''
-        for prop in ['_components_roadPrefix', '_components_roadName', '_components_roadType', '_components_roadSuffix',
-                      '_components_waterRoute']:
-            addProp = None    
-            # Groups have nested entities
-            if feat._changeType in self.groups:
-                if self.isNested(feat, prop):
-                    addProp = self.nestedEntities(feat, prop) 
-            # retired have nested entities except when the retired 
-            # feature is derived from an response object    
-            elif feat._changeType == 'Retire':
-                #if self.isNested(feat, prop):
-                if not feat.meta.requestId: 
-                    if hasattr(getattr(getattr(feat, 'meta'), '_entities')[0],prop):
-                        addProp = self.nestedEntities(feat, prop) 
-                elif hasattr(feat,prop):  
-                    addProp = self.flatEntities(feat, prop) 
-            # else we have an Add or update of whoms 
-            # properties are flat
-            elif hasattr(feat,prop): 
-                addProp = self.flatEntities(feat, prop) 
-            else: continue                    
-            if addProp != None: fullRoad+=addProp+' '
-        return fullRoad.lstrip()
-
     def formatGroupTableData(self, obj, groupProperties):
         """
         Returns data formatted for the group table model 
@@ -585,7 +807,7 @@ class UiDataManager(QObject):
         """
         
         fValues = []
-        fValues.extend([getattr(feat, '_changeId'),feat.getFullNumber(), self.fullRoad(feat ,feedtype)]) # address and road labels 
+        fValues.extend([getattr(feat, '_changeId'),feat.getFullNumber(), feat.getFullRoad()]) # address and road labels, cached on the feature 
         for prop in featProperties:
             # Groups have nested entities                                  
             if feat._changeType in self.groups and self.isNested(feat, prop):
@@ -648,39 +870,72 @@ class UiDataManager(QObject):
             return (prop['AR']['kProperties'],prop['AR']['vProperties'])
         return (prop['GR']['kProperties'],prop['AR']['vProperties'])
 
-    def formatTableData(self, feedtypes):
+    def reviewSnapshot(self):
+        """
+        Returns a copy of the AR and GR data that the worker thread can 
+        read while the main thread goes on applying feed updates
+
+        @return: AR and GR data keyed by feed type
+        @rtype: dictionary
+        """
+
+        return {FEEDS['AR']: dict(self.data[FEEDS['AR']]),
+                FEEDS['GR']: dict((k, dict(v)) for k, v in self.data[FEEDS['GR']].items())}
+
+    def requestTableData(self, receiver):
+        """
+        Formats the review data for the review data model on the worker 
+        thread. Receiver is called on the main thread with chunks of 
+        (group row, feature rows) pairs, a new request supersedes the last
+
+        @param receiver: Called with each chunk, True for the last chunk and the error of a failed job
+        @type  receiver: function
         """
-        Returns review data as formatted for the review data model 
+
+        self.worker.submit('review', self.iterTableData, ((FEEDS['GR'],FEEDS['AR']), self.reviewSnapshot()), receiver)
+
+    def iterTableData(self, feedtypes, data):
+        """
+        Yields review data as formatted for the review data model. 
+        Run on the worker thread, which alone uses the row cache
 
         @param feedType: Type of AIMS API feed
         @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+        @param data: AR and GR data as returned by reviewSnapshot
+        @type  data: dictionary
 
-        @return: data formated for feature table model
-        @rtype: dictionary
+        @return: (group row, feature rows) of each review item
+        @rtype: generator
         """
         
-        fData = {}
+        cache = {}
         for feedtype in feedtypes:
-            if self.data[feedtype]:
+            if data[feedtype]:
                 props = self.addClassProps(feedtype)
                 kProperties = props[0] 
                 vProperties = props[1] 
-                for k, v in self.data.get(feedtype).items():
+                for k, v in data.get(feedtype).items():
                     if feedtype == FEEDS['AR']:
                         if v._queueStatus in  ('Declined', 'Accepted'):
                             continue
-                    featureValues = [] 
-                    if feedtype == FEEDS['AR']:
-                        groupValues = self.formatGroupTableData(v,kProperties) 
-                        featureValues = [self.formatFeatureTableData(v,vProperties, feedtype)]
+                        key, objs = (feedtype, k), (v,)
                     else: #GR
-                        featureValues = []                    
-                        groupValues = self.formatGroupTableData(k[1],kProperties) 
-                        featureValues = self.formatFeatureTableData(v,vProperties, feedtype)
-                    fData[tuple(groupValues)] = featureValues
-        if fData:
-            return fData
-        else: return {('','', '', '', ''): [['', '', '', '', '']]}
+                        key, objs = (feedtype, k[0]), (k[1],) + tuple(v.values())
+                    rows = self.rowCache.get(key)
+                    # features are replaced, not modified, when changed so rows 
+                    # projected from the same objects are still current
+                    if not rows or len(rows[0]) != len(objs) or any(a is not b for a, b in zip(rows[0], objs)):
+                        if feedtype == FEEDS['AR']:
+                            groupValues = self.formatGroupTableData(v,kProperties) 
+                            featureValues = [self.formatFeatureTableData(v,vProperties, feedtype)]
+                        else: #GR
+                            groupValues = self.formatGroupTableData(k[1],kProperties) 
+                            featureValues = self.formatFeatureTableData(v,vProperties, feedtype)
+                        rows = (objs, tuple(groupValues), featureValues)
+                    cache[key] = rows
+                    yield rows[1], rows[2]
+        # drop rows of items no longer in review
+        self.rowCache = cache
     
     def singleFeatureObj(self, objkey):
         """
@@ -694,6 +949,49 @@ class UiDataManager(QObject):
 
         return self.data.get(FEEDS['AF'])[(objkey)]
     
+    def featuresWithin(self, coords, radius, feedtype = FEEDS['AF']):
+        """
+        Returns AIMS objects within a distance of a location using
+        the DataManager's spatial index, nearest first
+
+        @param coords: Location in the AIMS srs (4167)
+        @type  coords: list [x,y]
+        @param radius: Search distance in degrees
+        @type  radius: float
+        @param feedtype: Type of AIMS API feed, AF or AR
+        @type  feedtype: AIMSDataManager.FeatureFactory.FeedRef
+
+        @return: List of Address objects, None if the feed is not indexed
+        @rtype: list
+        """
+
+        index = self.dm.index(feedtype) if self.dm else None
+        if index is None: return None
+        data = self.data.get(feedtype)
+        return [data[fid] for fid in index.radius(coords[0], coords[1], radius) if fid in data]
+    
+    def stackedFeatures(self, coords, tolerance, feedtype = FEEDS['AF']):
+        """
+        Returns the AIMS objects at the indexed location nearest to
+        coords. All features stacked at that location are returned
+
+        @param coords: Location in the AIMS srs (4167)
+        @type  coords: list [x,y]
+        @param tolerance: Search distance in degrees
+        @type  tolerance: float
+        @param feedtype: Type of AIMS API feed, AF or AR
+        @type  feedtype: AIMSDataManager.FeatureFactory.FeedRef
+
+        @return: List of Address objects, None if the feed is not indexed
+        @rtype: list
+        """
+
+        index = self.dm.index(feedtype) if self.dm else None
+        if index is None: return None
+        nearest = index.nearest(coords[0], coords[1], 1, tolerance)
+        if not nearest: return []
+        return self.featuresWithin(index.get(nearest[0]), STACK_TOLERANCE, feedtype)
+    
     def singleReviewObj(self, feedtype, objkey):
         ''' return the value of which is an aims review
             obj (group and single) for the keyed data '''
@@ -745,110 +1043,76 @@ class UiDataManager(QObject):
         return pos
 
     
-class Listener(QThread):
-    """ 
-    Listener that checks for new data in the 
-    common data store (DMData()) at defined intervals
+class DMObserver(QObject):
+    """
+    Observer registered with the DataManager. Feed updates are held 
+    until the UI takes them, updates arriving in the meantime are 
+    merged, and a queued signal numbered per feed announces each one
     """
 
-    #listenerSignal = pyqtSignal()
-    def __init__(self, DMData):
-        super(Listener, self).__init__()
-        self.DMData = DMData
-        self.data = {FEEDS['AF']:[],
-                FEEDS['AC']:[],
-                FEEDS['AR']:[],
-                FEEDS['GC']:[],
-                FEEDS['GR']:[]
-                }
-        self.previousData = {FEEDS['AF']:[],
-                FEEDS['AC']:[],
-                FEEDS['AR']:[],
-                FEEDS['GC']:[],
-                FEEDS['GR']:[]
-                }
-    
-    def compareData(self):
-        """
-        Compare the data as stored in the DMData object.
-        If the is change update the UIDatamanager data
-        """
-
-        for k , v in self.data.items():           
-            if self.previousData[k] != v:
-                self.emit(SIGNAL('dataChanged'), v, k) 
-        self.previousData = self.data                   
-    
-    def run(self):
-        """
-        Check for change in the DM data
-        """
-        
-        while True:
-            self.data = self.DMData.getData()     
-            self.compareData()
-            QThread.sleep(1)
+    # feed type, update number of the feed
+    feedSignal = pyqtSignal(object, int)
 
-class DMData(object):
-    """
-    Common data object that is updated by the observer
-    and read by the listener
-    """
+    # feeds displayed by the UI
+    UI_FEEDS = (FEEDS['AF'], FEEDS['AR'], FEEDS['GR'])
 
     def __init__(self):
-        self.adrRes = None
-        self.grpRes = None
-        self.adrFea = None
-        self.adrCha = None    
-        self.grpCha = None
-    
-    def getData(self): 
+        super(DMObserver, self).__init__()
+        self.versions = {}
+        # feed type: (data, delta) not yet taken
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def version(self, feedType):
         """
-        Returns 
+        Returns the number of the latest update of a feed
 
-        @return: Dictionary {FeedType: data, ...}
-        @rtype: dictionary
+        @param feedType: Type of AIMS API feed
+        @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+
+        @return: update number, 0 before the first update
+        @rtype: integer
         """
-        
-        return { FEEDS['AR']:self.adrRes,
-                FEEDS['GR']:self.grpRes,
-                FEEDS['AF']:self.adrFea
-                }
-    
-class DMObserver(QThread):
-    """
-    Observer registered with the DataManager
-    """
-    
-    def __init__(self, DMData, dm):
-        super(DMObserver, self).__init__()
-        self.DMData = DMData
-        self.dm = dm
-        self.feedData = {FEEDS['GR']: 'grpRes' ,FEEDS['AR']: 'adrRes', 
-                         FEEDS['AF']: 'adrFea', FEEDS['GC']: 'grpCha', FEEDS['AC']: 'adrCha'}
-        
-    def run (self):
+
+        return self.versions.get(feedType, 0)
+
+    def take(self, feedType):
         """
-        Register the DMObserver with the DataManager
+        Returns the latest data of a feed and the changes since the
+        previous take, merged across the updates in between
+
+        @param feedType: Type of AIMS API feed
+        @type  feedType: AIMSDataManager.FeatureFactory.FeedRef
+
+        @return: (data, delta), None if already taken. A None delta means data replaces everything
+        @rtype: tuple
         """
-        
-        self.dm.registermain(self) 
-               
+
+        with self.lock:
+            return self.pending.pop(feedType, None)
+
     def observe(self,observable,*args,**kwargs):
         """
-        Method Notified by DataManager when DataManager data has changed
+        Method Notified by DataManager when DataManager data has changed.
+        Called on DataManager threads
 
         @param observable: Type of AIMS API feed
         @type  observable: AIMSDataManager.FeatureFactory.FeedRef
         @param args: tuple of data for relevant feed
         @type  args: tuple
+        @param kwargs: delta of the changed features
+        @type  kwargs: dictionary
         """
-  
+
         fType = args[0]
         data = args[1]
-        
-        uilog.info('*** NOTIFY ***     Notify A[{}]'.format(observable))
-        setattr(self.DMData, self.feedData.get(fType),data)
-        
-
-        
\ No newline at end of file
+        if fType not in self.UI_FEEDS: return
+        with self.lock:
+            # the first update of a feed is always applied in full
+            delta = kwargs.get('delta') if fType in self.versions else None
+            if fType in self.pending:
+                delta = mergeDelta(self.pending[fType][1], delta)
+            self.pending[fType] = (data, delta)
+            version = self.versions[fType] = self.versions.get(fType, 0) + 1
+        uilog.info('*** NOTIFY ***     Notify A[{}] update {}'.format(observable, version))
+        self.feedSignal.emit(fType, version)
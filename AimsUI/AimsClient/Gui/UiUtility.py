@@ -71,6 +71,36 @@ class UiUtility (object):
         ('uMblkOverride',['_codes_meshblock','setMeshblock', '', ''])
         ])
     
+    # cached transforms keyed on (source proj4 definition, target srid, direction)
+    transforms = {}
+    
+    @staticmethod
+    def getTransform (src_crs, tgt=4167, reverse=False):
+        """
+        Returns a cached transform between a CRS and the target srs,
+        building and caching it the first time a CRS pair is requested 
+
+        @param src_crs: Source spatial reference system
+        @type  src_crs: QgsCoordinateReferenceSystem
+        @param tgt: Srs to transform to
+        @type  tgt: integer
+        @param reverse: Transform from tgt to src_crs instead
+        @type  reverse: boolean
+
+        @return: Transform for the CRS pair
+        @rtype: QgsCoordinateTransform
+        """
+        
+        # custom CRSs have no authority id, their definition tells them apart
+        key = (src_crs.toProj4(), tgt, reverse)
+        transform = UiUtility.transforms.get(key)
+        if not transform:
+            tgt_crs = QgsCoordinateReferenceSystem()
+            tgt_crs.createFromOgcWmsCrs('EPSG:{}'.format(tgt))
+            transform = QgsCoordinateTransform(tgt_crs, src_crs) if reverse else QgsCoordinateTransform(src_crs, tgt_crs)
+            UiUtility.transforms[key] = transform
+        return transform
+    
     @staticmethod
     def transform (iface, coords, tgt=4167):
         """
@@ -85,11 +115,83 @@ class UiUtility (object):
         @type  tgt: integer
         """
   
+        return UiUtility.transformPoints(iface, [coords], tgt)[0]
+    
+    @staticmethod
+    def transformPoints (iface, points, tgt=4167, reverse=False):
+        """
+        Transforms a list of points between the map canvas srs and
+        the AIMS srs (4167) using a single cached transform. Points 
+        already in the target srs are returned without transforming 
+
+        @param iface: QgisInterface Abstract base class defining interfaces exposed by QgisApp  
+        @type iface: Qgisinterface Object
+        @param points: Points as QgsPoint or [x,y] pairs
+        @type  points: list
+        @param tgt: Srs to transform to
+        @type  tgt: integer
+        @param reverse: Transform from the AIMS srs to the canvas srs instead
+        @type  reverse: boolean
+
+        @return: Transformed points
+        @rtype: list of QgsPoint
+        """
+        
+        points = [p if isinstance(p, QgsPoint) else QgsPoint(p[0], p[1]) for p in points]
         src_crs = iface.mapCanvas().mapSettings().destinationCrs()
-        tgt_crs = QgsCoordinateReferenceSystem()
-        tgt_crs.createFromOgcWmsCrs('EPSG:{}'.format(tgt))
-        transform = QgsCoordinateTransform( src_crs, tgt_crs )
-        return transform.transform( coords.x(), coords.y() ) 
+        if src_crs.authid() == 'EPSG:{}'.format(tgt):
+            return points
+        transform = UiUtility.getTransform(src_crs, tgt, reverse)
+        return [transform.transform(p) for p in points]
+    
+    @staticmethod
+    def searchTolerance (iface, point, pixels=6):
+        """
+        Converts a distance in screen pixels at a canvas point to
+        AIMS srs (4167) units for spatial index searches
+
+        @param iface: QgisInterface Abstract base class defining interfaces exposed by QgisApp  
+        @type iface: Qgisinterface Object
+        @param point: Canvas location of the search 
+        @type  point: QgsPoint
+        @param pixels: Search distance in screen pixels
+        @type  pixels: integer
+
+        @return: Search distance in degrees
+        @rtype: float
+        """
+        
+        offset = QgsPoint(point.x() + iface.mapCanvas().mapUnitsPerPixel() * pixels, point.y())
+        a, b = UiUtility.transformPoints(iface, [point, offset])
+        return a.sqrDist(b) ** 0.5
+    
+    @staticmethod
+    def identifyAddresses (tool, iface, uidm, mouseEvent):
+        """
+        Returns the AIMS features stacked at the location nearest a mouse 
+        click. The DataManager spatial index is queried where available, 
+        otherwise the address layer is identified
+
+        @param tool: Map tool receiving the click
+        @type tool: QgsMapToolIdentify
+        @param iface: QgisInterface Abstract base class defining interfaces exposed by QgisApp  
+        @type iface: Qgisinterface Object
+        @param uidm: The plugins UI data manager
+        @type  uidm: AimsUI.AimsClient.Gui.UiDataManager
+        @param mouseEvent: QtGui.QMouseEvent
+        @type mouseEvent: QtGui.QMouseEvent
+
+        @return: List of Address objects
+        @rtype: list
+        """
+        
+        point = tool.toMapCoordinates(mouseEvent.pos())
+        features = uidm.stackedFeatures(list(UiUtility.transformPoints(iface, [point])[0]), 
+                                        UiUtility.searchTolerance(iface, point))
+        if features is not None:
+            return features
+        results = tool.identify(mouseEvent.x(), mouseEvent.y(), tool.ActiveLayer, tool.VectorLayer)
+        return [uidm.singleFeatureObj(r.mFeature.attribute('addressId')) for r in results]
             
     @staticmethod
     def setFormCombos(self):
@@ -0,0 +1,144 @@
+################################################################################
+#
+# Copyright 2016 Crown copyright (c)
+# Land Information New Zealand and the New Zealand Government.
+# All rights reserved
+#
+# This program is released under the terms of the 3 clause BSD license. See the
+# LICENSE file for more information.
+#
+################################################################################
+
+from PyQt4.QtCore import *
+import threading
+
+from AIMSDataManager.AimsLogging import Logger
+
+uilog = None
+
+# results delivered to the main thread per signal
+CHUNK_SIZE = 500
+
+class UiWorker(QObject):
+    """
+    Runs UI formatting jobs on a worker thread, off the QGIS main thread.
+    Job results are delivered to the main thread in chunks by queued signal
+    so the UI stays responsive while large updates are applied. A job
+    replaces any job of the same name not yet started and the remaining
+    results of a job are dropped once a newer job of the same name is submitted.
+    A failed job still delivers a last chunk, with its error, so receivers
+    can finish or reset
+
+    @param QObject: inherits from QObject Class
+    @type QObject: QObject
+    """
+
+    # job name, job number, chunk of results, last chunk of the job, error of a failed job
+    chunkSignal = pyqtSignal(object, int, object, bool, object)
+
+    #logging
+    global uilog
+    uilog = Logger.setup(lf='uiLog')
+
+    def __init__(self, chunkSize = CHUNK_SIZE):
+        """
+        Initialise the worker and start its thread
+
+        @param chunkSize: Number of results delivered per signal
+        @type  chunkSize: integer
+        """
+
+        QObject.__init__(self)
+        self.chunkSize = chunkSize
+        # job name: (job number, generator function, args) not yet started
+        self.jobs = {}
+        # job name: number of the latest job
+        self.numbers = {}
+        # job name: callable receiving (chunk, last) on the main thread
+        self.receivers = {}
+        self.running = True
+        self.cond = threading.Condition()
+        self.chunkSignal.connect(self._deliver, Qt.QueuedConnection)
+        self.thread = threading.Thread(target = self._run, name = 'UiWorker')
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def submit(self, name, function, args, receiver):
+        """
+        Queues a job, called on the main thread. Args must not be modified
+        by the main thread while the job runs, pass copies of shared data
+
+        @param name: Job name, a new job replaces older jobs of the same name
+        @type  name: string
+        @param function: Generator function yielding the jobs results
+        @type  function: function
+        @param args: Arguments of function
+        @type  args: tuple
+        @param receiver: Called on the main thread with each chunk of results, a list, True for the last
+                         chunk and the exception that ended the job early, otherwise None
+        @type  receiver: function
+
+        @return: The job number
+        @rtype: integer
+        """
+
+        with self.cond:
+            number = self.numbers[name] = self.numbers.get(name, 0) + 1
+            self.jobs[name] = (number, function, args)
+            self.receivers[name] = receiver
+            self.cond.notify()
+        return number
+
+    def current(self, name, number):
+        """
+        Returns True if no newer job of the same name has been submitted
+        """
+
+        return self.numbers.get(name) == number
+
+    def _run(self):
+        """
+        Worker thread, runs jobs emitting their results in chunks
+        """
+
+        while True:
+            with self.cond:
+                while self.running and not self.jobs:
+                    self.cond.wait()
+                if not self.running: return
+                name, (number, function, args) = self.jobs.popitem()
+            chunk = []
+            try:
+                for result in function(*args):
+                    if not self.current(name, number): break
+                    chunk.append(result)
+                    if len(chunk) == self.chunkSize:
+                        self.chunkSignal.emit(name, number, chunk, False, None)
+                        chunk = []
+                else:
+                    self.chunkSignal.emit(name, number, chunk, True, None)
+            except Exception as e:
+                uilog.error('*** WORKER ***    {} job failed, {}'.format(name, e))
+                # end the job so the receiver isn't left waiting on the last chunk
+                self.chunkSignal.emit(name, number, chunk, True, e)
+
+    @pyqtSlot(object, int, object, bool, object)
+    def _deliver(self, name, number, chunk, last, error):
+        """
+        Passes a chunk of current results to the jobs receiver on the main thread
+        """
+
+        if self.current(name, number):
+            self.receivers[name](chunk, last, error)
+
+    def close(self):
+        """
+        Stop the worker thread, jobs not yet started are dropped
+        """
+
+        with self.cond:
+            self.running = False
+            self.jobs.clear()
+            # abandons the running job
+            self.numbers.clear()
+            self.cond.notify()
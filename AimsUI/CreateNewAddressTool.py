@@ -136,7 +136,7 @@ class CreateNewAddressTool(QgsMapToolIdentify):
         """   
         # init new address object and open form
         UiUtility.clearForm(self._controller._queues.tabWidget)
-        coords = UiUtility.transform(self._iface, coords)
+        coords = UiUtility.transformPoints(self._iface, [coords])[0]
         self.setMarker(coords)        
         addInstance = self.af.get()
         self._controller._queues.uEditFeatureTab.setFeature('add', addInstance, coords)
@@ -91,15 +91,15 @@ class DelAddressTool(QgsMapToolIdentify):
         self._iface.setActiveLayer(self._layers.addressLayer())
         retireFeatures = []
         
-        results = self.identify(mouseEvent.x(), mouseEvent.y(), self.ActiveLayer, self.VectorLayer)
-        if len(results) == 0: 
+        features = UiUtility.identifyAddresses(self, self._iface, self._controller.uidm, mouseEvent)
+        if len(features) == 0: 
             return
-        if len(results) == 1:
+        if len(features) == 1:
             retireIds = {}        
-            retireIds['version'] = results[0].mFeature.attribute('version')
-            retireIds['components'] = {'addressId': results[0].mFeature.attribute('addressId')}
+            retireIds['version'] = getattr(features[0], '_components_version', getattr(features[0], '_version', None))
+            retireIds['components'] = {'addressId': features[0]._components_addressId}
             
-            fullAddress = results[0].mFeature.attribute('fullAddress')
+            fullAddress = getattr(features[0], '_components_fullAddress', None)
             
             if QMessageBox.question(self._iface.mainWindow(), 
                  "Confirm Address Retirement",
@@ -110,23 +110,23 @@ class DelAddressTool(QgsMapToolIdentify):
 
         else: # Stacked points
             identifiedFeatures=[] 
-            for i in range (0,len(results)):
+            for feature in features:
                 identifiedFeatures.append(dict(
-                fullAddress=results[i].mFeature.attribute('fullAddress'),
-                version= results[i].mFeature.attribute('version'),
-                addressId= results[i].mFeature.attribute('addressId')
+                fullAddress=getattr(feature, '_components_fullAddress', None),
+                version=getattr(feature, '_components_version', getattr(feature, '_version', None)),
+                addressId=feature._components_addressId
                 ))
             # Open 'Retire' dialog showing selected AIMS features   
             dlg = DelAddressDialog(self._iface.mainWindow())
             retireFeatures = dlg.selectFeatures(identifiedFeatures)
         
         if retireFeatures: # else the user hit 'ok' and did not select any records            
+            featuresToRetire = []
             for retireFeature in retireFeatures:
                 featureToRetire = self._controller.uidm.singleFeatureObj(retireFeature['components']['addressId'])
-                featureToRetire = self.af[FeedType.CHANGEFEED].cast(featureToRetire)
-                respId = int(time.time()) 
-                self._controller.uidm.retireAddress(featureToRetire, respId)
-                self._controller.RespHandler.handleResp(respId, FEEDS['AC'])
+                featuresToRetire.append(self.af[FeedType.CHANGEFEED].cast(featureToRetire))
+            batch = self._controller.uidm.retireAddresses(featuresToRetire)
+            self._controller.RespHandler.handleBatch(batch, FEEDS['AC'])
                 
 class DelAddressDialog( Ui_ComfirmSelection, QDialog ):
     """
@@ -18,6 +18,7 @@ from qgis.gui import *
 from qgis.utils import qgsfunction
 import sip
 from AimsClient import Database
+from AimsUI.AimsClient.Gui.UiUtility import UiUtility
 from AimsUI.AimsLogging import Logger
 from AIMSDataManager.AimsUtility import FEEDS
 from collections import OrderedDict
@@ -72,6 +73,104 @@ class Mapping():
         ('version',['_components_version',None])
         ])
 
+class LayerSync(object):
+    """
+    Keeps an AIMS layer in step with its data. Layer features are matched 
+    to AIMS objects by AIMS id and only the differences are written, each 
+    kind of change with a single data provider call
+    """
+
+    def __init__(self, layer):
+        """
+        Initialise the sync of a layer
+
+        @param layer: AIMS vector layer  
+        @type  layer: qgis._core.QgsVectorLayer 
+        """
+
+        self.layerId = layer.id()
+        # AIMS id: layer feature id
+        self.fids = {}
+        # AIMS id: (attributes, point) as written to the layer
+        self.values = {}
+        # AIMS ids applied since begin
+        self.seen = set()
+
+    def begin(self, layer):
+        """
+        Starts a sync, features not applied before the sync ends are deleted.
+        A layer that was replaced or changed elsewhere is cleared and rebuilt
+
+        @param layer: AIMS vector layer  
+        @type  layer: qgis._core.QgsVectorLayer 
+        """
+
+        if layer.id() != self.layerId or layer.featureCount() != len(self.fids):
+            layer.dataProvider().deleteFeatures([f.id() for f in layer.getFeatures()])
+            self.layerId = layer.id()
+            self.fids = {}
+            self.values = {}
+        self.seen = set()
+
+    def apply(self, layer, features):
+        """
+        Adds new features and writes the changed attributes and geometries of existing features
+
+        @param layer: AIMS vector layer  
+        @type  layer: qgis._core.QgsVectorLayer 
+        @param features: (AIMS id, attributes, point) of each feature
+        @type  features: list
+        """
+
+        adds, addKeys, attrChanges, geomChanges = [], [], {}, {}
+        for key, attrs, point in features:
+            self.seen.add(key)
+            old = self.values.get(key)
+            self.values[key] = (attrs, point)
+            if old is None:
+                fet = QgsFeature()
+                fet.setGeometry(QgsGeometry.fromPoint(QgsPoint(point[0], point[1])))
+                fet.setAttributes(attrs)
+                adds.append(fet)
+                addKeys.append(key)
+                continue
+            fid = self.fids[key]
+            if old[0] != attrs:
+                attrChanges[fid] = dict((i, v) for i, v in enumerate(attrs) if i >= len(old[0]) or old[0][i] != v)
+            if old[1] != point:
+                geomChanges[fid] = QgsGeometry.fromPoint(QgsPoint(point[0], point[1]))
+        provider = layer.dataProvider()
+        if adds:
+            ok, added = provider.addFeatures(adds)
+            if ok:
+                self.fids.update(zip(addKeys, [fet.id() for fet in added]))
+            else:
+                uilog.error(' *** CANVAS ***    {} features not added to {}'.format(len(adds), layer.name()))
+                for key in addKeys: 
+                    del self.values[key]
+        if attrChanges:
+            provider.changeAttributeValues(attrChanges)
+        if geomChanges:
+            provider.changeGeometryValues(geomChanges)
+
+    def end(self, layer, prune = True):
+        """
+        Ends a sync, deleting the features not applied since it began
+
+        @param layer: AIMS vector layer  
+        @type  layer: qgis._core.QgsVectorLayer 
+        @param prune: False to keep the features not applied, as for a sync cut short
+        @type  prune: boolean
+        """
+
+        gone = [key for key in self.fids if key not in self.seen] if prune else []
+        if gone:
+            layer.dataProvider().deleteFeatures([self.fids.pop(key) for key in gone])
+            for key in gone: 
+                del self.values[key]
+        layer.updateExtents()
+        layer.triggerRepaint()
+
 class LayerManager(QObject):
     """
     Managers the loading and updating of AIMS data as served 
@@ -113,6 +212,10 @@ class LayerManager(QObject):
         self._locLayer = None
         self._revLayer = None
         self._extEvent = False
+        # ids of layers whose sync begins when the first chunk of new features arrives
+        self._reloading = set()
+        # layer id: LayerSync
+        self._syncs = {}
 
         QgsMapLayerRegistry.instance().layerWillBeRemoved.connect(self.checkRemovedLayer)
         QgsMapLayerRegistry.instance().layerWasAdded.connect( self.checkNewLayer )
@@ -472,29 +575,26 @@ class LayerManager(QObject):
         @type  layer: qgis._core.QgsVectorLayer 
         """
 
-        ids = [f.id() for f in layer.getFeatures()]
-        layer.startEditing()
-        for fid in ids:          
-            layer.deleteFeature(fid)
-        layer.commitChanges()
+        layer.dataProvider().deleteFeatures([f.id() for f in layer.getFeatures()])
+        self._syncs.pop(self.layerId(layer), None)
     
-    def addToLayer(self, rData, layer):
+    def reviewFeatures(self, rData):
         """
-        Add aims review features to reveiw layer 
+        Yields review layer features of aims review items. 
+        Run on the UiDataManager worker thread
         
         @param rData: Review Data
         @type  rData: dictionary
-        @param layer: AIMS vector layer  
-        @type  layer: qgis._core.QgsVectorLayer 
+
+        @return: (change id, attributes, point) of each review item
+        @rtype: generator
         """
 
-        provider = layer.dataProvider()
         for k, reviewItem in rData.items():
             if hasattr(reviewItem,'_queueStatus'):
-                if reviewItem._queueStatus in ('Declined, Accepted'):
+                if reviewItem._queueStatus in ('Declined', 'Accepted'):
                     continue 
                 
-            fet = QgsFeature()
             if reviewItem._changeType in ('Update', 'Add') or reviewItem.meta.requestId: 
                 point = reviewItem.getAddressPositions()[0]._position_coordinates
             else:
@@ -502,11 +602,59 @@ class LayerManager(QObject):
                     point = reviewItem.meta.entities[0].getAddressPositions()[0]._position_coordinates
                 except: 
                     uilog.error(' *** ERROR ***  ') 
-            fet.setGeometry(QgsGeometry.fromPoint(QgsPoint(point[0], point[1])))
-            fet.setAttributes([ k, reviewItem.getFullNumber(), reviewItem._changeType])
-            provider.addFeatures([fet])
-        layer.updateExtents()
+                    continue
+            yield k, [k, reviewItem.getFullNumber(), reviewItem._changeType], (point[0], point[1])
+
+    def addToLayer(self, id, features, last, error = None):
+        """
+        Receives chunks of prepared features from the UiDataManager worker 
+        and syncs them to the layer. Layer features of AIMS objects absent 
+        from the data are deleted once the last chunk is applied, unless 
+        preparing the features failed part way
+        
+        @param id: AIMS layer id
+        @type  id: string
+        @param features: Chunk of (AIMS id, attributes, point)
+        @type  features: list
+        @param last: True for the final chunk
+        @type  last: boolean
+        @param error: Exception that ended preparing the features early, otherwise None
+        @type  error: Exception
+        """
+
+        layer = self.findLayer(id)
+        if not layer: 
+            return
+        sync = self._syncs.get(id)
+        if not sync:
+            sync = self._syncs[id] = LayerSync(layer)
+        if id in self._reloading:
+            self._reloading.discard(id)
+            sync.begin(layer)
+        sync.apply(layer, features)
+        if last:
+            sync.end(layer, prune = not error)
+            if error:
+                uilog.error(' *** CANVAS ***    {} FEATURES PARTLY SYNCED, {}'.format(id, error))
+            else:
+                uilog.info(' *** CANVAS ***    {} FEATURES SYNCED'.format(id))
     
+    def loadLayer(self, id, function, data):
+        """
+        Prepares a layers features from data on the UiDataManager worker thread
+
+        @param id: AIMS layer id
+        @type  id: string
+        @param function: Generator function yielding the layers features 
+        @type  function: function
+        @param data: Copy of the data the features are prepared from
+        @type  data: dictionary
+        """
+
+        self._reloading.add(id)
+        self._controller.uidm.worker.submit(id, function, (data,), 
+                                            lambda features, last, error: self.addToLayer(id, features, last, error))
+
     def updateReviewLayer(self):
         """
         Update review layer
@@ -516,10 +664,9 @@ class LayerManager(QObject):
         layer = self.findLayer(id)
         if not layer: 
             return
-        self.removeFeatures(layer)
-        rData = self._controller.uidm.combinedReviewData()
+        rData = dict(self._controller.uidm.combinedReviewData())
         uilog.info(' *** DATA ***    {} review items being loaded '.format(len(rData)))
-        self.addToLayer(rData, layer)
+        self.loadLayer(id, self.reviewFeatures, rData)
     
     def bboxWithPrevious(self, ext):
         """ 
@@ -548,7 +695,9 @@ class LayerManager(QObject):
         ext = self._canvas.extent()
         if self._canvas.scale() > layer.maximumScale() or self.bboxWithPrevious(ext): return 
         uilog.info(' *** BBOX ***    {} '.format(ext.toString()))    
-        self._controller.uidm.setBbox(sw = (ext.xMinimum(), ext.yMinimum()), ne = (ext.xMaximum(), ext.yMaximum()))
+        # the AIMS bbox is in AIMS srs, take both corners out of the canvas srs in one pass
+        sw, ne = UiUtility.transformPoints(self._iface, [(ext.xMinimum(), ext.yMinimum()), (ext.xMaximum(), ext.yMaximum())])
+        self._controller.uidm.setBbox(sw = (sw.x(), sw.y()), ne = (ne.x(), ne.y()))
         self.prevExt = ext
                             
     def getAimsFeatures(self):
@@ -593,21 +742,33 @@ class LayerManager(QObject):
         legend = self._iface.legendInterface()
         if not legend.isLayerVisible(layer):
             legend.setLayerVisible(layer, True)
-        # remove current features 
-        self.removeFeatures(layer)
         uilog.info(' *** CANVAS ***    Adding Features') 
-        for feature in featureData.itervalues():
-            fet = QgsFeature()
-            point = feature.getAddressPositions()[0]._position_coordinates
-            fet.setGeometry(QgsGeometry.fromPoint(QgsPoint(point[0], point[1])))           
-            fet.setAttributes([getattr(feature, v[0]) if hasattr (feature, v[0]) else '' for v in Mapping.adrLayerObjMappings.values()])
+        self.loadLayer(id, self.addressFeatures, dict(featureData))
+
+    def addressFeatures(self, featureData):
+        """
+        Yields AIMS Address feature layer features. 
+        Run on the UiDataManager worker thread
+
+        @param featureData: feature feed data
+        @type  featureData: dictionary
+
+        @return: (address id, attributes, point) of each feature
+        @rtype: generator
+        """
+
+        props = [v[0] for v in Mapping.adrLayerObjMappings.values()]
+        for addressId, feature in featureData.iteritems():
+            try:
+                point = feature.getAddressPositions()[0]._position_coordinates
+            except (IndexError, AttributeError):
+                uilog.error(' *** ERROR ***    Address {} has no position'.format(addressId))
+                continue
+            attrs = [getattr(feature, prop, '') if prop else '' for prop in props]
             if hasattr(getattr(feature,'_addressedObject_addressPositions')[0],'_positionType'):
                 # If positionType update field index 30. Would rather use the explicit name...
-                fet.setAttribute(30, feature._addressedObject_addressPositions[0]._positionType)
-            layer.dataProvider().addFeatures([fet])
-        layer.updateExtents()
-        
-        uilog.info(' *** CANVAS ***    FEATURES ADDED')
+                attrs[30] = feature._addressedObject_addressPositions[0]._positionType
+            yield addressId, attrs, (point[0], point[1])
 
     @qgsfunction(0, 'QGIS-AIMS-Plugin', register=False)
     def get_par_app(values, feature, parent):
@@ -123,30 +123,30 @@ class MoveAddressTool(QgsMapToolIdentify):
         self._iface.setActiveLayer(self._layers.addressLayer())
         
         if mouseEvent.button() == Qt.LeftButton:
-            results = self.identify(mouseEvent.x(), mouseEvent.y(), self.ActiveLayer, self.VectorLayer)
+            features = UiUtility.identifyAddresses(self, self._iface, self._controller.uidm, mouseEvent)
             # Ensure feature list and highlighting is reset
             self._features = []
             self.hideMarker()
             
-            if len(results) == 0: 
+            if len(features) == 0: 
                 return
-            elif len(results) == 1:
-                # Highlight feature
-                coords = results[0].mFeature.geometry().asPoint()
-                self.setMarker(coords)
-                # create address object for feature. It is this obj properties that will be passed to API
-                self._features.append(self._controller.uidm.singleFeatureObj(results[0].mFeature.attribute('addressId')))
+            
+            # Highlight feature, incomplete features have no position to mark
+            coords = features[0].getCoordinates()
+            if coords:
+                self.setMarker(UiUtility.transformPoints(self._iface, [coords], reverse=True)[0])
+            if len(features) == 1:
+                # it is this obj properties that will be passed to API
+                self._features.append(features[0])
                 self._sb.showMessage("Right click for features new location")
                 
             else: # Stacked points
                 
                 identifiedFeatures=[] 
-                coords = results[0].mFeature.geometry().asPoint()
-                self.setMarker(coords)
-                for i in range (0,len(results)):
+                for feature in features:
                     identifiedFeatures.append(dict(
-                    fullAddress=results[i].mFeature.attribute('fullAddress'),
-                    addressId= results[i].mFeature.attribute('addressId')
+                    fullAddress=getattr(feature, '_components_fullAddress', None),
+                    addressId=feature._components_addressId
                     ))
                     
                 dlg = MoveAddressDialog(self._iface.mainWindow())
@@ -166,39 +166,52 @@ class MoveAddressTool(QgsMapToolIdentify):
         
         # Right click for new position         
         if mouseEvent.button() == Qt.RightButton:
-            results = self.identify(mouseEvent.x(), mouseEvent.y(), self.ActiveLayer, self.VectorLayer)
             if self._features:
-                if len(results) == 0:                     
-                    coords = self.toMapCoordinates(QPoint(mouseEvent.x(), mouseEvent.y()))
-                else:
-                    # Snapping. i.e Move to stack
-                    coords = results[0].mFeature.geometry().asPoint()    
+                # Snapping. i.e Move to stack
+                stack = UiUtility.identifyAddresses(self, self._iface, self._controller.uidm, mouseEvent)
+                coords = stack[0].getCoordinates() if stack else None
+                # fall back to the clicked location where the stack has no position
+                if not coords:
+                    coords = UiUtility.transformPoints(self._iface, [self.toMapCoordinates(QPoint(mouseEvent.x(), mouseEvent.y()))])[0]
                 
                 # set new coords for all selected features
-                coords = list(UiUtility.transform(self._iface, coords))
+                coords = list(coords)
 
                 for feature in self._features:
                     # Hack to retrieve the properties missing on the
                     # feature feed from the resolution feed < 
-                    respId = int(time.time()) 
-                    self._controller.uidm.supplementAddress(feature, respId)
-                    feature = self._controller.RespHandler.handleResp(respId, FEEDS['AR'], 'supplement')
+                    future = self._controller.uidm.supplementAddress(feature)
+                    self._controller.RespHandler.handleResp(future, FEEDS['AR'], 'supplement', 
+                                                            lambda supplemented: self.moveFeature(supplemented, coords))
                     # />
-                    #feature.type = FEEDS['AF']
-
-                    # below clone is part of a fix still to be tested
-                    clone = feature.clone(feature, self.aff.get())
-                    clone._addressedObject_addressPositions[0].setCoordinates(coords, )
-                    if clone._codes_isMeshblockOverride != True:
-                        clone.setMeshblock(None)
-                    respId = int(time.time()) 
-                    clone = self.afc[FeedType.CHANGEFEED].cast(clone)
-                    self._controller.uidm.updateAddress(clone, respId)
-                    self.RespHandler.handleResp(respId, FEEDS['AC'])
                         
                 self._features = []
                 self.hideMarker()
                 self._sb.clearMessage()
+    
+    def moveFeature(self, feature, coords):
+        """
+        Response callback for the supplement request, sends the 
+        supplemented feature to its new position 
+
+        @param feature: Supplemented resolution feed feature, None or False if not retrieved
+        @type  feature: AIMSDataManager.Address
+        @param coords: New position
+        @type  coords: list
+        """
+        
+        if not feature:
+            return
+        #feature.type = FEEDS['AF']
+
+        # below clone is part of a fix still to be tested
+        clone = feature.clone(feature, self.aff.get())
+        clone._addressedObject_addressPositions[0].setCoordinates(coords, )
+        if clone._codes_isMeshblockOverride != True:
+            clone.setMeshblock(None)
+        clone = self.afc[FeedType.CHANGEFEED].cast(clone)
+        future = self._controller.uidm.updateAddress(clone)
+        self.RespHandler.handleResp(future, FEEDS['AC'])
 
 class MoveAddressDialog(Ui_ComfirmSelection, QDialog ):
     """
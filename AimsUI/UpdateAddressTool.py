@@ -132,14 +132,24 @@ class UpdateAddressTool(QgsMapToolIdentify):
         if self._feature:
             # Hack to retrieve the properties missing on the
             # feature feed from the resolution feed 
-            respId = int(time.time()) 
-            self._controller.uidm.supplementAddress(self._feature, respId)
-            self.feature = self._controller.RespHandler.handleResp(respId, FEEDS['AR'], 'supplement')
+            future = self._controller.uidm.supplementAddress(self._feature)
+            self._controller.RespHandler.handleResp(future, FEEDS['AR'], 'supplement', self.supplemented)
             # highlight feature             
             self.setMarker(results[0].mFeature.geometry().asPoint())
-            self._controller._queues.uEditFeatureTab.setFeature('update', self._feature )
-            self._controller._queues.tabWidget.setCurrentIndex(0)
-            UiUtility.setEditability(self._controller._queues.uEditFeatureTab, 'update')
+    
+    def supplemented(self, feature):
+        """
+        Response callback for the supplement request, opens the 
+        update form once the missing properties have been retrieved
+
+        @param feature: Supplemented resolution feed feature, None or False if not retrieved
+        @type  feature: AIMSDataManager.Address
+        """
+        
+        self.feature = feature
+        self._controller._queues.uEditFeatureTab.setFeature('update', self._feature )
+        self._controller._queues.tabWidget.setCurrentIndex(0)
+        UiUtility.setEditability(self._controller._queues.uEditFeatureTab, 'update')
 
 class updateAddressDialog(Ui_ComfirmSelection, QDialog ):
     """
@@ -103,22 +103,21 @@ class UpdateReviewPosition(QgsMapToolIdentifyFeature):
             else:
                 # Snapping. i.e Move to stack
                 coords = results[0].mFeature.geometry().asPoint()    
-            coords = list(UiUtility.transform(self._iface, coords))
+            coords = list(UiUtility.transformPoints(self._iface, [coords])[0])
             
-            respId = int(time.time())
             
             if self._currentRevItem._changeType in ('Add', 'Update'):
                 feedType = FEEDS['AR']
                 self._currentRevItem._addressedObject_addressPositions[0].setCoordinates(coords)
-                self._controller.uidm.repairAddress(self._currentRevItem, respId)
+                future = self._controller.uidm.repairAddress(self._currentRevItem)
             else:
                 feedType = FEEDS['GR'] 
                 changeId = self._currentRevItem._changeId
                 self._currentRevItem = self._currentRevItem.meta.entities[0]
                 self._currentRevItem._addressedObject_addressPositions[0].setCoordinates(coords)
                 self._currentRevItem.setChangeId(changeId)
-                self._controller.uidm.repairAddress(self._currentRevItem, respId)
+                future = self._controller.uidm.repairAddress(self._currentRevItem)
             
-            self.RespHandler.handleResp(respId, feedType)
+            self.RespHandler.handleResp(future, feedType)
             self._controller.setPreviousMapTool() 
 
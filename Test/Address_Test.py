@@ -126,6 +126,43 @@ class Test_1_AddressTestSetters(unittest.TestCase):
         
     
 
+class Test_2_AddressDerivedLabels(unittest.TestCase):
+    
+    def setUp(self): 
+        testlog.debug('Instantiate flat Add address')
+        self._address = AddressChange(user_text)
+        self._address.setChangeType('Add')
+        self._address.setUnitValue('3')
+        self._address.setAddressNumber(12)
+        self._address.setRoadName('Main')
+        self._address.setRoadType('Street')
+        
+    def tearDown(self):
+        self._address = None
+        
+    def test10_cachedLabels(self):
+        '''Tests full number and road labels are built once and cached on the address'''
+        testlog.debug('Test_2.10 Derived labels cached')
+        self._address.derive()
+        self.assertEqual(self._address.getFullNumber(),'3/12')
+        self.assertEqual(self._address.getFullRoad().strip(),'Main Street')
+        self.assertTrue('_derived_fullNumber' in self._address.__dict__,'Full number not cached')
+        
+    def test20_setterInvalidation(self):
+        '''Tests setting a contributing component rebuilds the label'''
+        testlog.debug('Test_2.20 Derived labels invalidated by setters')
+        self._address.derive()
+        self._address.setAddressNumberSuffix('A')
+        self._address.setRoadName('High')
+        self.assertEqual(self._address.getFullNumber(),'3/12A')
+        self.assertEqual(self._address.getFullRoad().strip(),'High Street')
+        
+    def test30_hashExcludesLabels(self):
+        '''Tests cached labels do not alter the feature hash'''
+        h = self._address.getHash()
+        self._address.derive()
+        self.assertEqual(h,self._address.getHash(),'Derived labels included in hash')
+
     
 def getTestData(at):
 #     return {
@@ -0,0 +1,95 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - AimsCodec_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on AimsCodec JSON decoding and value interning
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+
+sys.path.append('../AIMSDataManager/')
+
+import AimsCodec
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+CONTENT = '{"class":["address"],"properties":{"suburbLocality":"Kelburn","addressType":"Road","fullAddress":"3 Kelburn Parade"},'\
+          '"entities":[{"properties":{"suburbLocality":"Kelburn","meshblock":"1234567","roadName":"Kelburn"}}]}'
+
+class Test_0_AimsCodecSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('AimsCodec_Test Log')
+
+    def test20_backend(self):
+        self.assertIn(AimsCodec.BACKEND,('ujson','simplejson','json'),'Unknown JSON backend')
+
+class Test_1_AimsCodec(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Decode test response')
+
+    def tearDown(self):
+        pass
+
+    def test10_roundtrip(self):
+        '''Tests decoding an encoded payload returns an equal object'''
+        payload = {'properties':{'version':3,'suburbLocality':u'Kelburn','position':[174.77,-41.28]}}
+        self.assertEqual(AimsCodec.loads(AimsCodec.dumps(payload)),payload)
+
+    def test20_internShared(self):
+        '''Tests interned field values share one instance across separate decodes, at any depth'''
+        r1,r2 = AimsCodec.loads(CONTENT,compact=True),AimsCodec.loads(CONTENT,compact=True)
+        self.assertIs(r1['properties']['suburbLocality'],r2['properties']['suburbLocality'],'Value not interned')
+        self.assertIs(r1['properties']['addressType'],r2['properties']['addressType'],'Value not interned')
+        self.assertIs(r1['entities'][0]['properties']['suburbLocality'],r1['properties']['suburbLocality'],'Nested value not interned')
+
+    def test30_otherFields(self):
+        '''Tests values of fields not listed for interning are left unpooled'''
+        r1,r2 = AimsCodec.loads(CONTENT,compact=True),AimsCodec.loads(CONTENT,compact=True)
+        self.assertIsNot(r1['properties']['fullAddress'],r2['properties']['fullAddress'],'Unlisted field interned')
+        self.assertIsNot(r1['entities'][0]['properties']['meshblock'],r2['entities'][0]['properties']['meshblock'],'High cardinality field interned')
+
+    def test40_compactOff(self):
+        '''Tests compact=False decodes without interning'''
+        r1,r2 = AimsCodec.loads(CONTENT,compact=False),AimsCodec.loads(CONTENT,compact=False)
+        self.assertEqual(r1,AimsCodec.loads(CONTENT,compact=True))
+        self.assertIsNot(r1['properties']['suburbLocality'],r2['properties']['suburbLocality'],'Value interned with compact off')
+
+    def test50_walk(self):
+        '''Tests the post decode pass used for hookless backends interns every nested object'''
+        r1 = AimsCodec._compact(AimsCodec.loads(CONTENT,compact=False))
+        r2 = AimsCodec.loads(CONTENT,compact=True)
+        self.assertIs(r1['entities'][0]['properties']['suburbLocality'],r2['properties']['suburbLocality'],'Nested value not interned')
+
+    def test60_stats(self):
+        '''Tests decode stats are recorded per endpoint'''
+        before = AimsCodec.stats().get('codecTest',{'count':0,'bytes':0})
+        AimsCodec.loads(CONTENT,endpoint='codecTest')
+        AimsCodec.loads(CONTENT,endpoint='codecTest')
+        after = AimsCodec.stats()['codecTest']
+        self.assertEqual(after['count']-before['count'],2)
+        self.assertEqual(after['bytes']-before['bytes'],2*len(CONTENT))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -192,36 +192,21 @@ class Test_5_DataManagerChangeFeed(unittest.TestCase):
     def test20_add(self):
         addr_c = self.afc.cast(addr_f)
         addr_c.setVersion(ver)
-        self.dm.addAddress(addr_c)
-        resp = None
-        while not resp: 
-            resp = self.dm.response()
-            for r in resp:
-                self.assertTrue(isinstance(Address,r))
-            time.sleep(5)
+        resp = self.dm.addAddress(addr_c).result(TS2)
+        self.assertTrue(isinstance(resp,Address))
 
     def test30_update(self):        
         addr_c = self.afc.cast(addr_f)
         addr_c.setFullAddress('Unit B, 16 Islay Street, Glenorchy')
         addr_c.setVersion(ver)
-        self.dm.updateAddress(addr_c)
-        resp = None
-        while not resp: 
-            resp = self.dm.response()
-            for r in resp:
-                self.assertTrue(isinstance(Address,r))
-            time.sleep(5) 
+        resp = self.dm.updateAddress(addr_c).result(TS2)
+        self.assertTrue(isinstance(resp,Address))
             
     def test30_retire(self):        
         addr_c = self.afc.cast(addr_f)
         addr_c.setVersion(ver)
-        self.dm.retireAddress(addr_c)
-        resp = None
-        while not resp: 
-            resp = self.dm.response()
-            for r in resp:
-                self.assertTrue(isinstance(Address,r))
-            time.sleep(5)
+        resp = self.dm.retireAddress(addr_c).result(TS2)
+        self.assertTrue(isinstance(resp,Address))
             
 class Test_6_DataManagerResolutionFeed(unittest.TestCase): 
     
@@ -249,36 +234,21 @@ class Test_6_DataManagerResolutionFeed(unittest.TestCase):
     def test20_accept(self):
         addr_c = self.afc.cast(addr_f)
         addr_c.setVersion(ver)
-        self.dm.addAddress(addr_c)
-        resp = None
-        while not resp: 
-            resp = self.dm.response()
-            for r in resp:
-                self.assertTrue(isinstance(Address,r))
-            time.sleep(5)
+        resp = self.dm.addAddress(addr_c).result(TS2)
+        self.assertTrue(isinstance(resp,Address))
 
     def test30_update(self):        
         addr_c = self.afc.cast(addr_f)
         addr_c.setFullAddress('Unit 1, 1000 Islay Street, Glenorchy')
         addr_c.setVersion(ver)
-        self.dm.updateAddress(addr_c)
-        resp = None
-        while not resp: 
-            resp = self.dm.response()
-            for r in resp:
-                self.assertTrue(isinstance(Address,r))
-            time.sleep(5) 
+        resp = self.dm.updateAddress(addr_c).result(TS2)
+        self.assertTrue(isinstance(resp,Address))
             
     def test30_reject(self):        
         addr_c = self.afc.cast(addr_f)
         addr_c.setVersion(ver)
-        self.dm.retireAddress(addr_c)
-        resp = None
-        while not resp: 
-            resp = self.dm.response()
-            for r in resp:
-                self.assertTrue(isinstance(Address,r))
-            time.sleep(5)
+        resp = self.dm.retireAddress(addr_c).result(TS2)
+        self.assertTrue(isinstance(resp,Address))
 
     
 # --------------------------------------------------------------------
@@ -0,0 +1,101 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - DataRequestChannel_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on the pooled DRC request consumer
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import time
+import Queue
+import threading
+
+sys.path.append('../AIMSDataManager/')
+
+from DataSync import DataRequestChannel
+from AimsUtility import ActionType,FEEDS
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+class RequestClient(object):
+    '''Stand in for a DataSyncFeeds client, recording processed features with a fixed service time'''
+    parameters = {FEEDS['AC']:{'atype':ActionType}}
+    def __init__(self,delay=0.2):
+        self.etft = FEEDS['AC']
+        self.inq = Queue.Queue()
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.done = []
+        self.active,self.peak = 0,0
+    def processFeature(self,at,feature):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak,self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+            self.done.append(feature)
+        return 'PR.{}'.format(feature)
+
+class Test_0_DataRequestChannelSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('DataRequestChannel_Test Log')
+
+class Test_1_DataRequestChannel(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Start DRC with two workers')
+        self.client = RequestClient()
+        self.drc = DataRequestChannel(self.client,workers=2)
+        self.drc.setDaemon(True)
+        self.drc.start()
+
+    def tearDown(self):
+        self.drc.stop()
+
+    def wait(self,n):
+        t = time.time()
+        while len(self.client.done)<n and time.time()-t<5: time.sleep(0.05)
+
+    def test10_pooled(self):
+        '''Tests queued requests are all serviced without exceeding the worker count'''
+        for i in range(6):
+            self.client.inq.put((time.time(),{ActionType.ADD:(i,)}))
+        self.wait(6)
+        self.assertEqual(sorted(self.client.done),range(6))
+        self.assertEqual(self.client.peak,2)
+
+    def test20_stats(self):
+        '''Tests wait and service times are recorded per request type'''
+        self.client.inq.put((time.time(),{ActionType.ADD:(1,2,3),ActionType.RETIRE:(4,)}))
+        self.wait(4)
+        time.sleep(0.1)
+        stats = self.drc.stats()
+        self.assertEqual(stats['ADD']['count'],3)
+        self.assertEqual(stats['RETIRE']['count'],1)
+        self.assertTrue(stats['ADD']['service']>=0.2)
+        self.assertTrue(stats['ADD']['maxwait']>=0.2,'Third request should have waited for a worker')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - FeaturePool_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on FeaturePool string and entity pools
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+
+sys.path.append('../AIMSDataManager/')
+
+from FeaturePool import InternPool,EntityPool,internField
+from Address import EntityValidation
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+VDICT = {'class':['validation'],'rel':['http://linz.govt.nz/rels/validation'],
+         'properties':{'ruleId':u'RCL.1','description':u'Address number already exists on road','severity':u'Warning'}}
+
+class Test_0_FeaturePoolSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('FeaturePool_Test Log')
+
+class Test_1_InternPool(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Instantiate empty string pool')
+        self.pool = InternPool()
+
+    def tearDown(self):
+        self.pool = None
+
+    def test10_sharedInstance(self):
+        '''Tests equal strings built separately resolve to the same instance'''
+        a = self.pool.intern(u''.join(['Lower ','Hutt']))
+        b = self.pool.intern(u''.join(['Lower ','Hutt']))
+        self.assertIs(a,b,'Equal strings not interned to one instance')
+        self.assertEqual(self.pool.stats()['hits'],1,'Pool hit not counted')
+        self.assertTrue(self.pool.stats()['saved']>0,'Saved bytes not counted')
+
+    def test20_nonString(self):
+        '''Tests non string values pass through unchanged and are not pooled'''
+        self.assertEqual(self.pool.intern(None),None)
+        self.assertEqual(self.pool.intern(42),42)
+        self.assertEqual(len(self.pool),0,'Non string value added to pool')
+
+    def test30_internField(self):
+        '''Tests only configured fields are interned'''
+        a = internField('suburbLocality',u''.join(['Kel','burn']))
+        self.assertIs(internField('suburbLocality',u''.join(['Kelb','urn'])),a,'Configured field not interned')
+        b = internField('_components_townCity',u''.join(['Welling','ton']))
+        self.assertIs(internField('_components_townCity',u''.join(['Well','ington'])),b,'Flattened field not interned')
+        mb = u''.join(['12','34567'])
+        self.assertIs(internField('_codes_meshblock',mb),mb,'High cardinality field interned')
+
+    def test40_limit(self):
+        '''Tests a full pool returns new values unpooled and keeps serving pooled ones'''
+        pool = InternPool(limit=2)
+        a,b = pool.intern(u'Kelburn'),pool.intern(u'Thorndon')
+        c = u''.join(['Te ','Aro'])
+        self.assertIs(pool.intern(c),c)
+        self.assertEqual(len(pool),2,'Pool grew past its limit')
+        self.assertIs(pool.intern(u''.join(['Kel','burn'])),a)
+
+class Test_2_EntityPool(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Instantiate empty entity pool')
+        self.pool = EntityPool(InternPool())
+
+    def tearDown(self):
+        self.pool = None
+
+    def test10_sharedEntity(self):
+        '''Tests identical validation dicts return a single shared entity'''
+        e1 = self.pool.get(VDICT,EntityValidation.getInstance)
+        e2 = self.pool.get(dict(VDICT),EntityValidation.getInstance)
+        self.assertIs(e1,e2,'Identical entities not shared')
+        self.assertEqual(e1._description,VDICT['properties']['description'])
+        self.assertEqual(self.pool.stats()['size'],1)
+
+    def test20_distinctEntity(self):
+        '''Tests entities differing in severity are kept apart'''
+        vd2 = {'class':VDICT['class'],'rel':VDICT['rel'],'properties':dict(VDICT['properties'],severity=u'Reject')}
+        e1 = self.pool.get(VDICT,EntityValidation.getInstance)
+        e2 = self.pool.get(vd2,EntityValidation.getInstance)
+        self.assertIsNot(e1,e2,'Distinct entities shared')
+        self.assertEqual(len(self.pool),2)
+
+if __name__ == "__main__":
+    unittest.main()
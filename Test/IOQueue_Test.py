@@ -0,0 +1,81 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - IOQueue_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on bounded feed queues, snapshot coalescing and backpressure
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import time
+import Queue
+import threading
+
+sys.path.append('../AIMSDataManager/')
+
+import IOQueue
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+class Test_0_IOQueueSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('IOQueue_Test Log')
+
+class Test_1_IOQueue(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Instantiate queues')
+
+    def tearDown(self):
+        pass
+
+    def test10_latest(self):
+        '''Tests unconsumed snapshots are replaced by the newest'''
+        q = IOQueue.build('latest',name='out')
+        for snapshot in (['a'],['b'],['c']):
+            q.put(snapshot)
+            q.task_done()
+        self.assertEqual(q.qsize(),1)
+        self.assertEqual(q.get(),['c'])
+        self.assertTrue(q.empty())
+        self.assertEqual((q.stats()['coalesced'],q.stats()['highwater']),(2,1))
+
+    def test20_backpressure(self):
+        '''Tests a full bounded queue blocks its producer until there is room'''
+        q = IOQueue.build('block',2,'in')
+        q.put(1)
+        q.put(2)
+        self.assertRaises(Queue.Full,q.put,3,True,0.1)
+        threading.Timer(0.2,q.get).start()
+        t1 = time.time()
+        q.put(3,timeout=2)
+        self.assertTrue(time.time()-t1 >= 0.1)
+        s = q.stats()
+        self.assertEqual((s['size'],s['highwater'],s['blocked']),(2,2,2))
+
+    def test30_policy(self):
+        '''Tests unknown policies are rejected'''
+        self.assertRaises(IOQueue.QueuePolicyException,IOQueue.build,'drop')
+
+if __name__ == "__main__":
+    unittest.main()
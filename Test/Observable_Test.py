@@ -0,0 +1,126 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - Observable_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on Observable notification through the event bus
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import threading
+
+sys.path.append('../AIMSDataManager/')
+
+from Observable import Observable,bus
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+#upper bound on waits, tests pass as soon as the awaited event is set
+WAIT = 5
+
+class Listener(Observable):
+    '''Observer recording received notifications. Signals once it has the expected count, optionally holding
+    each delivery until a gate is opened and failing on a given topic'''
+    def __init__(self,expect=1,gate=None,fail=None):
+        super(Listener,self).__init__()
+        self.expect = expect
+        self.gate = gate
+        self.fail = fail
+        self.received = []
+        self.done = threading.Event()
+    def observe(self,observable,*args,**kwargs):
+        if self.gate: self.gate.wait(WAIT)
+        if args[0] == self.fail: raise Exception('Listener failed on {}'.format(args[0]))
+        self.received.append(args[0])
+        if len(self.received) >= self.expect: self.done.set()
+
+class Test_0_ObservableSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('Observable_Test Log')
+
+class Test_1_EventBus(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Instantiate observable')
+        self.obs = Observable()
+
+    def tearDown(self):
+        self.obs = None
+
+    def test10_topics(self):
+        '''Tests observers only receive their subscribed topics, in the order posted'''
+        every,some = Listener(expect=3),Listener(expect=1)
+        self.obs.register(every)
+        self.obs.register(some,('b',))
+        for t in ('a','b','c'): self.obs.notify(t)
+        self.assertTrue(every.done.wait(WAIT) and some.done.wait(WAIT),'Notifications not delivered')
+        self.assertEqual(every.received,['a','b','c'])
+        self.assertEqual(some.received,['b'])
+
+    def test20_async(self):
+        '''Tests notify returns while an observer is blocked and the other observers are still served'''
+        gate = threading.Event()
+        slow,fast = Listener(gate=gate),Listener()
+        self.obs.register(slow)
+        self.obs.register(fast)
+        self.obs.notify('a')
+        self.assertTrue(fast.done.wait(WAIT),'Blocked observer delayed another')
+        self.assertFalse(slow.done.isSet())
+        gate.set()
+        self.assertTrue(slow.done.wait(WAIT),'Notification not delivered')
+
+    def test30_deregister(self):
+        '''Tests deregistered observers receive nothing'''
+        l = Listener()
+        self.obs.register(l)
+        self.obs.deregister(l)
+        posted = bus.stats()['posted']
+        self.obs.notify('a')
+        self.assertEqual(bus.stats()['posted'],posted,'Notification posted to deregistered observer')
+
+    def test40_errors(self):
+        '''Tests a failing notification is counted and later ones still delivered'''
+        l = Listener(fail='a')
+        self.obs.register(l)
+        before = bus.stats()
+        self.obs.notify('a')
+        self.obs.notify('b')
+        self.assertTrue(l.done.wait(WAIT),'Notification after failure not delivered')
+        after = bus.stats()
+        self.assertEqual(l.received,['b'])
+        self.assertEqual(after['errors']-before['errors'],1)
+        self.assertTrue(after['dispatched']-before['dispatched']>=2)
+
+    def test50_drained(self):
+        '''Tests a dispatcher exits once its queue is drained and a later notification starts a new one'''
+        from Observable import EventBus
+        quiet = EventBus()
+        l = Listener(expect=2)
+        quiet.post(l,self.obs,('a',),{})
+        while quiet.stats()['dispatchers']: l.done.wait(0.01)
+        quiet.post(l,self.obs,('b',),{})
+        self.assertTrue(l.done.wait(WAIT),'Notification not delivered after idle exit')
+        self.assertEqual(l.received,['a','b'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - Persistence_Benchmark
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Ad hoc persistence benchmark timing Persistence replace, delta, write and reload against 
+a pickled file, with the SQLite store and snapshot layers underneath it timed separately.
+Run from the Test directory, eg python Persistence_Benchmark.py 10000 100000
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+import random
+
+sys.path.append('../AIMSDataManager/')
+
+from AimsUtility import FEEDS,PersistActionType
+from DataManager import Persistence
+from FeatureFactory import FeatureFactory
+from Address import Position
+from DataStore import DataStore
+import Snapshot
+
+aff = FeatureFactory.getInstance(FEEDS['AF'])
+
+SUBURBS = ['Kelburn','Thorndon','Te Aro','Newtown','Karori','Miramar']
+ROADS = [('Main','Street'),('Church','Road'),('Station','Avenue'),('Beach','Parade')]
+
+class Benchmark():
+
+    def features(self,n):
+        '''Builds n synthetic address features'''
+        flist = []
+        for i in range(n):
+            road = ROADS[i%len(ROADS)]
+            a = aff.get(model={'version':1,'components':{'addressId':i,'addressNumber':i%500,'roadName':road[0],'roadType':road[1],
+                                                         'suburbLocality':SUBURBS[i%len(SUBURBS)],'townCity':'Wellington'}})
+            p = Position()
+            p.setCoordinates([174.7+random.random()*0.1,-41.3+random.random()*0.1])
+            a.setAddressPositions(p)
+            a.getHash()
+            flist.append(a)
+        return flist
+
+    def timed(self,label,func,*args):
+        t1 = time.time()
+        res = func(*args)
+        print '  {:<32}{:>9.3f}s'.format(label,time.time()-t1)
+        return res
+
+    def run(self,n):
+        print 'FEATURES {}'.format(n)
+        etft = FEEDS['AF']
+        flist = self.features(n)
+        tmp = tempfile.mkdtemp()
+
+        #pickle, full rewrite on every save
+        pf = os.path.join(tmp,'aimsdata')
+        def pdump():
+            with open(pf,'wb') as h: pickle.dump([{},{etft:flist}],h)
+        def pload():
+            with open(pf,'rb') as h: return pickle.load(h)
+        self.timed('pickle write all',pdump)
+        self.timed('pickle read all',pload)
+        print '  {:<32}{:>9.1f}MB'.format('pickle size',os.path.getsize(pf)/1e6)
+
+        #persistence, full replace, write, 1% delta replace, write, then reopen and read
+        pdb = os.path.join(tmp,'persist.db')
+        persist = Persistence(True,pdb)
+        self.timed('persistence replace all',persist.set,etft,flist,PersistActionType.REPLACE)
+        self.timed('persistence write all',persist.write)
+        flist2 = list(flist)
+        for i in random.sample(range(n),max(1,n/100)):
+            flist2[i] = flist2[i].clone(flist2[i],aff.get())
+            flist2[i].setVersion(2)
+            flist2[i].getHash()
+        self.timed('persistence replace 1% delta',persist.set,etft,flist2,PersistActionType.REPLACE)
+        self.timed('persistence write delta',persist.write)
+        persist.close()
+        persist = self.timed('persistence reopen',Persistence,False,pdb)
+        self.timed('persistence read all',list,persist.get(etft))
+        persist.close()
+
+        #sqlite, full insert then 1% delta
+        ds = DataStore(os.path.join(tmp,'aimsdata.db'))
+        self.timed('store write all',lambda: ds.upsert(etft,[DataStore.row(etft,seq,f) for seq,f in enumerate(flist)]))
+        changed = random.sample(flist,max(1,n/100))
+        for f in changed:
+            f.setVersion(2)
+            f.getHash()
+        self.timed('store upsert 1% delta',lambda: ds.upsert(etft,[DataStore.row(etft,0,f) for f in changed]))
+        self.timed('store read versions',ds.versions,etft)
+        self.timed('store read all',ds.load,etft)
+        self.timed('store read by 100 ids',ds.load,etft,[f.getAddressId() for f in changed[:100]])
+        res = self.timed('store read bbox',ds.load,etft,None,([174.7,-41.3],[174.72,-41.28]))
+        print '  {:<32}{:>9}'.format('bbox features',len(res))
+        ds.close()
+        print '  {:<32}{:>9.1f}MB'.format('store size',os.path.getsize(os.path.join(tmp,'aimsdata.db'))/1e6)
+
+        #memory-mapped snapshot, open then decode on access
+        sf = os.path.join(tmp,'aimsdata.snap')
+        rows = [DataStore.row(etft,seq,f) for seq,f in enumerate(flist)]
+        self.timed('snapshot write all',Snapshot.write,sf,etft.k,'0',[r[:5]+(str(r[5]),) for r in rows])
+        snap = self.timed('snapshot open',Snapshot.load,sf)
+        self.timed('snapshot read versions',snap.versions)
+        self.timed('snapshot decode 100',lambda: [snap[i] for i in range(0,n,max(1,n/100))])
+        self.timed('snapshot decode all',list,snap)
+        snap.close()
+        print '  {:<32}{:>9.1f}MB'.format('snapshot size',os.path.getsize(sf)/1e6)
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    bm = Benchmark()
+    for n in [int(a) for a in sys.argv[1:]] or [10000,100000]:
+        bm.run(n)
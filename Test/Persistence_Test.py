@@ -0,0 +1,142 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - Persistence_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on incremental changes to the persisted feeds
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import os
+import sys
+import shutil
+import glob
+import tempfile
+
+sys.path.append('../AIMSDataManager/')
+
+from DataManager import Persistence
+from DataStore import MAX_VARS
+from AimsUtility import FEEDS,PersistActionType,mergeDelta
+from FeatureFactory import FeatureFactory
+from Address import Position
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+aff = FeatureFactory.getInstance(FEEDS['AF'])
+
+def feature(aid,number):
+    a = aff.get(model={'version':1,'components':{'addressId':aid,'addressNumber':number}})
+    p = Position()
+    p.setCoordinates([174.7+aid*0.01,-41.3])
+    a.setAddressPositions(p)
+    return a
+
+class Test_0_PersistenceSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('Persistence_Test Log')
+
+class Test_1_Persistence(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Instantiate persistence on a temporary store')
+        self.dir = tempfile.mkdtemp()
+        self.persist = Persistence(True,os.path.join(self.dir,'aimsdata.db'))
+        self.persist.set(FEEDS['AF'],[feature(i,i*10) for i in range(1,4)],pat=PersistActionType.REPLACE)
+        self.persist.write()
+
+    def tearDown(self):
+        self.persist.close()
+        shutil.rmtree(self.dir)
+
+    def test10_apply(self):
+        '''Tests changes replace, append and remove features by id and are indexed'''
+        before = self.persist.get(FEEDS['AF'])
+        upserted,deleted = self.persist.apply(FEEDS['AF'],[feature(2,99),feature(7,70)],[3,8])
+        self.assertEqual((upserted,deleted),([2,7],[3]))
+        after = self.persist.get(FEEDS['AF'])
+        self.assertEqual([(f.getAddressId(),f._components_addressNumber) for f in after],[(1,10),(2,99),(7,70)])
+        self.assertEqual(len(before),3,'Previous feed list modified')
+        index = self.persist.indexes[FEEDS['AF']]
+        self.assertTrue(7 in index)
+        self.assertFalse(3 in index)
+
+    def test20_persisted(self):
+        '''Tests applied changes are written to the local store'''
+        self.persist.apply(FEEDS['AF'],[feature(2,99)],[1])
+        self.assertTrue(self.persist.write())
+        stored = self.persist.load(FEEDS['AF'])
+        self.assertEqual([(f.getAddressId(),f._components_addressNumber) for f in stored],[(2,99),(3,30)])
+
+    def test30_delta(self):
+        '''Tests replacing a feed returns only the changed features, and consecutive deltas merge'''
+        upserts,deletes = self.persist.set(FEEDS['AF'],[feature(1,10),feature(2,99),feature(4,40)],pat=PersistActionType.REPLACE)
+        self.assertEqual((sorted(upserts),deletes),([2,4],[3]))
+        merged = mergeDelta((upserts,deletes),({3:feature(3,30)},[4]))
+        self.assertEqual((sorted(merged[0]),sorted(merged[1])),([2,3],[4]))
+        self.assertEqual(mergeDelta(None,merged),None)
+
+    def test40_loadIds(self):
+        '''Tests loading more ids than a single query binds keeps feed order and paging'''
+        n = MAX_VARS*2+10
+        self.persist.set(FEEDS['AF'],[feature(i,i) for i in range(1,n+1)],pat=PersistActionType.REPLACE)
+        self.persist.write()
+        ids = list(reversed(range(1,n+1)))
+        self.assertEqual([f.getAddressId() for f in self.persist.load(FEEDS['AF'],ids)],range(1,n+1))
+        self.assertEqual([f.getAddressId() for f in self.persist.load(FEEDS['AF'],ids,limit=5,offset=MAX_VARS)],range(MAX_VARS+1,MAX_VARS+6))
+        self.assertEqual(len(self.persist.load(FEEDS['AF'],ids[:MAX_VARS+1])),MAX_VARS+1)
+
+    def test50_snapshotReaders(self):
+        '''Tests a snapshot handed to a reader stays readable after the feed is rewritten and old files are pruned'''
+        held = self.persist.snapshots[FEEDS['AF']]
+        self.persist.apply(FEEDS['AF'],[feature(2,99)],[1])
+        self.assertTrue(self.persist.write())
+        self.assertIsNot(self.persist.snapshots[FEEDS['AF']],held)
+        self.assertEqual(held.ids(),[1,2,3])
+        self.assertEqual([f._components_addressNumber for f in held],[10,20,30])
+        self.assertEqual(len(glob.glob(os.path.join(self.dir,'*.{}.*.snap'.format(FEEDS['AF'].k)))),1,'Superseded snapshot not removed')
+        self.persist.close()
+        self.persist = Persistence(False,os.path.join(self.dir,'aimsdata.db'))
+        self.assertEqual([f._components_addressNumber for f in self.persist.get(FEEDS['AF'])],[99,30])
+
+    def test60_reset(self):
+        '''Tests a feed replaced after being cleared returns a full replacement rather than a delta'''
+        self.persist.set(FEEDS['AF'],None,pat=PersistActionType.INIT)
+        self.assertEqual(self.persist.set(FEEDS['AF'],[feature(1,10),feature(4,40)],pat=PersistActionType.REPLACE),None)
+        self.assertEqual(mergeDelta(({},[]),None),None)
+        upserts,deletes = self.persist.set(FEEDS['AF'],[feature(1,10)],pat=PersistActionType.REPLACE)
+        self.assertEqual((upserts.keys(),deletes),([],[4]))
+
+    def test70_snapshotReuse(self):
+        '''Tests replacing a feed read from its snapshot reuses decoded features without decoding the others'''
+        self.persist.close()
+        self.persist = Persistence(False,os.path.join(self.dir,'aimsdata.db'))
+        snap = self.persist.get(FEEDS['AF'])
+        first = snap[0]
+        fetched = [feature(i,i*10) for i in range(1,4)]
+        upserts,deletes = self.persist.set(FEEDS['AF'],fetched,pat=PersistActionType.REPLACE)
+        self.assertEqual((upserts,deletes),({},[]))
+        self.assertIs(fetched[0],first,'Decoded feature not reused')
+        self.assertEqual(snap.decoded(),1,'Snapshot decoded to reuse its features')
+
+if __name__ == "__main__":
+    unittest.main()
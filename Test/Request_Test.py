@@ -0,0 +1,111 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - Request_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on request futures and the response mailbox
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import threading
+
+sys.path.append('../AIMSDataManager/')
+
+from Request import ResponseMailbox,BatchFuture,RequestTimeoutException,nextRequestId
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+class Response(object):
+    '''Stand in for a response feature'''
+    def __init__(self,reqid):
+        self.reqid = reqid
+    def getRequestId(self):
+        return self.reqid
+
+class Test_0_RequestSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('Request_Test Log')
+
+class Test_1_ResponseMailbox(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Instantiate mailbox')
+        self.mb = ResponseMailbox()
+
+    def tearDown(self):
+        self.mb = None
+
+    def test10_matching(self):
+        '''Tests each future only receives the response to its own request'''
+        f1,f2 = self.mb.expect(1),self.mb.expect(2)
+        r2 = Response(2)
+        threading.Thread(target=self.mb.put,args=(r2,)).start()
+        self.assertEqual(f2.result(2),r2)
+        self.assertFalse(f1.done())
+        self.assertRaises(RequestTimeoutException,f1.result,0.1)
+        self.assertEqual(self.mb.pending(),1)
+
+    def test20_callback(self):
+        '''Tests callbacks run on resolution, or at once if already resolved'''
+        called = []
+        f = self.mb.expect(3)
+        f.addCallback(called.append)
+        self.mb.put(Response(3))
+        f.addCallback(called.append)
+        self.assertEqual(called,[f,f])
+
+    def test30_unclaimed(self):
+        '''Tests responses without a future are held per request id'''
+        r4,r5 = Response(4),Response(5)
+        self.mb.put(r4)
+        self.mb.put(r5)
+        self.assertEqual(self.mb.get(5),(r5,))
+        self.assertEqual(self.mb.expect(4).result(0),r4)
+        self.assertTrue(self.mb.empty())
+
+    def test40_fail(self):
+        '''Tests a failed request resolves with its error'''
+        f = self.mb.expect(6)
+        self.mb.fail(6,ValueError('unreachable'))
+        self.assertEqual(f.result(0),None)
+        self.assertTrue(isinstance(f.error(),ValueError))
+        self.assertNotEqual(nextRequestId(),nextRequestId())
+
+    def test50_batch(self):
+        '''Tests a batch reports progress and completes with results in request order'''
+        batch = BatchFuture([self.mb.expect(i) for i in (7,8,9)])
+        progress,finished = [],[]
+        batch.addProgressCallback(lambda b,f: progress.append(f.reqid))
+        batch.addCallback(finished.append)
+        responses = dict([(i,Response(i)) for i in (7,8,9)])
+        for i in (9,7): self.mb.put(responses[i])
+        self.assertEqual(batch.progress(),(2,3))
+        self.assertRaises(RequestTimeoutException,batch.results,0.1)
+        self.mb.fail(8,ValueError('unreachable'))
+        self.assertEqual(progress,[9,7,8])
+        self.assertEqual(finished,[batch])
+        self.assertEqual(batch.results(0),[responses[7],None,responses[9]])
+        self.assertEqual(batch.errors().keys(),[8])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - Runner_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on the headless runner's action file reading and run reports
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append('../AIMSDataManager/')
+
+import Runner
+from Request import RequestFuture
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+class Test_0_RunnerSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('Runner_Test Log')
+
+class Test_1_Runner(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Create actions file')
+        fd,self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test10_percentile(self):
+        '''Tests nearest rank percentiles'''
+        values = range(1,101)
+        self.assertEqual(Runner.percentile(values,50),50)
+        self.assertEqual(Runner.percentile(values,99),99)
+        self.assertEqual(Runner.percentile([3],90),3)
+        self.assertEqual(Runner.percentile([],50),None)
+
+    def test20_read(self):
+        '''Tests actions are read skipping comments and unknown actions are rejected'''
+        with open(self.path,'w') as h:
+            h.write('# comment\n\n{"action":"acceptAddresses","feed":"AR","ids":[1,2]}\n')
+        self.assertEqual(Runner.read(self.path),[{'action':'acceptAddresses','feed':'AR','ids':[1,2]}])
+        with open(self.path,'w') as h:
+            h.write('{"action":"dropTables","feed":"AR","id":1}\n')
+        self.assertRaises(Runner.RunnerException,Runner.read,self.path)
+
+    def test30_report(self):
+        '''Tests requests are counted as answered, failed or unanswered'''
+        report = Runner.Report('Replay')
+        answered,failed,pending = RequestFuture(1),RequestFuture(2),RequestFuture(3)
+        answered._resolve('feature')
+        failed._resolve(error=ValueError('down'))
+        for f in (answered,failed,pending): report.request(f)
+        report.finish()
+        self.assertEqual((report.failed,report.unanswered,len(report.latencies)),(1,1,2))
+        self.assertFalse(report.ok())
+        self.assertTrue(any('p99' in line for line in report.lines()))
+
+if __name__ == "__main__":
+    unittest.main()
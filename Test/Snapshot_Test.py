@@ -0,0 +1,100 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - Snapshot_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on memory-mapped feed snapshots
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+
+sys.path.append('../AIMSDataManager/')
+
+import Snapshot
+from AimsUtility import FEEDS
+from FeatureFactory import FeatureFactory
+from Address import Position
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+class Test_0_SnapshotSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('Snapshot_Test Log')
+
+class Test_1_Snapshot(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Write test snapshot')
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir,'test.snap')
+        aff = FeatureFactory.getInstance(FEEDS['AF'])
+        self.feats = []
+        for i in range(1,4):
+            a = aff.get(model={'version':1,'components':{'addressId':i,'addressNumber':i*10}})
+            p = Position()
+            p.setCoordinates([174.7+i,-41.3])
+            a.setAddressPositions(p)
+            a.getHash()
+            self.feats.append(a)
+        rows = [(f.getAddressId(),seq,f.getMeta().hash,174.7+f.getAddressId(),-41.3,pickle.dumps(f,2)) for seq,f in enumerate(self.feats)]
+        rows.append(('#3',3,'',None,None,pickle.dumps(aff.get(),2)))
+        Snapshot.write(self.path,FEEDS['AF'].k,'0123456789abcdef',rows)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test10_open(self):
+        '''Tests header values and columns read back'''
+        snap = Snapshot.load(self.path,FEEDS['AF'].k)
+        self.assertEqual(len(snap),4)
+        self.assertEqual(snap.token,'0123456789abcdef')
+        self.assertEqual(snap.ids(),[1,2,3,'#3'])
+        self.assertEqual(snap.coordinates()[1],(176.7,-41.3))
+        self.assertEqual(snap.coordinates()[3],None)
+        self.assertEqual(snap.versions()[2],self.feats[1].getMeta().hash)
+        self.assertEqual(snap.decoded(),0,'Features decoded on open')
+        snap.close()
+
+    def test20_lazyDecode(self):
+        '''Tests features are decoded on access and the same instance returned thereafter'''
+        snap = Snapshot.load(self.path)
+        f = snap[1]
+        self.assertEqual(f._components_addressNumber,20)
+        self.assertIs(f,snap[1],'Feature decoded twice')
+        self.assertEqual(snap.decoded(),1)
+        self.assertEqual(len(snap[1:3]),2)
+        snap.close()
+
+    def test30_reject(self):
+        '''Tests snapshots of another feed or with a damaged file are ignored'''
+        self.assertEqual(Snapshot.load(self.path,FEEDS['AR'].k),None)
+        with open(self.path,'r+b') as handle: handle.truncate(os.path.getsize(self.path)-1)
+        self.assertEqual(Snapshot.load(self.path),None)
+        self.assertEqual(Snapshot.load(os.path.join(self.dir,'missing.snap')),None)
+
+if __name__ == "__main__":
+    unittest.main()
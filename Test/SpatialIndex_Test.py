@@ -0,0 +1,80 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - SpatialIndex_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on the grid spatial index
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import math
+import random
+
+sys.path.append('../AIMSDataManager/')
+
+from SpatialIndex import SpatialIndex
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+class Test_0_SpatialIndexSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('SpatialIndex_Test Log')
+
+class Test_1_SpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Build random point index')
+        rnd = random.Random(1)
+        self.points = dict([(i,(174.7+rnd.random()*0.05,-41.3+rnd.random()*0.05)) for i in range(2000)])
+        self.si = SpatialIndex()
+        self.si.update(self.points.items())
+
+    def tearDown(self):
+        self.si = None
+
+    def brute(self,x,y):
+        return [fid for d,fid in sorted([(math.hypot(px-x,py-y),fid) for fid,(px,py) in self.points.items()])]
+
+    def test10_nearest(self):
+        '''Tests nearest neighbours match a linear scan'''
+        for x,y in ((174.72,-41.28),(174.7,-41.3),(175.0,-41.0)):
+            self.assertEqual(self.si.nearest(x,y,3),self.brute(x,y)[:3])
+        self.assertEqual(self.si.nearest(175.0,-41.0,1,maxdist=0.01),[],'Feature beyond maxdist returned')
+
+    def test20_radiusBbox(self):
+        '''Tests radius and bbox queries match a linear scan'''
+        x,y,r = 174.72,-41.28,0.004
+        self.assertEqual(self.si.radius(x,y,r),[fid for fid in self.brute(x,y) if math.hypot(self.points[fid][0]-x,self.points[fid][1]-y) <= r])
+        sw,ne = (174.71,-41.29),(174.72,-41.28)
+        expected = [fid for fid,(px,py) in self.points.items() if sw[0]<=px<=ne[0] and sw[1]<=py<=ne[1]]
+        self.assertEqual(sorted(self.si.bbox(sw,ne)),sorted(expected))
+
+    def test30_update(self):
+        '''Tests moved and removed points are reflected in queries'''
+        self.si.update([(1,(0.0,0.0)),(2,None)])
+        self.assertEqual(self.si.nearest(0.0,0.0),[1])
+        self.assertFalse(2 in self.si)
+        self.assertEqual(len(self.si),len(self.points)-1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - Supervisor_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on feed thread supervision and restart backoff
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import time
+import threading
+
+sys.path.append('../AIMSDataManager/')
+
+import Supervisor
+from AimsUtility import FEEDS
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+class FeedThread(threading.Thread):
+    '''Stand in for a DataSync thread, failing or exiting on request'''
+    def __init__(self,fail=False):
+        super(FeedThread,self).__init__()
+        self.setDaemon(True)
+        self.fail = fail
+        self.heartbeat = time.time()
+        self.ftracker = {'interval':1}
+        self.exitcallback = None
+        self._stop = threading.Event()
+        self.release = threading.Event()
+    def run(self):
+        error = None
+        try:
+            self.release.wait(2)
+            if self.fail: raise ValueError('feed failure')
+        except Exception as e:
+            error = e
+        finally:
+            if self.exitcallback: self.exitcallback(FEEDS['AR'],self,error)
+    def stop(self):
+        self._stop.set()
+    def stopped(self):
+        return self._stop.isSet()
+
+class Test_0_SupervisorSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('Supervisor_Test Log')
+
+class Test_1_Supervisor(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Start supervisor with short backoff')
+        self.base = Supervisor.BACKOFF_BASE
+        Supervisor.BACKOFF_BASE = 0.1
+        self.restarted = []
+        self.sup = Supervisor.Supervisor(self.restart)
+        self.sup.start()
+
+    def tearDown(self):
+        self.sup.stop()
+        Supervisor.BACKOFF_BASE = self.base
+
+    def restart(self,etft):
+        self.restarted.append(etft)
+        ds = FeedThread()
+        self.sup.watch(etft,ds)
+        ds.start()
+
+    def test10_restartOnFailure(self):
+        '''Tests a failing feed is restarted and its restart counted'''
+        ds = FeedThread(fail=True)
+        self.sup.watch(FEEDS['AR'],ds)
+        ds.start()
+        ds.release.set()
+        time.sleep(0.5)
+        self.assertEqual(self.restarted,[FEEDS['AR']])
+        health = self.sup.health()[FEEDS['AR']]
+        self.assertEqual(health['restarts'],1)
+        self.assertEqual(health['state'],'running')
+        self.assertTrue('feed failure' in health['error'])
+
+    def test20_noRestartOnStop(self):
+        '''Tests a deliberately stopped feed is left stopped'''
+        ds = FeedThread()
+        self.sup.watch(FEEDS['AR'],ds)
+        ds.start()
+        ds.stop()
+        ds.release.set()
+        time.sleep(0.5)
+        self.assertEqual(self.restarted,[])
+
+if __name__ == "__main__":
+    unittest.main()
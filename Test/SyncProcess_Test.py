@@ -0,0 +1,201 @@
+'''
+v.0.0.1
+
+QGIS-AIMS-Plugin - SyncProcess_Test
+
+Copyright 2011 Crown copyright (c)
+Land Information New Zealand and the New Zealand Government.
+All rights reserved
+
+This program is released under the terms of the new BSD license. See the
+LICENSE file for more information.
+
+Tests on the out of process DataManager client and its pipe protocol
+
+Created on 19/10/2016
+
+@author: jramsay
+'''
+import unittest
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+sys.path.append('../AIMSDataManager/')
+
+import SyncProcess
+from Request import ResponseMailbox,BatchFuture
+from AimsUtility import FEEDS
+from FeatureFactory import FeatureFactory
+from Address import Position
+from AimsLogging import Logger
+
+testlog = Logger.setup('test')
+
+def _features(n):
+    aff = FeatureFactory.getInstance(FEEDS['AF'])
+    feats = []
+    for i in range(1,n+1):
+        a = aff.get(model={'version':1,'components':{'addressId':i,'addressNumber':i*10}})
+        p = Position()
+        p.setCoordinates([174.7+i*0.001,-41.3])
+        a.setAddressPositions(p)
+        feats.append(a)
+    return feats
+
+class EngineStandIn(object):
+    '''DataManager stand in for the child process, answering requests from a thread'''
+    def __init__(self,publisher):
+        self.mailbox = ResponseMailbox(FEEDS['AC'])
+        self.publisher = publisher
+    def addAddress(self,address,reqid=None):
+        address.setRequestId(reqid or 1)
+        future = self.mailbox.expect(address.getRequestId())
+        threading.Timer(0.1,self.mailbox.put,(address,)).start()
+        return future
+    def acceptAddresses(self,addresses):
+        futures = []
+        for i,address in enumerate(addresses):
+            address.setRequestId(100+i)
+            futures.append(self.mailbox.expect(address.getRequestId()))
+            threading.Timer(0.1,self.mailbox.put,(address,)).start()
+        return BatchFuture(futures)
+    def declineAddress(self,address,reqid=None):
+        raise ValueError('bad address')
+    def setbb(self,sw=None,ne=None):
+        time.sleep(1)
+    def health(self):
+        return 'ok'
+    def republish(self):
+        feats = _features(49)
+        feats[4]._components_addressNumber = 55
+        self.publisher.observe(None,FEEDS['AF'],feats,delta=({5:feats[4]},[50]))
+
+def _serveStandIn(conn,root,kwargs):
+    '''Child main publishing a feed then answering calls'''
+    publisher = SyncProcess.Publisher(conn,root)
+    dm = EngineStandIn(publisher)
+    publisher.observe(None,FEEDS['AF'],_features(50))
+    while True:
+        try: msg = conn.recv()
+        except EOFError: break
+        if msg[0] == 'close': break
+        publisher.call(dm,*msg[1:])
+    publisher.close()
+
+class Pipe(object):
+    '''Pipe end recording sent messages'''
+    def __init__(self):
+        self.sent = []
+    def send(self,msg):
+        self.sent.append(msg)
+
+class Listener(object):
+    def __init__(self):
+        self.received = {}
+        self.deltas = {}
+    def observe(self,observable,*args,**kwargs):
+        self.received[args[0]] = args[1]
+        if kwargs.get('delta') is not None: self.deltas[args[0]] = kwargs['delta']
+
+class Test_0_SyncProcessSelfTest(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def test10_selfTest(self):
+        self.assertNotEqual(testlog,None,'Testlog not instantiated')
+        testlog.debug('SyncProcess_Test Log')
+
+class Test_1_DataManagerClient(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Start stand in sync process')
+        self.serve = SyncProcess._serve
+        SyncProcess._serve = _serveStandIn
+        self.client = SyncProcess.DataManagerClient()
+        t = time.time()
+        while not self.client.pull(FEEDS['AF']) and time.time()-t < 5: time.sleep(0.05)
+
+    def tearDown(self):
+        self.client.close()
+        SyncProcess._serve = self.serve
+
+    def test10_feed(self):
+        '''Tests published feed data arrives as a snapshot with a spatial index'''
+        data = self.client.pull(FEEDS['AF'])
+        self.assertEqual(len(data),50)
+        self.assertEqual(data.decoded(),0,'Snapshot decoded eagerly')
+        self.assertEqual(data[4].getAddressId(),5)
+        self.assertEqual(self.client.index(FEEDS['AF']).nearest(174.705,-41.3),[5])
+        listener = Listener()
+        self.client.registermain(listener)
+        self.assertTrue(listener.received[FEEDS['AF']] is data)
+
+    def test20_calls(self):
+        '''Tests actions return local futures at once, resolved or failed by the child, while queries wait'''
+        t = time.time()
+        self.client.setbb((0,0),(1,1))
+        address = _features(1)[0]
+        future = self.client.addAddress(address,7)
+        self.assertTrue(time.time()-t < 0.5,'Caller waited on the sync process')
+        self.assertEqual(future.reqid,7)
+        self.assertEqual(future.result(5).getAddressId(),1)
+        failed = self.client.declineAddress(address)
+        self.assertTrue(failed.reqid)
+        self.assertEqual(failed.result(5),None)
+        self.assertTrue(isinstance(failed.error(),SyncProcess.SyncProcessException))
+        self.assertEqual(self.client.health(),'ok')
+
+    def test25_batch(self):
+        '''Tests a batch returns a local batch future resolved by the child's responses'''
+        batch = self.client.acceptAddresses(_features(3))
+        self.assertEqual(len(batch),3)
+        self.assertEqual([f.getAddressId() for f in batch.results(5)],[1,2,3])
+
+    def test30_delta(self):
+        '''Tests a feed update passes its changed features to the listener'''
+        listener = Listener()
+        self.client.registermain(listener)
+        index = self.client.index(FEEDS['AF'])
+        self.client._call('republish')
+        t = time.time()
+        while FEEDS['AF'] not in listener.deltas and time.time()-t < 5: time.sleep(0.05)
+        upserts,deletes = listener.deltas[FEEDS['AF']]
+        self.assertEqual((upserts.keys(),deletes),([5],[50]))
+        self.assertEqual(upserts[5]._components_addressNumber,55)
+        self.assertEqual(len(listener.received[FEEDS['AF']]),49)
+        self.assertIs(self.client.index(FEEDS['AF']),index,'Index rebuilt for a delta')
+        self.assertFalse(50 in index)
+        self.assertEqual(len(index),49)
+
+class Test_2_Publisher(unittest.TestCase):
+
+    def setUp(self):
+        testlog.debug('Instantiate publisher on a temporary directory')
+        self.root = tempfile.mkdtemp()
+        self.publisher = SyncProcess.Publisher(Pipe(),self.root)
+
+    def tearDown(self):
+        self.publisher.close()
+        shutil.rmtree(self.root)
+
+    def test10_concurrent(self):
+        '''Tests feed updates published from several threads at once each produce a readable snapshot'''
+        feats = _features(200)
+        threads = [threading.Thread(target=self.publisher.observe,args=(None,FEEDS['AF'],feats)) for i in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        sent = self.publisher.conn.sent
+        self.assertEqual(len(sent),8)
+        self.assertTrue(all([msg[2] for msg in sent]),'Snapshot not published')
+        self.assertEqual(len(self.publisher.snapshots[FEEDS['AF']]),200)
+        self.assertEqual(self.publisher.snapshots[FEEDS['AF']][199].getAddressId(),200)
+
+if __name__ == "__main__":
+    unittest.main()